@@ -12,8 +12,14 @@ import boto3
 import json
 import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+import email.utils
+import random
 import logging
+import threading
+import time
 import urllib.parse
+from collections import OrderedDict
 import pandas as pd
 from dotenv import load_dotenv
 pymysql.install_as_MySQLdb()
@@ -24,6 +30,262 @@ logger.setLevel(logging.INFO)
 load_dotenv()
 
 AWS_REGION = os.environ['AWS_REGION']
+
+PARAMETER_CACHE_TTL_SECONDS = int(os.environ.get("PARAMETER_CACHE_TTL_SECONDS", 300))
+# How long an expired value may still be served while it is refreshed in the background
+PARAMETER_CACHE_STALE_SECONDS = int(os.environ.get("PARAMETER_CACHE_STALE_SECONDS", 3600))
+
+
+class ParameterCache:
+    """Process-wide TTL cache for SSM parameters and secrets.
+
+    Only one caller loads a missing key while the others wait for it, and expired
+    values are served stale while a single background refresh runs.
+    """
+
+    def __init__(self, ttl=PARAMETER_CACHE_TTL_SECONDS, stale_ttl=PARAMETER_CACHE_STALE_SECONDS):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.entries = {}
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+
+    def get(self, key, loader):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = time.time() - fetched_at
+                if age < self.ttl:
+                    self.stats["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self.stats["stale_hits"] += 1
+                    if key not in self.loading:
+                        self.loading[key] = threading.Event()
+                        threading.Thread(
+                            target=self._refresh, args=(key, loader), daemon=True
+                        ).start()
+                    return value
+
+            event = self.loading.get(key)
+            owner = event is None
+            if owner:
+                event = self.loading[key] = threading.Event()
+                self.stats["misses"] += 1
+
+        if not owner:
+            event.wait()
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry is not None:
+                return entry[0]
+            # The loader we waited on failed, try ourselves
+            return self.get(key, loader)
+
+        try:
+            value = loader()
+            with self.lock:
+                self.entries[key] = (value, time.time())
+            return value
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+            event.set()
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+            with self.lock:
+                self.entries[key] = (value, time.time())
+                self.stats["refreshes"] += 1
+        except Exception:
+            logger.warning("Background refresh of %s failed, serving stale value.", key)
+        finally:
+            with self.lock:
+                event = self.loading.pop(key, None)
+            if event is not None:
+                event.set()
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+
+parameter_cache = ParameterCache()
+
+
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("HTTP_CONNECT_TIMEOUT_SECONDS", 3.05))
+HTTP_READ_TIMEOUT_SECONDS = float(os.environ.get("HTTP_READ_TIMEOUT_SECONDS", 30))
+HTTP_MAX_ATTEMPTS = int(os.environ.get("HTTP_MAX_ATTEMPTS", 4))
+HTTP_RETRY_BACKOFF_SECONDS = float(os.environ.get("HTTP_RETRY_BACKOFF_SECONDS", 0.5))
+# Upper bound on any single wait, including one asked for by Retry-After
+HTTP_MAX_RETRY_DELAY_SECONDS = float(os.environ.get("HTTP_MAX_RETRY_DELAY_SECONDS", 20))
+# Responses kept for conditional GETs of the read endpoints
+HTTP_ETAG_CACHE_SIZE = int(os.environ.get("HTTP_ETAG_CACHE_SIZE", 128))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 10))
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class OpenedConnections(threading.local):
+    """Connections opened by the current thread, so a request on one thread never counts another's."""
+
+    def __init__(self):
+        self.count = 0
+
+    def counting(self, pool_class):
+        opened = self
+
+        class CountingPool(pool_class):
+            def _new_conn(self):
+                opened.count += 1
+                return super()._new_conn()
+
+        return CountingPool
+
+
+class HTTPClient:
+    """Shared requests session with per-host keep-alive pools, timeouts and retries.
+
+    429 and 5xx responses and connection failures are retried with jittered
+    exponential backoff, waiting as long as Retry-After asks when it is given.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.adapter = adapter
+        # urllib3 opens a pool's connections on the thread that asks for one
+        self.opened = OpenedConnections()
+        poolmanager = adapter.poolmanager
+        poolmanager.pool_classes_by_scheme = {
+            scheme: self.opened.counting(pool_class)
+            for scheme, pool_class in poolmanager.pool_classes_by_scheme.items()
+        }
+        self.timeout = (HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS)
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "errors": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "total_ms": 0.0,
+            "not_modified": 0,
+        }
+        # (url, params) -> last 200 response carrying an ETag
+        self.etag_cache = OrderedDict()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def conditional_get(self, url, params=None, headers=None, **kwargs):
+        """GET that revalidates the last 200 response of the same URL with If-None-Match.
+
+        A 304 returns the stored response, so the body is not sent again.
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        with self.lock:
+            cached = self.etag_cache.get(key)
+        headers = dict(headers or {})
+        if cached is not None:
+            headers["If-None-Match"] = cached.headers["ETag"]
+        response = self.get(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            with self.lock:
+                self.stats["not_modified"] += 1
+            return cached
+        if response.status_code == 200 and response.headers.get("ETag"):
+            with self.lock:
+                self.etag_cache[key] = response
+                self.etag_cache.move_to_end(key)
+                while len(self.etag_cache) > HTTP_ETAG_CACHE_SIZE:
+                    self.etag_cache.popitem(last=False)
+        return response
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def request(self, method, url, throttled=None, **kwargs):
+        """Send a request, throttled is called on every 429 retried so a rate limiter can slow down.
+
+        A 429 that is returned is the caller's to report, so each one is counted once.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(1, HTTP_MAX_ATTEMPTS + 1):
+            opened = self.opened.count
+            started = time.time()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.record(method, url, None, started, self.opened.count > opened, attempt)
+                if attempt == HTTP_MAX_ATTEMPTS:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning("%s %s failed (attempt %d), retrying in %.2f s: %s", method, url, attempt, delay, e)
+                time.sleep(delay)
+                continue
+
+            self.record(method, url, response.status_code, started, self.opened.count > opened, attempt)
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt == HTTP_MAX_ATTEMPTS:
+                return response
+            if response.status_code == 429 and throttled is not None:
+                throttled()
+            delay = self.retry_after(response)
+            if delay is None:
+                delay = self.backoff(attempt)
+            logger.warning(
+                "%s %s returned %d (attempt %d), retrying in %.2f s",
+                method, url, response.status_code, attempt, delay,
+            )
+            response.close()
+            time.sleep(delay)
+
+    def backoff(self, attempt):
+        # Full jitter, so callers throttled together do not retry together
+        delay = min(HTTP_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1), HTTP_MAX_RETRY_DELAY_SECONDS)
+        return random.uniform(0, delay)
+
+    def retry_after(self, response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return min(max(float(value), 0.0), HTTP_MAX_RETRY_DELAY_SECONDS)
+        except ValueError:
+            pass
+        try:
+            at = email.utils.parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError):
+            return None
+        return min(max(at - time.time(), 0.0), HTTP_MAX_RETRY_DELAY_SECONDS)
+
+    def record(self, method, url, status_code, started, new_connection, attempt):
+        elapsed = (time.time() - started) * 1000
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["retries"] += attempt > 1
+            self.stats["errors"] += status_code is None or status_code >= 400
+            self.stats["new_connections" if new_connection else "reused_connections"] += 1
+            self.stats["total_ms"] += elapsed
+        logger.debug(
+            "%s %s -> %s in %.0f ms (attempt %d, %s connection)",
+            method, url, status_code, elapsed, attempt, "new" if new_connection else "reused",
+        )
+
+
+http_client = HTTPClient()
+
+
 class AWSClient:
     def __init__(self):
         self.ssm = boto3.client("ssm", region_name=AWS_REGION)
@@ -35,6 +297,9 @@ class AWSClient:
 
 
     def get_secret(self):
+        return parameter_cache.get(("secret", "HighTimesDB"), self.fetch_secret)
+
+    def fetch_secret(self):
         secret_name = "HighTimesDB"
         region_name = os.environ['AWS_REGION'] 
         session = boto3.session.Session()
@@ -46,6 +311,11 @@ class AWSClient:
             raise e
 
     def get_parameters_from_store(self, params_keys):
+        return parameter_cache.get(
+            ("ssm",) + tuple(params_keys), lambda: self.fetch_parameters(params_keys)
+        )
+
+    def fetch_parameters(self, params_keys):
         response = self.ssm.get_parameters(Names=params_keys, WithDecryption=True)
 
         # Construct a dictionary to hold the parameter values
@@ -61,9 +331,10 @@ class AWSClient:
 
 
 
-def create_app():
-    aws = AWSClient()
+aws = AWSClient()
 
+
+def create_app():
     username, port, database, host, password = aws.get_database_credentials()
 
 
@@ -161,7 +432,6 @@ def logout():
 @app.route('/submit_translation', methods=['POST'])
 @login_required
 def submit_translations():
-    aws = AWSClient()
     parameter = ["put_final"]
     params_dict = aws.get_parameters_from_store(parameter)
 
@@ -170,6 +440,7 @@ def submit_translations():
     AzureRating = request.form.get('AzureRating')
 
     id = request.form.get('currentIndex')
+    lang_to = request.form.get('lang_to')
 
     translation = request.form.get('finalTranslation')
     title, text = extract_title_and_text(translation)
@@ -177,7 +448,7 @@ def submit_translations():
     comments = request.form.get('CommentsContent')
 
     # Before constructing the data dictionary
-    if not AWSRating or not GCPRating or not AzureRating or not title or not text:
+    if not AWSRating or not GCPRating or not AzureRating or not title or not text or not lang_to:
         flash('Some required fields are missing!', 'danger')
         return redirect(url_for('dashboard'))
 
@@ -188,7 +459,8 @@ def submit_translations():
             "comments": comments,
             "aws_rating": int(AWSRating),
             "gcp_rating": int(GCPRating),
-            "azure_rating": int(AzureRating)
+            "azure_rating": int(AzureRating),
+            "lang_to": lang_to
             }
     
     check = {
@@ -201,7 +473,7 @@ def submit_translations():
     data["checksum"] = checksum.hex()
    
     try:
-        response = requests.post(params_dict.get('put_final'), json=data, headers={'Content-Type': 'application/json'})
+        response = http_client.post(params_dict.get('put_final'), json=data, headers={'Content-Type': 'application/json'})
         if response.status_code != 200:
             raise Exception(f"Unexpected status code: {response.content}")
         flash('Successfully submitted!', 'success')
@@ -214,11 +486,10 @@ def submit_translations():
 @app.route('/get_status', methods=['GET', 'POST'])
 @login_required
 def status():
-    aws = AWSClient()
     parameter = ["get_status"]
     params_dict = aws.get_parameters_from_store(parameter)
     
-    response = requests.get(params_dict["get_status"], headers={'Content-Type': 'application/json'})
+    response = http_client.conditional_get(params_dict["get_status"], headers={'Content-Type': 'application/json'})
     
     data = response.json()
     df = pd.DataFrame(data)
@@ -235,7 +506,6 @@ def status_page():
 @app.route('/remove_from_queue/<id>', methods=['DELETE', 'POST'])
 @login_required
 def remove(id):
-    aws = AWSClient()
     parameter = ["delete_trans"]
     params_dict = aws.get_parameters_from_store(parameter)
 
@@ -247,7 +517,7 @@ def remove(id):
     params = {"id": id, "lang_to": lang_to, "lang_from": lang_from}
 
     try:
-        response = requests.delete(params_dict["delete_trans"], params=params, headers=headers)
+        response = http_client.delete(params_dict["delete_trans"], params=params, headers=headers)
         if response.status_code == 200:
             # Successfully removed item
             return jsonify({"success": True})
@@ -262,7 +532,6 @@ def remove(id):
 @app.route('/queue/<id>', methods=['POST'])
 @login_required
 def queue(id):
-    aws = AWSClient()
     parameter = ["push_to_fifo"]
     params_dict = aws.get_parameters_from_store(parameter)
 
@@ -277,8 +546,12 @@ def queue(id):
         "id": id
             }
 
+    # Lets a deleted translation be queued again without waiting for the consumers' document index
+    if request.args.get("force"):
+        params["force"] = request.args.get("force")
+
     try:
-        response = requests.post(params_dict["push_to_fifo"], params=params, headers=headers)
+        response = http_client.post(params_dict["push_to_fifo"], params=params, headers=headers)
         if response.status_code == 200:
             return jsonify({"success": True})
         else:
@@ -290,20 +563,35 @@ def queue(id):
 @app.route('/get_articles', methods=['GET'])
 @login_required
 def get_articles():
-    aws = AWSClient()
     parameter = ["get_article"]
     params_dict = aws.get_parameters_from_store(parameter)
     headers = {'Content-Type': 'application/json'}
     id = request.args.get("id")
     title = request.args.get("title")
 
+    # Listing mode of get_article: one page of articles and the cursors around it
+    listing = {
+        key: request.args.get(key)
+        for key in ("fields", "per_page", "cursor", "include_total")
+        if request.args.get(key)
+    }
+    if listing and not (id or title):
+        try:
+            response = http_client.conditional_get(params_dict["get_article"], params=listing, headers=headers)
+            if response.status_code == 200:
+                return jsonify(response.json())
+            return jsonify({"success": False, "error": "Failed to get items"}), 500
+        except Exception as e:
+            logger.error("Request failed")
+            return jsonify({"success": False, "error": "Request failed"}), 500
+
     params = {"id": id}
 
     if title:
         decoded_title = urllib.parse.unquote(title)
         params["title"] = decoded_title
         try:
-            response = requests.get(params_dict["get_article"], params=params, headers=headers)
+            response = http_client.conditional_get(params_dict["get_article"], params=params, headers=headers)
             if response.status_code == 200:
                 data = response.json()
                 df = pd.DataFrame(data, index=[0])
@@ -311,7 +599,7 @@ def get_articles():
         except Exception as e:
             return jsonify({"success": False, "error": "Failed to get item"}), 500 
     try:
-        response = requests.get(params_dict["get_article"], params=params, headers=headers)
+        response = http_client.conditional_get(params_dict["get_article"], params=params, headers=headers)
         if response.status_code == 200:
             data = response.json()
             if isinstance(data, dict):
@@ -1,41 +1,26 @@
-
 let currentIndex = 0; 
 
-function getProviderColumns(provider) {
-    switch (provider) {
-        case 'aws':
-            return 1;
-        case 'gcp':
-            return 2;
-        case 'azure':
-            return 3;
-        default:
-            return [];
-    }
-}
-
-function fetchTranslationForService(service) {
-    let to_lang = document.getElementById("translateTo")
-    let providers_id = getProviderColumns(service);
-    let fetchUrl = `${CONFIG.API_ENDPOINT}/get-first?providers_id=${providers_id}&direction=next&to_lang=${to_lang.value}&id=${currentIndex}`;
-    return fetch(fetchUrl)
-        .then(response => {
+// Articles fetched ahead of the current one in each direction
+const BUNDLE_PREFETCH = 5;
+let prefetched = { next: [], prev: [] };
 
-            return response.json();
-        });
-}
+const TRANSLATION_TEXTAREAS = {
+    AWS: 'awsTranslation',
+    GCP: 'googleTranslation',
+    AZURE: 'azureTranslation'
+};
 
-function fetchTranslationForServicePrev(service) {
+function fetchBundles(direction) {
     let to_lang = document.getElementById("translateTo")
-    let providers_id = getProviderColumns(service);
-    let fetchUrl = `${CONFIG.API_ENDPOINT}/get-first?providers_id=${providers_id}&direction=prev&to_lang=${to_lang.value}&id=${currentIndex}`;
+    let fetchUrl = `${CONFIG.API_ENDPOINT}/get-first?bundle=1&direction=${direction}&to_lang=${to_lang.value}&id=${currentIndex}&limit=${BUNDLE_PREFETCH}`;
     return fetch(fetchUrl)
         .then(response => {
-            if (!response.ok && response.status === 400) {
-                showFlashMessage("No more articles");
+            if (!response.ok) {
+                return { bundles: [] };
             }
             return response.json();
-        });
+        })
+        .then(data => data.bundles);
 }
 
 function showFlashMessage(message) {
@@ -50,107 +35,46 @@ function showFlashMessage(message) {
     }, 4000);
 }
 
+function showBundle(bundle) {
+    const originalArticleTextarea = document.getElementById('originalArticle');
+    originalArticleTextarea.value = bundle.article.title + "\n\n" + bundle.article.text;
 
-function fetchOriginalArticle(id) {
-    fetch(`${CONFIG.API_ENDPOINT}/get-article?id=${id}`)
-        .then(response => response.json())
-        .then(data => {
-            const originalArticleTextarea = document.getElementById('originalArticle');
-            originalArticleTextarea.value = data.title + "\n\n" + data.text;
-        });
-}
+    for (const [provider, textareaId] of Object.entries(TRANSLATION_TEXTAREAS)) {
+        const textarea = document.getElementById(textareaId);
+        const data = bundle.translations[provider];
+        if (textarea) textarea.value = data ? data.text.title + "\n\n" + data.text.text : "";
+    }
 
-function updateTranslationElements() {
-    let promises = [];
+    currentIndex = bundle.id;
+    updateCurrentIndexInput();
+}
 
-    // AWS
-    promises.push(fetchTranslationForService('aws')
-        .then(data => {
-            if (Object.keys(data).length !== 0) {
-                const awsTextarea = document.getElementById('awsTranslation');
-                if (awsTextarea) awsTextarea.value = data.text.title + "\n\n" + data.text.text;
-            }
-            return data;
-        }));
+function moveTo(direction) {
+    // Moving away invalidates what was fetched the other way
+    const opposite = direction === 'next' ? 'prev' : 'next';
+    prefetched[opposite] = [];
 
-    // Google Cloud
-    promises.push(fetchTranslationForService('gcp')
-        .then(data => {
-            if (Object.keys(data).length !== 0) {
-                const gcpTextarea = document.getElementById('googleTranslation');
-                if (gcpTextarea) gcpTextarea.value = data.text.title + "\n\n" + data.text.text;
-            }
-            return data;
-        }));
+    if (prefetched[direction].length !== 0) {
+        showBundle(prefetched[direction].shift());
+        return;
+    }
 
-    // Microsoft Azure
-    promises.push(fetchTranslationForService('azure')
-        .then(data => {
-            if (Object.keys(data).length !== 0) {
-                const azureTextarea = document.getElementById('azureTranslation');
-                if (azureTextarea) azureTextarea.value = data.text.title + "\n\n" + data.text.text;
-            }
-            return data;
-        }));
-    const initialIndex = currentIndex;
-    // When all translations have been fetched
-    Promise.all(promises).then(results => {
-        let nonEmptyResult = results.find(data => Object.keys(data).length !== 0);
-    
-        if (nonEmptyResult) {
-            currentIndex = nonEmptyResult.id;
-            fetchOriginalArticle(currentIndex);
-            updateCurrentIndexInput();
-        }
-        if (initialIndex === currentIndex) {
+    fetchBundles(direction).then(bundles => {
+        if (bundles.length === 0) {
             showFlashMessage("No more articles");
+            return;
         }
+        showBundle(bundles[0]);
+        prefetched[direction] = bundles.slice(1);
     });
 }
 
-function updateTranslationElementsPrev() {
-    let promises = [];
-
-    // AWS
-    promises.push(fetchTranslationForServicePrev('aws')
-        .then(data => {
-            if (Object.keys(data).length !== 0) {
-                const awsTextarea = document.getElementById('awsTranslation');
-                if (awsTextarea) awsTextarea.value = data.text.title + "\n\n" + data.text.text;
-            }
-            return data;
-        }));
-
-    // Google Cloud
-    promises.push(fetchTranslationForServicePrev('gcp')
-        .then(data => {
-            if (Object.keys(data).length !== 0) {
-                const gcpTextarea = document.getElementById('googleTranslation');
-                if (gcpTextarea) gcpTextarea.value = data.text.title + "\n\n" + data.text.text;
-            }
-            return data;
-        }));
-
-    // Microsoft Azure
-    promises.push(fetchTranslationForServicePrev('azure')
-        .then(data => {
-            if (Object.keys(data).length !== 0) {
-                const azureTextarea = document.getElementById('azureTranslation');
-                if (azureTextarea) azureTextarea.value = data.text.title + "\n\n" + data.text.text;
-            }
-            return data;
-        }));
-    // When all translations have been fetched
-    Promise.all(promises).then(results => {
-        let nonEmptyResult = results.find(data => Object.keys(data).length !== 0);
-    
-        if (nonEmptyResult) {
-            currentIndex = nonEmptyResult.id;
-            fetchOriginalArticle(currentIndex);
-            updateCurrentIndexInput();
-        }
+function updateTranslationElements() {
+    moveTo('next');
+}
 
-    });
+function updateTranslationElementsPrev() {
+    moveTo('prev');
 }
 
 function updateCurrentIndexInput() {
@@ -221,6 +145,7 @@ document.getElementById('dropdown').addEventListener('change', function() {
     let currentLang = document.getElementById('translateTo');
     if (currentLang) {
         currentLang.value = this.value;
+        prefetched = { next: [], prev: [] };
         updateTranslationElements()
     } else {
         console.log("currentLang not found!")
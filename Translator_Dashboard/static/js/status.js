@@ -1,6 +1,9 @@
 var dataTable; // Declare dataTable outside the document.ready function
 var databaseTable; // Declare table for database
-var currentPage = 1; // Initialize the current page
+// Cursors of the pages around the one shown in the database table
+var pageCursors = { next: null, prev: null };
+var currentCursor = null; // Cursor of the page shown, null for the first one
+var ARTICLES_PER_PAGE = 20;
 
 $(document).ready(function() {
     // Initialize DataTable
@@ -63,14 +66,18 @@ $(document).ready(function() {
 
 $(document).ready(function() {
 
-    function fetchData(id) {
+    function fetchData(cursor) {
+        var data = { fields: "id,title", per_page: ARTICLES_PER_PAGE };
+        if (cursor) {
+            data.cursor = cursor;
+        }
+        currentCursor = cursor;
         $.ajax({
             url: "/get_articles",
-            data: {
-                id: currentPage
-            },
+            data: data,
             success: function(data) {
-                databaseTable.clear().rows.add(data).draw();
+                databaseTable.clear().rows.add(data.items).draw();
+                pageCursors = { next: data.next_cursor, prev: data.prev_cursor };
                 updateButtonStates();
             },
             error: function(xhr, textStatus, errorThrown) {
@@ -84,8 +91,7 @@ var databaseTable = new DataTable(document.querySelector('#database-table'), {
     lengthChange: false,
     paging: false,
     columns: [
-        { data: "title", width: "85px" },
-        { data: "text" },
+        { data: "title" },
         {
             data: "id",
             width: "70px",
@@ -147,27 +153,26 @@ document.addEventListener("DOMContentLoaded", function() {
 
 
     // Fetch initial data
-    fetchData(currentPage);
+    fetchData(null);
 
     // Go to the previous page
-    $('#previous-button').click(function() {
-        if (currentPage > 1) {
-            currentPage--;
-            fetchData(currentPage);
+    $('#prev-button').click(function() {
+        if (pageCursors.prev) {
+            fetchData(pageCursors.prev);
         }
     });
 
     // Go to the next page
     $('#next-button').click(function() {
-        currentPage++;
-        fetchData(currentPage);
+        if (pageCursors.next) {
+            fetchData(pageCursors.next);
+        }
     });
 
-    // Update button states based on the current page
+    // A page without a cursor in some direction is the first or last one
     function updateButtonStates() {
-        // Assuming you know the total number of pages. If not, this logic needs adjustment.
-        $('#previous-button').prop('disabled', currentPage === 1);
-        $('#next-button').prop('disabled', currentPage === 3200); // replace 3000 with your total pages count
+        $('#prev-button').prop('disabled', !pageCursors.prev);
+        $('#next-button').prop('disabled', !pageCursors.next);
     }
 
     // Handle Remove button click event
@@ -187,7 +192,7 @@ document.addEventListener("DOMContentLoaded", function() {
             type: 'POST',
             success: function(response) {
                 if (response.success) {
-                    fetchData(currentPage);
+                    fetchData(currentCursor);
                     dataTable.ajax.reload();
                 } else {
                     console.error('Error queuing item: ' + response.error);
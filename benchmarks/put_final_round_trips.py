@@ -0,0 +1,130 @@
+"""Count put_final_translation's database round trips before and after SubmitFinalTranslation.
+
+Runs the current handler and a replay of the six statements the handler used to
+send against a cursor that records every statement and waits --rtt-ms for each,
+the network round trip to RDS. Time spent executing inside MySQL is not modelled,
+so this compares round trips and their latency only; it is not a MySQL benchmark.
+
+    python benchmarks/put_final_round_trips.py --rtt-ms 1 --calls 50
+
+Needs boto3 and pymysql importable, as the handler imports them through the layer.
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# What the handler sent before migration 002, one autocommitted round trip each
+OLD_STATEMENTS = [
+    "SELECT COUNT(*) FROM HighTimes.edited_translations WHERE text_id = %s AND checksum = %s",
+    "INSERT INTO edited_translations (text_id, edited_content, checksum) VALUES (%s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE text_id = VALUES(text_id), edited_content = VALUES(edited_content), "
+    "checksum = VALUES(checksum)",
+    "UPDATE HighTimes SET status = 'done' WHERE id = %s",
+    "SELECT translation_id FROM translations WHERE text_id = %s AND providers_id IN (%s, %s, %s)",
+    "INSERT INTO ratings (translation_id, rating_value, providers_id) VALUES (%s, %s, %s), (%s, %s, %s), "
+    "(%s, %s, %s) ON DUPLICATE KEY UPDATE rating_value = VALUES(rating_value), providers_id = VALUES(providers_id)",
+    "INSERT INTO comments (text_id, comments) VALUES (%s, %s) ON DUPLICATE KEY UPDATE text_id = VALUES(text_id)",
+]
+
+
+class RoundTripCursor:
+    """Waits one round trip per statement and answers with a single row."""
+
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.statements = []
+
+    def execute(self, statement, args=None):
+        self.statements.append(statement)
+        time.sleep(self.rtt)
+
+    def fetchone(self):
+        return ("saved",)
+
+    def fetchall(self):
+        return [(1,), (2,), (3,)]
+
+    def nextset(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class RoundTripConnection:
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.cursors = []
+
+    def cursor(self):
+        self.cursors.append(RoundTripCursor(self.rtt))
+        return self.cursors[-1]
+
+
+def load_handler():
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    sys.path.insert(0, str(ROOT / "layers" / "mtdock" / "python"))
+    spec = importlib.util.spec_from_file_location("put_final", ROOT / "put_final_translation" / "lambda_function.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def event(article_id):
+    text = f"Edited text of article {article_id}."
+    checksum = hashlib.sha256(str({"text": text, "id": article_id}).encode("utf-8")).hexdigest()
+    body = {
+        "id": article_id,
+        "text": text,
+        "checksum": checksum,
+        "lang_to": "de",
+        "aws_rating": 4,
+        "gcp_rating": 3,
+        "azure_rating": 5,
+        "comments": "",
+    }
+    return {"body": json.dumps(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rtt-ms", type=float, default=1.0)
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    put_final = load_handler()
+    cnx = RoundTripConnection(rtt)
+    put_final.connection_manager.get_connection = lambda: cnx
+    # Nothing to invalidate here
+    put_final.generation_counter.bump = lambda article_ids: None
+
+    start = time.perf_counter()
+    for article_id in range(args.calls):
+        assert put_final.handler(event(article_id), None)["statusCode"] == 200
+    new_ms = (time.perf_counter() - start) / args.calls * 1000
+    new_trips = sum(len(cursor.statements) for cursor in cnx.cursors) / args.calls
+
+    old = RoundTripCursor(rtt)
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        for statement in OLD_STATEMENTS:
+            old.execute(statement)
+    old_ms = (time.perf_counter() - start) / args.calls * 1000
+    old_trips = len(old.statements) / args.calls
+
+    print(f"round trip: {args.rtt_ms} ms, {args.calls} calls")
+    print(f"six statements:          {old_trips:4.0f} round trips {old_ms:8.2f} ms/call")
+    print(f"SubmitFinalTranslation:  {new_trips:4.0f} round trips {new_ms:8.2f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare title lookups through JSON_EXTRACT with the indexed content_title column.
+
+Builds a synthetic translations table in SQLite, which has the same JSON functions
+and generated columns as the MySQL schema after migration 005, and times both
+forms of the get_first title query.
+
+    python benchmarks/title_lookup.py --rows 100000 --queries 100
+
+Only SQLite is measured. The MySQL plans and timings of migration 005 have not
+been taken; run EXPLAIN on the get_first, get_final and get_article title queries
+against a copy of the database before relying on these numbers.
+"""
+import argparse
+import json
+import random
+import sqlite3
+import string
+import time
+
+
+def vocabulary(rng, size=5000):
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(size)]
+
+
+def build_corpus(cnx, rows, seed):
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    cnx.execute(
+        """
+        CREATE TABLE translations (
+            translation_id INTEGER PRIMARY KEY,
+            text_id INTEGER,
+            content TEXT,
+            content_title TEXT GENERATED ALWAYS AS (substr(json_extract(content, '$.title'), 1, 255)) STORED
+        )
+        """
+    )
+    titles = []
+    batch = []
+    for i in range(rows):
+        title = " ".join(rng.choices(words, k=rng.randint(3, 12)))
+        titles.append(title)
+        batch.append((i, json.dumps({"title": title, "text": " ".join(rng.choices(words, k=150))})))
+        if len(batch) == 10000:
+            cnx.executemany("INSERT INTO translations (text_id, content) VALUES (?, ?)", batch)
+            batch = []
+    if batch:
+        cnx.executemany("INSERT INTO translations (text_id, content) VALUES (?, ?)", batch)
+    cnx.execute("CREATE INDEX idx_translations_content_title ON translations (content_title)")
+    cnx.commit()
+    return titles
+
+
+def time_queries(cnx, query, titles, params_for):
+    start = time.perf_counter()
+    for title in titles:
+        rows = cnx.execute(query, params_for(title)).fetchall()
+        assert rows, title
+    return (time.perf_counter() - start) / len(titles) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    cnx = sqlite3.connect(":memory:")
+    start = time.perf_counter()
+    titles = build_corpus(cnx, args.rows, args.seed)
+    print(f"corpus: {args.rows} rows built in {time.perf_counter() - start:.1f}s")
+
+    sample = random.Random(args.seed + 1).sample(titles, args.queries)
+    scan_query = "SELECT text_id FROM translations WHERE json_extract(content, '$.title') = ? LIMIT 1"
+    seek_query = (
+        "SELECT text_id FROM translations "
+        "WHERE content_title = substr(?, 1, 255) AND json_extract(content, '$.title') = ? LIMIT 1"
+    )
+    for name, query in (("json_extract", scan_query), ("content_title", seek_query)):
+        plan = cnx.execute("EXPLAIN QUERY PLAN " + query, ("x",) * query.count("?")).fetchall()
+        print(f"{name} plan: {plan[-1][-1]}")
+
+    scan_ms = time_queries(cnx, scan_query, sample, lambda t: (t,))
+    seek_ms = time_queries(cnx, seek_query, sample, lambda t: (t, t))
+    print(f"json_extract scan:   {scan_ms:9.3f} ms/query")
+    print(f"content_title seek:  {seek_ms:9.3f} ms/query")
+    print(f"speedup:             {scan_ms / seek_ms:9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,56 @@
-import pymysql
 import logging
 import traceback
 import os
-import json
 # import pdb
 import boto3
 
+from mtdock.cache import GenerationCounter
+from mtdock.database import connection_manager
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-class HTDatabase:
-    def get_database_credentials(self):
-        secret = self.get_secret()
-        secret_dict = json.loads(secret)
-        return (
-            secret_dict.get("username"),
-            secret_dict.get("port"),
-            secret_dict.get("database"),
-            secret_dict.get("host"),
-        )
-
-    def get_secret(self):
-        secret_name = "HighTimesDB"
-        region_name = os.environ["AWS_REGION"]
-        session = boto3.session.Session()
-        client = session.client(service_name="secretsmanager", region_name=region_name)
+
+generation_counter = GenerationCounter()
+
+
+# The translation consumers' shared document index, see skip_translated_documents there.
+# Set it empty where the consumers run without the "dynamodb" translation memory
+TRANSLATION_MEMORY_TABLE = os.environ.get("TRANSLATION_MEMORY_TABLE", "translation_memory")
+# PROVIDER_NAME of every consumer, each keeps its own fingerprints
+TRANSLATION_PROVIDERS = ("aws", "azure", "gcp")
+
+
+class DocumentIndex:
+    """Forgets the consumers' fingerprints of a deleted translation, so queuing it again retranslates it."""
+
+    def __init__(self):
+        self.client = None
+
+    def forget(self, article_id, lang_from, lang_to):
+        if not TRANSLATION_MEMORY_TABLE:
+            return
         try:
-            get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-            return get_secret_value_response["SecretString"]
+            if self.client is None:
+                self.client = boto3.client("dynamodb")
+            for provider in TRANSLATION_PROVIDERS:
+                self.client.delete_item(
+                    TableName=TRANSLATION_MEMORY_TABLE,
+                    Key={"segment_key": {"S": f"doc:{provider}:{lang_from}:{lang_to}:{article_id}"}},
+                )
         except Exception as e:
-            raise e
+            # A requeue is then acknowledged untranslated until DOCUMENT_INDEX_TTL_SECONDS, or sent with force
+            logger.error("Cannot clear the document index of %s (%s to %s): %s", article_id, lang_from, lang_to, e)
+
+
+document_index = DocumentIndex()
+
 
+class HTDatabase:
     def make_connection(self):
-        rds_client = boto3.client("rds")
-
-        username, port, database, endpoint = self.get_database_credentials()
-
-        database_token = rds_client.generate_db_auth_token(
-            DBHostname=endpoint,
-            Port=port,
-            DBUsername=username,
-            Region=os.environ["AWS_REGION"],
-        )
-
-        return pymysql.connect(
-            host=endpoint,
-            user=username,
-            passwd=database_token,
-            port=int(port),
-            db=database,
-            autocommit=True,
-            ssl={"ssl": True},
-        )
+        cnx = connection_manager.get_connection()
+        logger.info("DB connection stats: %s", connection_manager.stats)
+        return cnx
 
     def log_err(self, errmsg):
         logger.error(errmsg)
@@ -97,6 +96,8 @@ def lambda_handler(event, context):
         try:
             cursor.execute(query, (id, lang_to, lang_from))
             cnx.commit()  # Commit the DELETE operation
+            generation_counter.bump([id])
+            document_index.forget(id, lang_from, lang_to)
         except Exception as e:
             return db.log_err("[ERROR]: Cannot execute cursor.\n{}".format(traceback.format_exc()))
 
@@ -113,6 +114,8 @@ def lambda_handler(event, context):
             try:
                 cursor.execute(query_update, (id,))
                 cnx.commit()  # Commit the UPDATE operation
+                # The article's status is part of the cached get_first responses
+                generation_counter.bump([id])
             except Exception as e:
                 return db.log_err("[ERROR]: Cannot update.\n{}".format(traceback.format_exc()))
         
@@ -135,6 +138,3 @@ def lambda_handler(event, context):
 #
 
 
-
-
-
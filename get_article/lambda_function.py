@@ -1,23 +1,67 @@
-import pymysql
 import logging
 import traceback
 import os
 import json
+import base64
 # import pdb
-import boto3
+
+from mtdock.cache import ReadCache, make_cache_store
+from mtdock.conditional import conditional_get, make_etag, not_modified, request_header
+from mtdock.database import connection_manager
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
+read_cache = ReadCache(make_cache_store())
+if read_cache.store is None:
+    logger.warning("Neither CACHE_TABLE nor CACHE_DIR is set, translation reads are not cached.")
+
+# Upper bound on ids fetched in one request (used by push_to_fifo batches)
+MAX_IDS = 100
+# Bounds of per_page for listings and the legacy page/per_page mode
+MAX_PER_PAGE = int(os.environ.get("MAX_PER_PAGE", 100))
+DEFAULT_PER_PAGE = 20
+# Listing field -> column, the body text is only read when asked for
+FIELDS = {"id": "id", "title": "title", "text": "BodyText"}
+# How long the total article count of a listing is reused
+TOTAL_COUNT_TTL_SECONDS = int(os.environ.get("TOTAL_COUNT_TTL_SECONDS", 300))
+
+
+def encode_cursor(key, direction):
+    """Opaque cursor for the page after (next) or before (prev) the article with this id."""
+    data = json.dumps({"k": key, "d": direction}).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    if data.get("d") not in ("next", "prev") or data.get("k") in (None, ""):
+        raise ValueError("Malformed cursor")
+    return data["k"], data["d"]
+
+
+def parse_fields(value):
+    """Fields of a listing in column order; id is always included since cursors are built from it."""
+    if not value:
+        return list(FIELDS)
+    fields = {field.strip() for field in value.split(",") if field.strip()}
+    unknown = fields - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+    return [field for field in FIELDS if field in fields or field == "id"]
+
+
 class HTDatabase:
     def construct_query(self, **kwargs):
-        base_query = "SELECT id, title, BodyText FROM HighTimes"
+        # Source articles never change, so their ids are all an ETag needs
+        base_query = "SELECT {} FROM HighTimes".format("id" if kwargs.get("validators") else "id, title, BodyText")
         conditions = []
         params = []
 
         title = kwargs.get('title')
         id = kwargs.get('id')
+        ids = kwargs.get('ids')
         page = kwargs.get('page')
         per_page = kwargs.get('per_page')
 
@@ -27,60 +71,46 @@ class HTDatabase:
         if id:
             conditions.append("id = %s")
             params.append(id)
+        if ids:
+            if len(ids) > MAX_IDS:
+                raise ValueError(f"At most {MAX_IDS} ids can be requested at once.")
+            conditions.append("id IN ({})".format(", ".join(["%s"] * len(ids))))
+            params.extend(ids)
 
         if conditions:
             base_query += " WHERE " + " AND ".join(conditions)
 
         if page is not None and per_page is not None:
-            offset = (int(page) - 1) * int(per_page)
-            base_query += f" LIMIT {per_page} OFFSET {offset}"
+            per_page = min(max(int(per_page), 1), MAX_PER_PAGE)
+            base_query += " LIMIT %s OFFSET %s"
+            params.extend([per_page, (max(int(page), 1) - 1) * per_page])
+        elif ids:
+            base_query += " LIMIT %s"
+            params.append(len(ids))
         else:
             base_query += " LIMIT 1"
 
         return base_query, params
 
-    def get_database_credentials(self):
-        secret = self.get_secret()
-        secret_dict = json.loads(secret)
-        return (
-            secret_dict.get("username"),
-            secret_dict.get("port"),
-            secret_dict.get("database"),
-            secret_dict.get("host"),
-        )
+    def construct_listing_query(self, fields, key=None, direction=None, limit=DEFAULT_PER_PAGE):
+        """Keyset page of articles: a seek on the primary key, whatever the depth."""
+        base_query = "SELECT {} FROM HighTimes".format(", ".join(FIELDS[field] for field in fields))
+        params = []
 
-    def get_secret(self):
-        secret_name = "HighTimesDB"
-        region_name = os.environ["AWS_REGION"]
-        session = boto3.session.Session()
-        client = session.client(service_name="secretsmanager", region_name=region_name)
-        try:
-            get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-            return get_secret_value_response["SecretString"]
-        except Exception as e:
-            raise e
+        if key is not None:
+            base_query += " WHERE id < %s" if direction == "prev" else " WHERE id > %s"
+            params.append(key)
 
-    def make_connection(self):
-        rds_client = boto3.client("rds")
+        order = "DESC" if direction == "prev" else "ASC"
+        base_query += f" ORDER BY id {order} LIMIT %s"
+        params.append(limit)
 
-        username, port, database, endpoint = self.get_database_credentials()
-
-        database_token = rds_client.generate_db_auth_token(
-            DBHostname=endpoint,
-            Port=port,
-            DBUsername=username,
-            Region=os.environ["AWS_REGION"],
-        )
+        return base_query, params
 
-        return pymysql.connect(
-            host=endpoint,
-            user=username,
-            passwd=database_token,
-            port=int(port),
-            db=database,
-            autocommit=True,
-            ssl={"ssl": True},
-        )
+    def make_connection(self):
+        cnx = connection_manager.get_connection()
+        logger.info("DB connection stats: %s", connection_manager.stats)
+        return cnx
 
     def log_err(self, errmsg):
         logger.error(errmsg)
@@ -98,25 +128,68 @@ class HTDatabase:
 logger.info("Cold start complete.")
 
 
+@conditional_get
 def handler(event, context):
     db = HTDatabase()
 
-    queryStringParameters = event.get("queryStringParameters", {})
+    queryStringParameters = event.get("queryStringParameters") or {}
 
     # Extract values or set to None if not provided
     id = queryStringParameters.get("id")
     title = queryStringParameters.get("title")
+    # Comma separated list of ids, always answered with a list
+    ids = [i.strip() for i in (queryStringParameters.get("ids") or "").split(",") if i.strip()]
 
     page = queryStringParameters.get("page")
     per_page = queryStringParameters.get("per_page")
 
+    # Listing mode: a keyset-paginated page of articles, only the requested fields
+    cursor_param = queryStringParameters.get("cursor")
+    fields = queryStringParameters.get("fields")
+    if not (id or ids or title) and page is None and (cursor_param or per_page or fields):
+        return handle_listing(db, event, queryStringParameters)
+    if len(ids) > MAX_IDS:
+        # Checked before the cache, which could otherwise answer an oversized request
+        return db.log_err(f"[ERROR]: At most {MAX_IDS} ids can be requested at once.")
+
     if not id:
         logger.info("No id provided.")
     if not title:
         logger.info("No title provided.")
 
+    # Source articles never change, so lookups by id are served from the cache
+    # and only the articles it does not hold are read from the database
+    cacheable = bool(ids or id) and not title and page is None
+    cached = {}
+    ids_requested = ids or [id]
+    if cacheable:
+        # Which articles were asked for is all the tag of such a response depends on
+        unmodified = not_modified(
+            event,
+            articles_etag(queryStringParameters, ids_requested),
+            {
+                "Access-Control-Allow-Origin": "https://mtdock.com",
+                "Access-Control-Allow-Methods": "GET,OPTIONS",
+            },
+        )
+        if unmodified is not None:
+            return unmodified
+        for article_id in ids or [id]:
+            entry = read_cache.get(read_cache.key("HighTimes", article_id))
+            if entry is not None:
+                cached[str(article_id)] = entry
+        missing = [article_id for article_id in ids or [id] if str(article_id) not in cached]
+        logger.info("Cache stats: %s", read_cache.stats)
+        if not missing:
+            return cached_articles_response(cached, ids_requested, bool(ids), queryStringParameters)
+        if ids:
+            ids = missing
+
     try:
-        query, params = db.construct_query(title=title, id=id, page=page, per_page=per_page)
+        query, params = db.construct_query(title=title, id=id, ids=ids, page=page, per_page=per_page)
+        validator_query, validator_params = db.construct_query(
+            title=title, id=id, ids=ids, page=page, per_page=per_page, validators=True
+        )
     except Exception as e:
         logger.error(f"[ERROR]: Cannot construct query. {e}")
         return {
@@ -132,6 +205,27 @@ def handler(event, context):
         cnx = db.make_connection()
         cursor = cnx.cursor()
 
+        if not cacheable and request_header(event, "if-none-match"):
+            # The ids a title or page resolves to tell whether the client's copy is current
+            try:
+                cursor.execute(validator_query, validator_params)
+                etag = articles_etag(queryStringParameters, [row[0] for row in cursor.fetchall()])
+            except:
+                return db.log_err(
+                    "[ERROR]: Cannot read the validators.\n{}".format(traceback.format_exc())
+                )
+            unmodified = not_modified(
+                event,
+                etag,
+                {
+                    "Access-Control-Allow-Origin": "https://mtdock.com",
+                    "Access-Control-Allow-Methods": "GET,OPTIONS",
+                },
+            )
+            if unmodified is not None:
+                cursor.close()
+                return unmodified
+
         try:
             cursor.execute(query, params)
         except:
@@ -149,11 +243,30 @@ def handler(event, context):
                 )
             )
 
+        if cacheable:
+            # Put the cached articles back in, in the order they were asked for
+            for row in result:
+                cached[str(row[0])] = {"id": row[0], "title": row[1], "text": row[2]}
+            result = [
+                (entry["id"], entry["title"], entry["text"])
+                for entry in (cached.get(str(article_id)) for article_id in ids_requested)
+                if entry is not None
+            ]
+        if cacheable:
+            for row in result:
+                read_cache.put(
+                    read_cache.key("HighTimes", row[0]),
+                    {"id": row[0], "title": row[1], "text": row[2]},
+                    {},
+                    ttl=None,
+                )
+
+        etag = articles_etag(queryStringParameters, [row[0] for row in result])
         entries = []
 
         # If there's a result, process it
         if result:
-            if len(result) == 1:
+            if len(result) == 1 and not ids:
                 # If there's only one result, return it as a dictionary
                 entry = {"id": result[0][0], "title": result[0][1], "text": result[0][2]}
                 return {
@@ -161,6 +274,7 @@ def handler(event, context):
                     "headers": {
                         "Access-Control-Allow-Origin": "https://mtdock.com",
                         "Access-Control-Allow-Methods": "GET,OPTIONS",
+                        "ETag": etag,
                     },
                     "statusCode": 200,
                     "isBase64Encoded": False,  # Boolean value, not a string
@@ -172,12 +286,13 @@ def handler(event, context):
                     entries.append(entry)
         else:
             # Handle the case when there are no results
-            entry = {}
+            entry = [] if ids else {}
             return {
                 "body": json.dumps(entry),  # Serialize dictionary to JSON
                 "headers": {
                     "Access-Control-Allow-Origin": "https://mtdock.com",
                     "Access-Control-Allow-Methods": "GET,OPTIONS",
+                    "ETag": etag,
                 },
                 "statusCode": 200,
                 "isBase64Encoded": False,  # Boolean value, not a string
@@ -189,6 +304,7 @@ def handler(event, context):
             "headers": {
                 "Access-Control-Allow-Origin": "https://mtdock.com",
                 "Access-Control-Allow-Methods": "GET,OPTIONS",
+                "ETag": etag,
             },
             "statusCode": 200,
             "isBase64Encoded": False,  # Boolean value, not a string
@@ -202,11 +318,110 @@ def handler(event, context):
             )
         )
 
-    finally:
-        try:
-            cnx.close()
-        except:
-            pass
+
+def handle_listing(db, event, queryStringParameters):
+    try:
+        fields = parse_fields(queryStringParameters.get("fields"))
+        per_page = min(max(int(queryStringParameters.get("per_page") or DEFAULT_PER_PAGE), 1), MAX_PER_PAGE)
+        key, direction = None, "next"
+        if queryStringParameters.get("cursor"):
+            key, direction = decode_cursor(queryStringParameters["cursor"])
+    except Exception as e:
+        return db.log_err(f"[ERROR]: Invalid listing parameters. {e}")
+
+    # One extra row tells whether there is a further page
+    query, params = db.construct_listing_query(fields, key, direction, per_page + 1)
+    try:
+        cnx = db.make_connection()
+        cursor = cnx.cursor()
+
+        total = None
+        if queryStringParameters.get("include_total") in ("1", "true", "True"):
+            # Counting scans the table, so the count is shared for a while instead
+            count_key = read_cache.key("HighTimes", "count")
+            total = read_cache.get(count_key)
+            if total is None:
+                cursor.execute("SELECT COUNT(*) FROM HighTimes")
+                total = cursor.fetchone()[0]
+                read_cache.put(count_key, total, {}, ttl=TOTAL_COUNT_TTL_SECONDS)
+
+        if request_header(event, "if-none-match"):
+            # The page's ids, read from the primary key alone, tell whether the client's copy is current
+            id_query, id_params = db.construct_listing_query(["id"], key, direction, per_page + 1)
+            cursor.execute(id_query, id_params)
+            etag = articles_etag(queryStringParameters, [row[0] for row in cursor.fetchall()], total)
+            unmodified = not_modified(
+                event,
+                etag,
+                {
+                    "Access-Control-Allow-Origin": "https://mtdock.com",
+                    "Access-Control-Allow-Methods": "GET,OPTIONS",
+                },
+            )
+            if unmodified is not None:
+                cursor.close()
+                return unmodified
+
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    except:
+        return db.log_err(
+            "[ERROR]: Cannot read the article listing.\n{}".format(traceback.format_exc())
+        )
+
+    etag = articles_etag(queryStringParameters, [row[0] for row in rows], total)
+    backwards = direction == "prev"
+    has_more = len(rows) > per_page
+    rows = list(rows[:per_page])
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        # Walking one way there is always a page back where we came from
+        if has_more or backwards:
+            next_cursor = encode_cursor(rows[-1][0], "next")
+        if (has_more and backwards) or (key is not None and not backwards):
+            prev_cursor = encode_cursor(rows[0][0], "prev")
+
+    body = {
+        "items": [dict(zip(fields, row)) for row in rows],
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+    if total is not None:
+        body["total"] = total
+    return {
+        "body": json.dumps(body),
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "GET,OPTIONS",
+            "ETag": etag,
+        },
+        "statusCode": 200,
+        "isBase64Encoded": False,
+    }
+
+
+def articles_etag(queryStringParameters, article_ids, total=None):
+    """Source articles never change, so a response is identified by the articles in it."""
+    return make_etag(queryStringParameters, [str(article_id) for article_id in article_ids], total)
+
+
+def cached_articles_response(cached, requested, as_list, queryStringParameters):
+    entries = [cached[str(article_id)] for article_id in requested]
+    return {
+        "body": json.dumps(entries if as_list else entries[0]),
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "GET,OPTIONS",
+            "ETag": articles_etag(queryStringParameters, requested),
+        },
+        "statusCode": 200,
+        "isBase64Encoded": False,
+    }
 
 
 # if __name__ == "__main__":
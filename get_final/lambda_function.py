@@ -1,34 +1,75 @@
-import pymysql
 import logging
 import traceback
 import os
 import json
+import base64
 # import pdb
-import boto3
+
+from mtdock.cache import LISTING_GENERATION, ReadCache, make_cache_store
+from mtdock.conditional import conditional_get, make_etag, not_modified, request_header
+from mtdock.database import connection_manager
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
+read_cache = ReadCache(make_cache_store())
+if read_cache.store is None:
+    logger.warning("Neither CACHE_TABLE nor CACHE_DIR is set, translation reads are not cached.")
+
+
+# Upper bound for the limit of a paginated request
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 50))
+# What a response's ETag is built from
+VALIDATOR_COLUMNS = "text_id, checksum"
+
+
+def encode_cursor(key, direction):
+    """Opaque cursor for the page after (next) or before (prev) the row with this key."""
+    data = json.dumps({"k": key, "d": direction}).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    if data.get("d") not in ("next", "prev") or data.get("k") in (None, ""):
+        raise ValueError("Malformed cursor")
+    return data["k"], data["d"]
+
+
 class HTDatabase:
     def construct_query(self, **kwargs):
-        base_query = """
-        SELECT text_id, edited_content   
+        # Revalidation reads only the ETag's validators of the same rows, see row_validators
+        columns = VALIDATOR_COLUMNS if kwargs.get("validators") else "text_id, edited_content, checksum"
+        base_query = f"""
+        SELECT {columns}
         FROM edited_translations 
         """
         conditions = []
         params = []
 
         if kwargs.get("title"):
-            conditions.append("JSON_EXTRACT(edited_translations.edited_content, '$.title') = %s")
-            params.append(kwargs["title"])
+            # The indexed prefix column narrows the rows, the JSON comparison keeps long titles exact
+            conditions.append(
+                "edited_translations.content_title = LEFT(%s, 255) "
+                "AND JSON_EXTRACT(edited_translations.edited_content, '$.title') = %s"
+            )
+            params.extend([kwargs["title"], kwargs["title"]])
 
+        # Keyset position of a cursor, text_id is unique in edited_translations
+        if kwargs.get("key") is not None:
+            operator = "<" if kwargs.get("direction") == "prev" else ">"
+            conditions.append(f"edited_translations.text_id {operator} %s")
+            params.append(kwargs["key"])
         # Adjust the id condition based on direction
-        if kwargs.get("id"):
+        elif kwargs.get("id"):
             if kwargs.get("direction") == "next":
                 conditions.append("edited_translations.text_id > %s")
             elif kwargs.get("direction") == "prev":
                 conditions.append("edited_translations.text_id < %s")
+            elif kwargs.get("limit"):
+                # A page requested from an id starts at that id
+                conditions.append("edited_translations.text_id >= %s")
             else:
                 conditions.append("edited_translations.text_id = %s")
             params.append(kwargs["id"])
@@ -40,53 +81,19 @@ class HTDatabase:
         if conditions:
             base_query += " WHERE " + " AND ".join(conditions)
 
-        base_query += " LIMIT 1"
+        # Walking backwards reads the primary key in reverse, so the adjacent rows come first
+        order = "DESC" if kwargs.get("direction") == "prev" else "ASC"
+        base_query += f" ORDER BY edited_translations.text_id {order}"
+        base_query += " LIMIT %s"
+        params.append(kwargs.get("limit") or 1)
 
         return base_query, params
 
 
-    def get_database_credentials(self):
-        secret = self.get_secret()
-        secret_dict = json.loads(secret)
-        return (
-            secret_dict.get("username"),
-            secret_dict.get("port"),
-            secret_dict.get("database"),
-            secret_dict.get("host"),
-        )
-
-    def get_secret(self):
-        secret_name = "HighTimesDB"
-        region_name = os.environ["AWS_REGION"]
-        session = boto3.session.Session()
-        client = session.client(service_name="secretsmanager", region_name=region_name)
-        try:
-            get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-            return get_secret_value_response["SecretString"]
-        except Exception as e:
-            raise e
-
     def make_connection(self):
-        rds_client = boto3.client("rds")
-
-        username, port, database, endpoint = self.get_database_credentials()
-
-        database_token = rds_client.generate_db_auth_token(
-            DBHostname=endpoint,
-            Port=port,
-            DBUsername=username,
-            Region=os.environ["AWS_REGION"],
-        )
-
-        return pymysql.connect(
-            host=endpoint,
-            user=username,
-            passwd=database_token,
-            port=int(port),
-            db=database,
-            autocommit=True,
-            ssl={"ssl": True},
-        )
+        cnx = connection_manager.get_connection()
+        logger.info("DB connection stats: %s", connection_manager.stats)
+        return cnx
 
     def log_err(self, errmsg):
         logger.error(errmsg)
@@ -104,9 +111,10 @@ class HTDatabase:
 logger.info("Cold start complete.")
 
 
+@conditional_get
 def lambda_handler(event, context):
     db = HTDatabase()
-    queryStringParameters = event.get("queryStringParameters", {})
+    queryStringParameters = event.get("queryStringParameters") or {}
 
     # Extract values or set to None if not provided
     id = queryStringParameters.get("id")
@@ -115,13 +123,54 @@ def lambda_handler(event, context):
     providers_id = queryStringParameters.get("providers_id") 
     direction = queryStringParameters.get("direction")
 
+    # Paginated mode: a page of limit items with cursors, otherwise the single legacy item
+    cursor_param = queryStringParameters.get("cursor")
+    limit = queryStringParameters.get("limit")
+    paginated = bool(cursor_param or limit)
+    key = None
+    try:
+        if paginated:
+            limit = min(max(int(limit or MAX_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        if cursor_param:
+            key, direction = decode_cursor(cursor_param)
+    except Exception as e:
+        return db.log_err(f"[ERROR]: Invalid limit or cursor. {e}")
+
     if not id:
         logger.info("No id provided.")
     if not title:
         logger.info("No title provided.")
 
+    # Lookups by title are not cached, everything else is keyed by (table, id, lang, provider)
+    cache_key = generations = None
+    if not title:
+        cache_key = read_cache.key(
+            "edited_translations", id, None, providers_id, direction=direction, cursor=cursor_param, limit=limit
+        )
+        cached = read_cache.get(cache_key)
+        logger.info("Cache stats: %s", read_cache.stats)
+        if cached is not None:
+            # conditional_get answers If-None-Match from the cached tag
+            return ok_response(cached["body"], cached["etag"])
+        # Read before the query, so a write racing with it leaves the entry invalid
+        if id and not direction and not paginated:
+            generations = read_cache.generations([id])
+        else:
+            # Which articles a navigation or page reaches changes with any write
+            generations = read_cache.generations([LISTING_GENERATION])
+
     try:
-        query, params = db.construct_query(title=title, id=id, direction=direction, providers_id=providers_id)
+        query_args = dict(
+            title=title,
+            id=id,
+            direction=direction,
+            providers_id=providers_id,
+            key=key,
+            # One extra row tells whether there is a further page
+            limit=limit + 1 if paginated else None,
+        )
+        query, params = db.construct_query(**query_args)
+        validator_query, validator_params = db.construct_query(validators=True, **query_args)
     except Exception as e:
         logger.error(f"[ERROR]: Cannot construct query. {e}")
         return {
@@ -137,6 +186,27 @@ def lambda_handler(event, context):
         cnx = db.make_connection()
         cursor = cnx.cursor()
 
+        if request_header(event, "if-none-match"):
+            # Checksums tell whether the client's copy is current without the content
+            try:
+                cursor.execute(validator_query, validator_params)
+                etag = make_etag(queryStringParameters, [list(row) for row in cursor.fetchall()])
+            except:
+                return db.log_err(
+                    "[ERROR]: Cannot read the validators.\n{}".format(traceback.format_exc())
+                )
+            unmodified = not_modified(
+                event,
+                etag,
+                {
+                    "Access-Control-Allow-Origin": "https://mtdock.com",
+                    "Access-Control-Allow-Methods": "GET,OPTIONS",
+                },
+            )
+            if unmodified is not None:
+                cursor.close()
+                return unmodified
+
         try:
             cursor.execute(query, params)
         except:
@@ -153,25 +223,19 @@ def lambda_handler(event, context):
                     traceback.format_exc()
                 )
             )
+        etag = make_etag(queryStringParameters, [row_validators(row) for row in result])
+
+        if paginated:
+            response = page_response(result, limit, direction, bool(key is not None or id))
+            return cache_response(cache_key, response, generations, etag)
 
         if cursor.rowcount == 0:
             return db.log_err("[ERROR] no result for given id or title")
 
-        loaded = json.loads(result[0][1])
-        # If there's a result, process it
-        if result:
-            # Convert the tuple to a dictionary
-            entry = {"id": result[0][0], "text": loaded}
+        # Convert the tuple to a dictionary
+        entry = {"id": result[0][0], "text": json.loads(result[0][1])}
 
-        return {
-            "body": json.dumps(entry),  # Serialize list to JSON
-            "headers": {
-                "Access-Control-Allow-Origin": "https://mtdock.com",
-                "Access-Control-Allow-Methods": "GET,OPTIONS",
-            },
-            "statusCode": 200,
-            "isBase64Encoded": "false",
-        }
+        return cache_response(cache_key, ok_response(json.dumps(entry)), generations, etag)
 
     except:
         return db.log_err(
@@ -180,9 +244,61 @@ def lambda_handler(event, context):
             )
         )
 
-    finally:
-        try:
-            cnx.close()
-        except:
-            pass
 
+def ok_response(body, etag=None):
+    response = {
+        "body": body,
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "GET,OPTIONS",
+        },
+        "statusCode": 200,
+        "isBase64Encoded": "false",
+    }
+    if etag:
+        response["headers"]["ETag"] = etag
+    return response
+
+
+def row_validators(row):
+    """The VALIDATOR_COLUMNS of a content row, in their order."""
+    return [row[0], row[2]]
+
+
+def cache_response(key, response, generations, etag):
+    """Tag a successful response and cache it with its tag, built from data at these generations."""
+    if response["statusCode"] == 200:
+        response["headers"]["ETag"] = etag
+        if key is not None:
+            read_cache.put(key, {"body": response["body"], "etag": etag}, generations)
+    return response
+
+
+def page_response(rows, limit, direction, positioned):
+    """Build a page from up to limit + 1 rows read in the walking direction."""
+    backwards = direction == "prev"
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if backwards:
+        rows.reverse()
+
+    items = [{"id": row[0], "text": json.loads(row[1])} for row in rows]
+    next_cursor = prev_cursor = None
+    if rows:
+        # Walking one way there is always a page back where we came from
+        if has_more or backwards:
+            next_cursor = encode_cursor(rows[-1][0], "next")
+        if (has_more and backwards) or (positioned and not backwards):
+            prev_cursor = encode_cursor(rows[0][0], "prev")
+
+    return {
+        "body": json.dumps(
+            {"items": items, "limit": limit, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+        ),
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "GET,OPTIONS",
+        },
+        "statusCode": 200,
+        "isBase64Encoded": "false",
+    }
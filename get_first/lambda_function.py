@@ -1,19 +1,53 @@
-import pymysql
 import logging
 import traceback
 import os
 import json
+import base64
 # import pdb
-import boto3
+
+from mtdock.cache import LISTING_GENERATION, ReadCache, make_cache_store
+from mtdock.conditional import conditional_get, make_etag, not_modified, request_header
+from mtdock.database import connection_manager
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
+read_cache = ReadCache(make_cache_store())
+if read_cache.store is None:
+    logger.warning("Neither CACHE_TABLE nor CACHE_DIR is set, translation reads are not cached.")
+
+
+# Upper bound for the limit of a paginated request
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 50))
+PROVIDERS = {1: "AWS", 2: "GCP", 3: "AZURE"}
+# What a response's ETag is built from. Source articles are never rewritten after
+# import, so a bundle's title and text are covered by its article ids
+VALIDATOR_COLUMNS = "translations.text_id, translations.translation_id, translations.checksum, HighTimes.status"
+
+
+def encode_cursor(key, direction):
+    """Opaque cursor for the page after (next) or before (prev) the row with this key."""
+    data = json.dumps({"k": key, "d": direction}).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    if data.get("d") not in ("next", "prev") or len(data.get("k") or []) != 2:
+        raise ValueError("Malformed cursor")
+    return data["k"], data["d"]
+
+
 class HTDatabase:
     def construct_query(self, **kwargs):
-        base_query = """
-        SELECT status, translations.content, lang_to, lang_from, providers_id, text_id
+        # Revalidation reads only the ETag's validators of the same rows, see row_validators
+        columns = VALIDATOR_COLUMNS if kwargs.get("validators") else (
+            "status, translations.content, lang_to, lang_from, providers_id, text_id, translation_id, "
+            "translations.checksum"
+        )
+        base_query = f"""
+        SELECT {columns}
         FROM translations
         INNER JOIN HighTimes ON translations.text_id = HighTimes.id
         """
@@ -21,15 +55,31 @@ class HTDatabase:
         params = []
 
         if kwargs.get("title"):
-            conditions.append("JSON_EXTRACT(translations.content, '$.title') = %s")
-            params.append(kwargs["title"])
-
+            # The indexed prefix column narrows the rows, the JSON comparison keeps long titles exact
+            conditions.append(
+                "translations.content_title = LEFT(%s, 255) "
+                "AND JSON_EXTRACT(translations.content, '$.title') = %s"
+            )
+            params.extend([kwargs["title"], kwargs["title"]])
+
+        # Keyset position of a cursor, (text_id, translation_id) orders rows uniquely
+        if kwargs.get("key"):
+            text_id, translation_id = kwargs["key"]
+            operator = "<" if kwargs.get("direction") == "prev" else ">"
+            conditions.append(
+                f"(translations.text_id {operator} %s OR "
+                f"(translations.text_id = %s AND translations.translation_id {operator} %s))"
+            )
+            params.extend([text_id, text_id, translation_id])
         # Adjust the id condition based on direction
-        if kwargs.get("id"):
+        elif kwargs.get("id"):
             if kwargs.get("direction") == "next":
                 conditions.append("translations.text_id > %s")
             elif kwargs.get("direction") == "prev":
                 conditions.append("translations.text_id < %s")
+            elif kwargs.get("limit"):
+                # A page requested from an id starts at that id
+                conditions.append("translations.text_id >= %s")
             else:
                 conditions.append("translations.text_id = %s")
             params.append(kwargs["id"])
@@ -46,52 +96,54 @@ class HTDatabase:
         if conditions:
             base_query += " WHERE " + " AND ".join(conditions)
 
-        base_query += " LIMIT 1"
+        # Walking backwards reads the index in reverse, so the adjacent rows come first;
+        # (lang_to, providers_id, text_id) serves both orders
+        order = "DESC" if kwargs.get("direction") == "prev" else "ASC"
+        base_query += f" ORDER BY translations.text_id {order}, translations.translation_id {order}"
+        base_query += " LIMIT %s"
+        params.append(kwargs.get("limit") or 1)
 
         return base_query, params
 
-    def get_database_credentials(self):
-        secret = self.get_secret()
-        secret_dict = json.loads(secret)
-        return (
-            secret_dict.get("username"),
-            secret_dict.get("port"),
-            secret_dict.get("database"),
-            secret_dict.get("host"),
-        )
+    def construct_bundle_query(self, **kwargs):
+        """Source article plus every provider's translation for up to limit articles."""
+        page_conditions = ["lang_to = %s"]
+        params = [kwargs["lang_to"]]
 
-    def get_secret(self):
-        secret_name = "HighTimesDB"
-        region_name = os.environ["AWS_REGION"]
-        session = boto3.session.Session()
-        client = session.client(service_name="secretsmanager", region_name=region_name)
-        try:
-            get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-            return get_secret_value_response["SecretString"]
-        except Exception as e:
-            raise e
-
-    def make_connection(self):
-        rds_client = boto3.client("rds")
+        if kwargs.get("id"):
+            # Without a direction the id is looked up exactly, a missing one matches nothing
+            operator = {"next": ">", "prev": "<"}.get(kwargs.get("direction"), "=")
+            page_conditions.append(f"text_id {operator} %s")
+            params.append(kwargs["id"])
 
-        username, port, database, endpoint = self.get_database_credentials()
+        order = "DESC" if kwargs.get("direction") == "prev" else "ASC"
+        params.extend([kwargs.get("limit") or 1, kwargs["lang_to"]])
 
-        database_token = rds_client.generate_db_auth_token(
-            DBHostname=endpoint,
-            Port=port,
-            DBUsername=username,
-            Region=os.environ["AWS_REGION"],
+        # Columns up to checksum line up with construct_query so to_entry and row_validators read both
+        columns = VALIDATOR_COLUMNS if kwargs.get("validators") else (
+            "HighTimes.status, translations.content, translations.lang_to, translations.lang_from, "
+            "translations.providers_id, translations.text_id, translations.translation_id, "
+            "translations.checksum, HighTimes.title, HighTimes.BodyText"
         )
+        base_query = f"""
+        SELECT {columns}
+        FROM (
+            SELECT DISTINCT text_id FROM translations
+            WHERE {" AND ".join(page_conditions)}
+            ORDER BY text_id {order}
+            LIMIT %s
+        ) AS page
+        INNER JOIN HighTimes ON HighTimes.id = page.text_id
+        INNER JOIN translations ON translations.text_id = page.text_id AND translations.lang_to = %s
+        ORDER BY page.text_id {order}, translations.providers_id
+        """
 
-        return pymysql.connect(
-            host=endpoint,
-            user=username,
-            passwd=database_token,
-            port=int(port),
-            db=database,
-            autocommit=True,
-            ssl={"ssl": True},
-        )
+        return base_query, params
+
+    def make_connection(self):
+        cnx = connection_manager.get_connection()
+        logger.info("DB connection stats: %s", connection_manager.stats)
+        return cnx
 
     def log_err(self, errmsg):
         logger.error(errmsg)
@@ -105,12 +157,23 @@ class HTDatabase:
             "isBase64Encoded": "false",
         }
 
+    def to_entry(self, row):
+        return {
+            "id": row[5],
+            "status": row[0],
+            "text": json.loads(row[1]),
+            "lang_to": row[2],
+            "lang_from": row[3],
+            "providers_id": PROVIDERS[row[4]],
+        }
+
 
 logger.info("Cold start complete.")
 
+@conditional_get
 def lambda_handler(event, context):
     db = HTDatabase()
-    queryStringParameters = event.get("queryStringParameters", {})
+    queryStringParameters = event.get("queryStringParameters") or {}
 
     # Extract values or set to None if not provided
     id = queryStringParameters.get("id")
@@ -120,13 +183,66 @@ def lambda_handler(event, context):
     direction = queryStringParameters.get("direction")
     lang_to = queryStringParameters.get("to_lang")
 
+    # Bundle mode: the source and all providers' translations of the next articles in one response
+    bundle = queryStringParameters.get("bundle") in ("1", "true", "True")
+    if bundle and not lang_to:
+        return db.log_err("[ERROR]: A bundle needs a to_lang.")
+
+    # Paginated mode: a page of limit items with cursors, otherwise the single legacy item
+    cursor_param = queryStringParameters.get("cursor")
+    limit = queryStringParameters.get("limit")
+    paginated = bool(cursor_param or limit)
+    key = None
+    try:
+        if paginated or bundle:
+            # A bundle is a single article unless a prefetch window is asked for
+            limit = min(max(int(limit or (1 if bundle else MAX_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        if cursor_param:
+            key, direction = decode_cursor(cursor_param)
+    except Exception as e:
+        return db.log_err(f"[ERROR]: Invalid limit or cursor. {e}")
+
     if not id:
         logger.info("No id provided.")
     if not title:
         logger.info("No title provided.")
 
+    # Lookups by title are not cached, everything else is keyed by (table, id, lang, provider)
+    cache_key = generations = None
+    if not title:
+        cache_key = read_cache.key(
+            "translations", id, lang_to, providers_id, direction=direction, cursor=cursor_param, limit=limit, bundle=bundle or None
+        )
+        cached = read_cache.get(cache_key)
+        logger.info("Cache stats: %s", read_cache.stats)
+        if cached is not None:
+            # conditional_get answers If-None-Match from the cached tag
+            return ok_response(cached["body"], cached["etag"])
+        # Read before the query, so a write racing with it leaves the entry invalid
+        if id and not direction and not paginated and not bundle:
+            generations = read_cache.generations([id])
+        else:
+            # Which articles a navigation or page reaches changes with any write
+            generations = read_cache.generations([LISTING_GENERATION])
+
     try:
-        query, params = db.construct_query(title=title, id=id, direction=direction, providers_id=providers_id, lang_to=lang_to)
+        if bundle:
+            construct = db.construct_bundle_query
+            query_args = dict(id=id, direction=direction, lang_to=lang_to, limit=limit)
+        else:
+            construct = db.construct_query
+            query_args = dict(
+                title=title,
+                id=id,
+                direction=direction,
+                providers_id=providers_id,
+                lang_to=lang_to,
+                key=key,
+                # One extra row tells whether there is a further page
+                limit=limit + 1 if paginated else None,
+            )
+        query, params = construct(**query_args)
+        validator_query, validator_params = construct(validators=True, **query_args)
     except Exception as e:
         logger.error(f"[ERROR]: Cannot construct query. {e}")
         return {
@@ -142,6 +258,27 @@ def lambda_handler(event, context):
         cnx = db.make_connection()
         cursor = cnx.cursor()
 
+        if request_header(event, "if-none-match"):
+            # Checksums and statuses tell whether the client's copy is current without the content
+            try:
+                cursor.execute(validator_query, validator_params)
+                etag = make_etag(queryStringParameters, [list(row) for row in cursor.fetchall()])
+            except:
+                return db.log_err(
+                    "[ERROR]: Cannot read the validators.\n{}".format(traceback.format_exc())
+                )
+            unmodified = not_modified(
+                event,
+                etag,
+                {
+                    "Access-Control-Allow-Origin": "https://mtdock.com",
+                    "Access-Control-Allow-Methods": "GET,OPTIONS",
+                },
+            )
+            if unmodified is not None:
+                cursor.close()
+                return unmodified
+
         try:
             cursor.execute(query, params)
         except:
@@ -158,43 +295,26 @@ def lambda_handler(event, context):
                     traceback.format_exc()
                 )
             )
-       
+        etag = make_etag(queryStringParameters, [row_validators(row) for row in result])
+
+        if bundle:
+            if id and not direction and not result:
+                return not_found_response(f"[ERROR]: No {lang_to} translation of article {id}.")
+            return cache_response(cache_key, bundle_response(db, result, limit), generations, etag)
+
+        if paginated:
+            response = page_response(db, result, limit, direction, bool(key or id))
+            return cache_response(cache_key, response, generations, etag)
+
         if cursor.rowcount == 0:
             return db.log_err("[ERROR] no result for given id or title")
 
-        loaded = json.loads(result[0][1])
-        
-        provider = None
-
-        match result[0][4]:
-            case 1:
-                provider = "AWS"
-            case 2:
-                provider = "GCP"
-            case 3:
-                provider = "AZURE"
-            case _:
-                return db.log_err(
-                "[ERROR]: Cannot retrieve provider.\n{}".format(
-                    traceback.format_exc()
-                )
-            )
+        if result[0][4] not in PROVIDERS:
+            return db.log_err("[ERROR]: Cannot retrieve provider.")
 
-        # If there's a result, process it
-        if result:
-            # Convert the tuple to a dictionary
-            entry = {"id": result[0][5], "status": result[0][0], "text": loaded, "lang_to": result[0][2], "lang_from": result[0][3], "providers_id": provider}
-        else:
-            entry = {}
-        return {
-            "body": json.dumps(entry),  # Serialize list to JSON
-            "headers": {
-                "Access-Control-Allow-Origin": "https://mtdock.com",
-                "Access-Control-Allow-Methods": "GET,OPTIONS",
-            },
-            "statusCode": 200,
-            "isBase64Encoded": "false",
-        }
+        # Convert the tuple to a dictionary
+        entry = db.to_entry(result[0])
+        return cache_response(cache_key, ok_response(json.dumps(entry)), generations, etag)
 
     except:
         return db.log_err(
@@ -203,11 +323,104 @@ def lambda_handler(event, context):
             )
         )
 
-    finally:
-        try:
-            cnx.close()
-        except:
-            pass
+
+def ok_response(body, etag=None):
+    response = {
+        "body": body,
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "GET,OPTIONS",
+        },
+        "statusCode": 200,
+        "isBase64Encoded": "false",
+    }
+    if etag:
+        response["headers"]["ETag"] = etag
+    return response
+
+
+def row_validators(row):
+    """The VALIDATOR_COLUMNS of a content row, in their order."""
+    return [row[5], row[6], row[7], row[0]]
+
+
+def not_found_response(errmsg):
+    logger.info(errmsg)
+    return {
+        "body": errmsg,
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "GET,OPTIONS",
+        },
+        "statusCode": 404,
+        "isBase64Encoded": "false",
+    }
+
+
+def cache_response(key, response, generations, etag):
+    """Tag a successful response and cache it with its tag, built from data at these generations."""
+    if response["statusCode"] == 200:
+        response["headers"]["ETag"] = etag
+        if key is not None:
+            read_cache.put(key, {"body": response["body"], "etag": etag}, generations)
+    return response
+
+
+def page_response(db, rows, limit, direction, positioned):
+    """Build a page from up to limit + 1 rows read in the walking direction."""
+    backwards = direction == "prev"
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if backwards:
+        rows.reverse()
+
+    items = [db.to_entry(row) for row in rows if row[4] in PROVIDERS]
+    next_cursor = prev_cursor = None
+    if rows:
+        first, last = [rows[0][5], rows[0][6]], [rows[-1][5], rows[-1][6]]
+        # Walking one way there is always a page back where we came from
+        if has_more or backwards:
+            next_cursor = encode_cursor(last, "next")
+        if (has_more and backwards) or (positioned and not backwards):
+            prev_cursor = encode_cursor(first, "prev")
+
+    return {
+        "body": json.dumps(
+            {"items": items, "limit": limit, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+        ),
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "GET,OPTIONS",
+        },
+        "statusCode": 200,
+        "isBase64Encoded": "false",
+    }
+
+def bundle_response(db, rows, limit):
+    """Group rows into one bundle per article, nearest article first."""
+    bundles = []
+    for row in rows:
+        if not bundles or bundles[-1]["id"] != row[5]:
+            bundles.append(
+                {
+                    "id": row[5],
+                    "lang_to": row[2],
+                    "article": {"title": row[8], "text": row[9]},
+                    "translations": {name: None for name in PROVIDERS.values()},
+                }
+            )
+        if row[4] in PROVIDERS:
+            bundles[-1]["translations"][PROVIDERS[row[4]]] = db.to_entry(row)
+
+    return {
+        "body": json.dumps({"bundles": bundles, "limit": limit}),
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "GET,OPTIONS",
+        },
+        "statusCode": 200,
+        "isBase64Encoded": "false",
+    }
 
 # if __name__ == "__main__":
 #     event = {
@@ -1,57 +1,27 @@
-import pymysql
 import logging
 import traceback
 import os
 import json
+import time
 # import pdb
-import boto3
+
+from mtdock.cache import CACHE_TTL_SECONDS, LISTING_GENERATION, ReadCache, make_cache_store
+from mtdock.conditional import conditional_get, make_etag, not_modified
+from mtdock.database import connection_manager
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-class HTDatabase:
-    def get_database_credentials(self):
-        secret = self.get_secret()
-        secret_dict = json.loads(secret)
-        return (
-            secret_dict.get("username"),
-            secret_dict.get("port"),
-            secret_dict.get("database"),
-            secret_dict.get("host"),
-        )
 
-    def get_secret(self):
-        secret_name = "HighTimesDB"
-        region_name = os.environ["AWS_REGION"]
-        session = boto3.session.Session()
-        client = session.client(service_name="secretsmanager", region_name=region_name)
-        try:
-            get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-            return get_secret_value_response["SecretString"]
-        except Exception as e:
-            raise e
+# Nothing is cached here, the shared store only supplies the listing generation for ETags
+read_cache = ReadCache(make_cache_store())
 
-    def make_connection(self):
-        rds_client = boto3.client("rds")
 
-        username, port, database, endpoint = self.get_database_credentials()
-
-        database_token = rds_client.generate_db_auth_token(
-            DBHostname=endpoint,
-            Port=port,
-            DBUsername=username,
-            Region=os.environ["AWS_REGION"],
-        )
-
-        return pymysql.connect(
-            host=endpoint,
-            user=username,
-            passwd=database_token,
-            port=int(port),
-            db=database,
-            autocommit=True,
-            ssl={"ssl": True},
-        )
+class HTDatabase:
+    def make_connection(self):
+        cnx = connection_manager.get_connection()
+        logger.info("DB connection stats: %s", connection_manager.stats)
+        return cnx
 
     def log_err(self, errmsg):
         logger.error(errmsg)
@@ -69,9 +39,26 @@ class HTDatabase:
 logger.info("Cold start complete.")
 
 
+@conditional_get
 def lambda_handler(event, context):
     db = HTDatabase()
-    
+
+    etag = None
+    if read_cache.store is not None:
+        # Every status change comes from a writer that bumps the listing generation. The
+        # time bucket bounds how long a failed bump can keep a stale copy current
+        etag = make_etag(read_cache.generations([LISTING_GENERATION]), int(time.time() // CACHE_TTL_SECONDS))
+        unmodified = not_modified(
+            event or {},
+            etag,
+            {
+                "Access-Control-Allow-Origin": "https://mtdock.com",
+                "Access-Control-Allow-Methods": "GET,OPTIONS",
+            },
+        )
+        if unmodified is not None:
+            return unmodified
+
     query = """
     SELECT DISTINCT 
         HighTimes.status,
@@ -106,11 +93,16 @@ def lambda_handler(event, context):
                 "[ERROR]: Cannot fetch all. \n{}".format(traceback.format_exc())
             )
 
+        if etag is None:
+            # Without a shared store the rows, which hold no content, are their own validators
+            etag = make_etag(result)
+
         return {
             "body": json.dumps(result),  # Serialize list to JSON
             "headers": {
                 "Access-Control-Allow-Origin": "https://mtdock.com",
                 "Access-Control-Allow-Methods": "GET,OPTIONS",
+                "ETag": etag,
             },
             "statusCode": 200,
             "isBase64Encoded": "false",
@@ -125,6 +117,3 @@ def lambda_handler(event, context):
 #
 
 
-
-
-
@@ -0,0 +1 @@
+"""Code shared by the MT Dock Lambdas, deployed as the mtdock Lambda layer."""
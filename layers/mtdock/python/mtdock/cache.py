@@ -0,0 +1,227 @@
+"""Read-through cache of the translation readers and the generation counters that invalidate it."""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+
+# Read-through cache: an in-container LRU in front of an optional shared DynamoDB table
+CACHE_TABLE = os.environ.get("CACHE_TABLE")
+# Directory standing in for the shared cache when running locally or in tests
+CACHE_DIR = os.environ.get("CACHE_DIR")
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 512))
+# Bounds staleness when a writer could not bump a generation
+CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", 3600))
+# How long a container trusts the article generations it last read
+CACHE_GENERATION_TTL_SECONDS = float(os.environ.get("CACHE_GENERATION_TTL_SECONDS", 2))
+# Generation of every navigation and listing result, any article's bump bumps it too
+LISTING_GENERATION = "listing"
+
+
+class DynamoCacheStore:
+    """Cache entries and per-article generation counters in one table keyed by cache_key."""
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.client = boto3.client("dynamodb")
+
+    def get(self, key):
+        item = self.client.get_item(TableName=self.table_name, Key={"cache_key": {"S": key}}).get("Item")
+        return json.loads(item["entry"]["S"]) if item else None
+
+    def put(self, key, entry):
+        item = {"cache_key": {"S": key}, "entry": {"S": json.dumps(entry)}}
+        if entry["expires_at"] is not None:
+            # Lets the table's TTL remove entries nobody reads any more
+            item["expires_at"] = {"N": str(int(entry["expires_at"]))}
+        self.client.put_item(TableName=self.table_name, Item=item)
+
+    def generations(self, article_ids):
+        # Keys DynamoDB does not process stay at -1, which no cached entry matches
+        result = {article_id: -1 for article_id in article_ids}
+        keys = [{"cache_key": {"S": f"generation#{article_id}"}} for article_id in article_ids]
+        for start in range(0, len(keys), 100):
+            response = self.client.batch_get_item(
+                RequestItems={self.table_name: {"Keys": keys[start : start + 100]}}
+            )
+            unprocessed = response.get("UnprocessedKeys", {}).get(self.table_name, {}).get("Keys", [])
+            unprocessed = {key["cache_key"]["S"] for key in unprocessed}
+            for key in keys[start : start + 100]:
+                if key["cache_key"]["S"] not in unprocessed:
+                    result[key["cache_key"]["S"].split("#", 1)[1]] = 0
+            for item in response["Responses"].get(self.table_name, []):
+                result[item["cache_key"]["S"].split("#", 1)[1]] = int(item["generation"]["N"])
+        return result
+
+
+class LocalCacheStore:
+    """Files in a directory, the shared cache's stand-in for tests and local runs."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def entry_path(self, key):
+        return os.path.join(self.path, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key):
+        try:
+            with open(self.entry_path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, entry):
+        with open(self.entry_path(key), "w") as f:
+            json.dump(entry, f)
+
+    def generations(self, article_ids):
+        result = {}
+        for article_id in article_ids:
+            try:
+                with open(os.path.join(self.path, f"generation-{article_id}")) as f:
+                    result[article_id] = int(f.read())
+            except FileNotFoundError:
+                result[article_id] = 0
+        return result
+
+
+class ReadCache:
+    """Read-through cache for rows keyed by (table, id, lang, provider).
+
+    Every entry records the generation of each article it was built from.
+    put_first_translation, put_final_translation and delete_translation bump
+    those counters, so an entry is served only while all of them still match.
+    Navigation and listing entries depend on LISTING_GENERATION instead.
+    Without a shared store no bump can reach this container, so entries built
+    from articles are not cached at all, only those that depend on none.
+    Cache failures are logged and the request falls back to the database.
+    """
+
+    def __init__(self, store=None):
+        self.entries = OrderedDict()
+        self.store = store
+        # article id -> (generation, read at)
+        self.known_generations = {}
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "errors": 0}
+
+    @staticmethod
+    def key(table, id, lang=None, provider=None, **query):
+        parts = [table, str(id), lang or "", str(provider or "")]
+        parts += [f"{name}={value}" for name, value in sorted(query.items()) if value is not None]
+        return "|".join(parts)
+
+    def generations(self, article_ids):
+        now = time.time()
+        result, stale = {}, []
+        for article_id in {str(article_id) for article_id in article_ids}:
+            known = self.known_generations.get(article_id)
+            if known and now - known[1] < CACHE_GENERATION_TTL_SECONDS:
+                result[article_id] = known[0]
+            else:
+                stale.append(article_id)
+        if stale:
+            fetched = self.store.generations(stale) if self.store else dict.fromkeys(stale, 0)
+            for article_id, generation in fetched.items():
+                self.known_generations[article_id] = (generation, now)
+                result[article_id] = generation
+        return result
+
+    def is_valid(self, entry):
+        if entry["expires_at"] is not None and entry["expires_at"] < time.time():
+            return False
+        return self.generations(entry["generations"]) == entry["generations"]
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > CACHE_MAX_ENTRIES:
+            self.entries.popitem(last=False)
+
+    def get(self, key):
+        try:
+            entry = self.entries.get(key)
+            if entry is not None and self.is_valid(entry):
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry["value"]
+            self.entries.pop(key, None)
+            if self.store is not None:
+                entry = self.store.get(key)
+                if entry is not None and self.is_valid(entry):
+                    self.remember(key, entry)
+                    self.stats["shared_hits"] += 1
+                    return entry["value"]
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning("Cache read of %s failed: %s", key, e)
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key, value, generations, ttl=CACHE_TTL_SECONDS):
+        """Cache value built from articles at these generations, read before the query."""
+        if generations and self.store is None:
+            return
+        entry = {
+            "value": value,
+            "generations": {str(article_id): g for article_id, g in generations.items()},
+            "expires_at": time.time() + ttl if ttl else None,
+        }
+        self.remember(key, entry)
+        if self.store is not None:
+            try:
+                self.store.put(key, entry)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning("Cache write of %s failed: %s", key, e)
+
+
+def make_cache_store():
+    if CACHE_TABLE:
+        return DynamoCacheStore(CACHE_TABLE)
+    if CACHE_DIR:
+        return LocalCacheStore(CACHE_DIR)
+    return None
+
+
+class GenerationCounter:
+    """Per-article generation counters, bumping one invalidates the cached reads of that article.
+
+    Every bump also bumps LISTING_GENERATION, since a write can change which
+    articles a navigation or page reaches as well as their content.
+    """
+
+    def __init__(self):
+        self.client = None
+
+    def bump(self, article_ids):
+        article_ids = sorted({str(article_id) for article_id in article_ids}) + [LISTING_GENERATION]
+        try:
+            if CACHE_TABLE:
+                if self.client is None:
+                    self.client = boto3.client("dynamodb")
+                for article_id in article_ids:
+                    self.client.update_item(
+                        TableName=CACHE_TABLE,
+                        Key={"cache_key": {"S": f"generation#{article_id}"}},
+                        UpdateExpression="ADD generation :one",
+                        ExpressionAttributeValues={":one": {"N": "1"}},
+                    )
+            elif CACHE_DIR:
+                for article_id in article_ids:
+                    path = os.path.join(CACHE_DIR, f"generation-{article_id}")
+                    generation = 0
+                    if os.path.exists(path):
+                        with open(path) as f:
+                            generation = int(f.read())
+                    with open(path, "w") as f:
+                        f.write(str(generation + 1))
+        except Exception as e:
+            # The readers' entries then expire after CACHE_TTL_SECONDS
+            logger.error("Cannot bump the cache generations of %s: %s", article_ids, e)
@@ -0,0 +1,106 @@
+"""Conditional GET for the read Lambdas: strong ETags, 304 answers and gzip.
+
+A handler tags its response with make_etag over the values the response is built
+from: checksums, statuses or cache generations. On a request with If-None-Match it
+reads just those values and answers with not_modified before the content query.
+"""
+import base64
+import functools
+import gzip
+import hashlib
+import json
+import os
+
+
+# Bodies at least this large are gzipped for clients that accept it, 0 turns it off.
+# A REST API needs a binary media type to decode the base64 body, see the README
+GZIP_MIN_BYTES = int(os.environ.get("GZIP_MIN_BYTES", 0))
+
+
+def request_header(event, name):
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def make_etag(*validators):
+    """Strong ETag of the values a response is built from."""
+    data = json.dumps(validators, sort_keys=True, default=str).encode("utf-8")
+    return '"{}"'.format(hashlib.sha256(data).hexdigest())
+
+
+def gzip_etag(etag):
+    # The gzipped representation is a different one and gets its own strong tag
+    return etag[:-1] + '-gzip"'
+
+
+def validation_headers(headers, etag):
+    headers = dict(headers)
+    headers["ETag"] = etag
+    # Browsers revalidate with If-None-Match on every use instead of refetching
+    headers["Cache-Control"] = "no-cache"
+    headers["Vary"] = "Accept-Encoding"
+    return headers
+
+
+def not_modified(event, etag, headers):
+    """A 304 response if the client holds the representation tagged etag, None otherwise."""
+    if_none_match = request_header(event, "if-none-match") or ""
+    tags = {tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")}
+    matched = tags & {etag, gzip_etag(etag)}
+    if not matched:
+        return None
+    return {
+        "statusCode": 304,
+        "headers": validation_headers(headers, matched.pop()),
+        "body": "",
+        "isBase64Encoded": False,
+    }
+
+
+def conditional_response(event, response):
+    """Answer a matching If-None-Match for a tagged 200 response with 304 and gzip large bodies.
+
+    Handlers put the ETag from make_etag in the response headers; responses without one
+    are only compressed.
+    """
+    if response.get("statusCode") != 200 or not isinstance(response.get("body"), str):
+        return response
+
+    body = response["body"].encode("utf-8")
+    compress = (
+        GZIP_MIN_BYTES > 0
+        and len(body) >= GZIP_MIN_BYTES
+        and "gzip" in (request_header(event, "accept-encoding") or "").lower()
+    )
+    headers = dict(response.get("headers") or {})
+    etag = headers.get("ETag")
+    if etag:
+        # Responses served from the read cache are only checked here
+        unmodified = not_modified(event, etag, headers)
+        if unmodified is not None:
+            return unmodified
+        headers = validation_headers(headers, gzip_etag(etag) if compress else etag)
+
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+        return dict(
+            response,
+            headers=headers,
+            # A fixed mtime keeps the compressed bytes, and so their tag, the same on every request
+            body=base64.b64encode(gzip.compress(body, mtime=0)).decode("ascii"),
+            isBase64Encoded=True,
+        )
+    return dict(response, headers=headers)
+
+
+def conditional_get(handler):
+    """Run conditional_response on everything the handler returns."""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        return conditional_response(event or {}, handler(event, context))
+
+    return wrapper
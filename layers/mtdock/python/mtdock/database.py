@@ -0,0 +1,112 @@
+"""Database connections of the Lambdas that read and write the HighTimes tables."""
+import json
+import logging
+import os
+import time
+
+import boto3
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+
+SECRET_NAME = "HighTimesDB"
+SECRET_TTL_SECONDS = int(os.environ.get("DB_SECRET_TTL_SECONDS", 3600))
+# RDS IAM auth tokens expire after 15 minutes, refresh them a little earlier
+TOKEN_TTL_SECONDS = 15 * 60
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.environ.get("DB_TOKEN_REFRESH_MARGIN_SECONDS", 120))
+
+
+class ConnectionManager:
+    """Keeps the secret, auth token and connection alive across warm invocations."""
+
+    def __init__(self):
+        self.secret = None
+        self.secret_fetched_at = 0
+        self.token = None
+        self.token_expires_at = 0
+        self.cnx = None
+        self.rds_client = None
+        self.secrets_client = None
+        self.stats = {"hits": 0, "misses": 0, "secret_fetches": 0, "token_refreshes": 0}
+
+    def get_database_credentials(self, force=False):
+        if force or self.secret is None or time.time() - self.secret_fetched_at > SECRET_TTL_SECONDS:
+            if self.secrets_client is None:
+                session = boto3.session.Session()
+                self.secrets_client = session.client(
+                    service_name="secretsmanager", region_name=os.environ["AWS_REGION"]
+                )
+            response = self.secrets_client.get_secret_value(SecretId=SECRET_NAME)
+            self.secret = json.loads(response["SecretString"])
+            self.secret_fetched_at = time.time()
+            self.stats["secret_fetches"] += 1
+        return (
+            self.secret.get("username"),
+            self.secret.get("port"),
+            self.secret.get("database"),
+            self.secret.get("host"),
+        )
+
+    def get_auth_token(self, endpoint, port, username, force=False):
+        if force or self.token is None or time.time() >= self.token_expires_at - TOKEN_REFRESH_MARGIN_SECONDS:
+            if self.rds_client is None:
+                self.rds_client = boto3.client("rds")
+            self.token = self.rds_client.generate_db_auth_token(
+                DBHostname=endpoint,
+                Port=port,
+                DBUsername=username,
+                Region=os.environ["AWS_REGION"],
+            )
+            self.token_expires_at = time.time() + TOKEN_TTL_SECONDS
+            self.stats["token_refreshes"] += 1
+        return self.token
+
+    def connect(self, force_refresh=False):
+        username, port, database, endpoint = self.get_database_credentials(force=force_refresh)
+        token = self.get_auth_token(endpoint, port, username, force=force_refresh)
+
+        return pymysql.connect(
+            host=endpoint,
+            user=username,
+            passwd=token,
+            port=int(port),
+            db=database,
+            autocommit=True,
+            ssl={"ssl": True},
+        )
+
+    def is_alive(self):
+        if self.cnx is None:
+            return False
+        try:
+            self.cnx.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def get_connection(self):
+        if self.is_alive():
+            self.stats["hits"] += 1
+            return self.cnx
+
+        self.close()
+        self.stats["misses"] += 1
+        try:
+            self.cnx = self.connect()
+        except pymysql.err.OperationalError:
+            # The cached secret or token may have been rotated, retry once with fresh ones
+            logger.warning("Connection failed, retrying with refreshed credentials.")
+            self.cnx = self.connect(force_refresh=True)
+        return self.cnx
+
+    def close(self):
+        if self.cnx is not None:
+            try:
+                self.cnx.close()
+            except Exception:
+                pass
+        self.cnx = None
+
+
+connection_manager = ConnectionManager()
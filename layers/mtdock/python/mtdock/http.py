@@ -0,0 +1,168 @@
+"""Pooled outbound HTTP with timeouts, retries and deadlines."""
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("HTTP_CONNECT_TIMEOUT_SECONDS", 3.05))
+HTTP_READ_TIMEOUT_SECONDS = float(os.environ.get("HTTP_READ_TIMEOUT_SECONDS", 30))
+HTTP_MAX_ATTEMPTS = int(os.environ.get("HTTP_MAX_ATTEMPTS", 4))
+HTTP_RETRY_BACKOFF_SECONDS = float(os.environ.get("HTTP_RETRY_BACKOFF_SECONDS", 0.5))
+# Upper bound on any single wait, including one asked for by Retry-After
+HTTP_MAX_RETRY_DELAY_SECONDS = float(os.environ.get("HTTP_MAX_RETRY_DELAY_SECONDS", 20))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 10))
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DeadlineExceededError(Exception):
+    pass
+
+
+class OpenedConnections(threading.local):
+    """Connections opened by the current thread, so a request on one thread never counts another's."""
+
+    def __init__(self):
+        self.count = 0
+
+    def counting(self, pool_class):
+        opened = self
+
+        class CountingPool(pool_class):
+            def _new_conn(self):
+                opened.count += 1
+                return super()._new_conn()
+
+        return CountingPool
+
+
+class HTTPClient:
+    """Shared requests session with per-host keep-alive pools, timeouts and retries.
+
+    429 and 5xx responses and connection failures are retried with jittered
+    exponential backoff, waiting as long as Retry-After asks when it is given.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.adapter = adapter
+        # urllib3 opens a pool's connections on the thread that asks for one
+        self.opened = OpenedConnections()
+        poolmanager = adapter.poolmanager
+        poolmanager.pool_classes_by_scheme = {
+            scheme: self.opened.counting(pool_class)
+            for scheme, pool_class in poolmanager.pool_classes_by_scheme.items()
+        }
+        self.timeout = (HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS)
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "errors": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "total_ms": 0.0,
+        }
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, throttled=None, deadline=None, **kwargs):
+        """Send a request, throttled is called on every 429 retried so a rate limiter can slow down.
+
+        A 429 that is returned is the caller's to report, as the response or its
+        raise_for_status error, so each one is counted once.
+
+        With a deadline (a time.time() value) every attempt's timeout is cut to the
+        time left, and no retry is waited for that could not start before it.
+        """
+        timeout = kwargs.pop("timeout", self.timeout)
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        for attempt in range(1, HTTP_MAX_ATTEMPTS + 1):
+            kwargs["timeout"] = (connect_timeout, read_timeout)
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise DeadlineExceededError(f"{method} {url} not sent before the deadline")
+                kwargs["timeout"] = (min(connect_timeout, remaining), min(read_timeout, remaining))
+            opened = self.opened.count
+            started = time.time()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.record(method, url, None, started, self.opened.count > opened, attempt)
+                delay = self.backoff(attempt)
+                if attempt == HTTP_MAX_ATTEMPTS or not self.retry_fits(delay, deadline):
+                    raise
+                logger.warning("%s %s failed (attempt %d), retrying in %.2f s: %s", method, url, attempt, delay, e)
+                time.sleep(delay)
+                continue
+
+            self.record(method, url, response.status_code, started, self.opened.count > opened, attempt)
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt == HTTP_MAX_ATTEMPTS:
+                return response
+            delay = self.retry_after(response)
+            if delay is None:
+                delay = self.backoff(attempt)
+            if not self.retry_fits(delay, deadline):
+                return response
+            if response.status_code == 429 and throttled is not None:
+                throttled()
+            logger.warning(
+                "%s %s returned %d (attempt %d), retrying in %.2f s",
+                method, url, response.status_code, attempt, delay,
+            )
+            response.close()
+            time.sleep(delay)
+
+    def retry_fits(self, delay, deadline):
+        return deadline is None or time.time() + delay < deadline
+
+    def backoff(self, attempt):
+        # Full jitter, so callers throttled together do not retry together
+        delay = min(HTTP_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1), HTTP_MAX_RETRY_DELAY_SECONDS)
+        return random.uniform(0, delay)
+
+    def retry_after(self, response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return min(max(float(value), 0.0), HTTP_MAX_RETRY_DELAY_SECONDS)
+        except ValueError:
+            pass
+        try:
+            at = email.utils.parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError):
+            return None
+        return min(max(at - time.time(), 0.0), HTTP_MAX_RETRY_DELAY_SECONDS)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def record(self, method, url, status_code, started, new_connection, attempt):
+        elapsed = (time.time() - started) * 1000
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["retries"] += attempt > 1
+            self.stats["errors"] += status_code is None or status_code >= 400
+            self.stats["new_connections" if new_connection else "reused_connections"] += 1
+            self.stats["total_ms"] += elapsed
+        logger.debug(
+            "%s %s -> %s in %.0f ms (attempt %d, %s connection)",
+            method, url, status_code, elapsed, attempt, "new" if new_connection else "reused",
+        )
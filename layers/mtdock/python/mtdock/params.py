@@ -0,0 +1,95 @@
+"""SSM parameters and secrets, cached for the life of the container."""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+PARAMETER_CACHE_TTL_SECONDS = int(os.environ.get("PARAMETER_CACHE_TTL_SECONDS", 300))
+# How long an expired value may still be served while it is refreshed in the background
+PARAMETER_CACHE_STALE_SECONDS = int(os.environ.get("PARAMETER_CACHE_STALE_SECONDS", 3600))
+
+
+class ParameterCache:
+    """Process-wide TTL cache for SSM parameters and secrets.
+
+    Only one caller loads a missing key while the others wait for it, and expired
+    values are served stale while a single background refresh runs.
+    """
+
+    def __init__(self, ttl=PARAMETER_CACHE_TTL_SECONDS, stale_ttl=PARAMETER_CACHE_STALE_SECONDS):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.entries = {}
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+
+    def get(self, key, loader):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = time.time() - fetched_at
+                if age < self.ttl:
+                    self.stats["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self.stats["stale_hits"] += 1
+                    if key not in self.loading:
+                        self.loading[key] = threading.Event()
+                        threading.Thread(
+                            target=self._refresh, args=(key, loader), daemon=True
+                        ).start()
+                    return value
+
+            event = self.loading.get(key)
+            owner = event is None
+            if owner:
+                event = self.loading[key] = threading.Event()
+                self.stats["misses"] += 1
+
+        if not owner:
+            event.wait()
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry is not None:
+                return entry[0]
+            # The loader we waited on failed, try ourselves
+            return self.get(key, loader)
+
+        try:
+            value = loader()
+            with self.lock:
+                self.entries[key] = (value, time.time())
+            return value
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+            event.set()
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+            with self.lock:
+                self.entries[key] = (value, time.time())
+                self.stats["refreshes"] += 1
+        except Exception:
+            logger.warning("Background refresh of %s failed, serving stale value.", key)
+        finally:
+            with self.lock:
+                event = self.loading.pop(key, None)
+            if event is not None:
+                event.set()
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+
+parameter_cache = ParameterCache()
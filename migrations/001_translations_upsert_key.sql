@@ -0,0 +1,14 @@
+-- The bulk upsert in put_first_translation relies on one translation per article,
+-- provider and language pair, the same row UpsertTranslation replaces.
+-- Tables written before this key may hold duplicates, which would make ADD UNIQUE KEY
+-- fail. Keep the newest row of each (highest translation_id) and remove the others.
+-- The statement is a no-op on a table without duplicates, so the file can be re-run.
+
+DELETE t1 FROM translations t1
+JOIN translations t2
+  ON t1.text_id = t2.text_id AND t1.providers_id = t2.providers_id
+ AND t1.lang_to = t2.lang_to AND t1.lang_from = t2.lang_from
+ AND t1.translation_id < t2.translation_id;
+
+ALTER TABLE translations
+    ADD UNIQUE KEY uq_translations_article_provider_lang (text_id, providers_id, lang_to, lang_from);
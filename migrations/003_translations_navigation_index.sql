@@ -0,0 +1,5 @@
+-- Keyset pagination in get_first filters on lang_to and providers_id and walks
+-- text_id in both directions. InnoDB appends the primary key (translation_id) to
+-- the index, which covers the tie-break in the ORDER BY too.
+CREATE INDEX idx_translations_lang_provider_text
+    ON translations (lang_to, providers_id, text_id);
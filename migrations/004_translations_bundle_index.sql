@@ -0,0 +1,3 @@
+-- The get_first bundle walks the articles translated into one language without a
+-- provider filter, which (lang_to, providers_id, text_id) cannot return in text_id order.
+CREATE INDEX idx_translations_lang_text ON translations (lang_to, text_id);
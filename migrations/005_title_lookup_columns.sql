@@ -0,0 +1,35 @@
+-- Title searches in get_first and get_final compared JSON_EXTRACT(content, '$.title'),
+-- which no index can serve, so every lookup parsed every row's JSON. The title is now a
+-- stored generated column with its own index. Adding a STORED column rebuilds the table
+-- and so backfills existing rows; later inserts and updates keep it current.
+-- The column keeps the first 255 characters so that long titles never fail an insert;
+-- queries seek on the prefix and compare the full title on the matching rows only.
+
+ALTER TABLE translations
+    ADD COLUMN content_title VARCHAR(255)
+        GENERATED ALWAYS AS (LEFT(JSON_UNQUOTE(JSON_EXTRACT(content, '$.title')), 255)) STORED,
+    ADD INDEX idx_translations_content_title (content_title);
+
+ALTER TABLE edited_translations
+    ADD COLUMN content_title VARCHAR(255)
+        GENERATED ALWAYS AS (LEFT(JSON_UNQUOTE(JSON_EXTRACT(edited_content, '$.title')), 255)) STORED,
+    ADD INDEX idx_edited_translations_content_title (content_title);
+
+-- get_article (and the dashboard's /get_articles) look source articles up by title.
+-- A TEXT title can only be indexed by a prefix, while a VARCHAR of up to 255
+-- characters refuses a prefix longer than itself, so the index follows the column type.
+SET @create_title_index = (
+    SELECT IF(
+        DATA_TYPE IN ('char', 'varchar') AND CHARACTER_MAXIMUM_LENGTH <= 255,
+        'CREATE INDEX idx_hightimes_title ON HighTimes (title)',
+        'CREATE INDEX idx_hightimes_title ON HighTimes (title(255))'
+    )
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'HighTimes' AND COLUMN_NAME = 'title'
+);
+PREPARE create_title_index FROM @create_title_index;
+EXECUTE create_title_index;
+DEALLOCATE PREPARE create_title_index;
+
+-- Not measured on MySQL: the plans (EXPLAIN) and timings of these indexes have not been
+-- taken, benchmarks/title_lookup.py runs on SQLite only.
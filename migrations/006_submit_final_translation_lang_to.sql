@@ -0,0 +1,70 @@
+-- SubmitFinalTranslation rated every language's translations of an article when
+-- p_lang_to was NULL, and the dashboard never sent it. The post-edited language is
+-- now required: a call without it fails before anything is written.
+DROP PROCEDURE IF EXISTS SubmitFinalTranslation;
+
+DELIMITER //
+CREATE PROCEDURE SubmitFinalTranslation(
+    IN p_text_id INT,
+    IN p_edited_content JSON,
+    IN p_checksum CHAR(64),
+    IN p_resubmit BOOLEAN,
+    IN p_aws_rating INT,
+    IN p_gcp_rating INT,
+    IN p_azure_rating INT,
+    IN p_comments TEXT,
+    IN p_lang_to VARCHAR(16)
+)
+BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    IF p_lang_to IS NULL THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'SubmitFinalTranslation needs p_lang_to';
+    END IF;
+
+    IF p_resubmit AND EXISTS (
+        SELECT 1 FROM edited_translations
+        WHERE text_id = p_text_id AND checksum = p_checksum
+    ) THEN
+        SELECT 'exists' AS result;
+    ELSE
+        START TRANSACTION;
+
+        INSERT INTO edited_translations (text_id, edited_content, checksum)
+        VALUES (p_text_id, p_edited_content, p_checksum)
+        ON DUPLICATE KEY UPDATE
+            edited_content = VALUES(edited_content),
+            checksum = VALUES(checksum);
+
+        UPDATE HighTimes SET status = 'done' WHERE id = p_text_id;
+
+        -- Every provider's rating goes to that provider's translation of the article
+        -- into p_lang_to, the language that was post-edited
+        INSERT INTO ratings (translation_id, rating_value, providers_id)
+        SELECT translations.translation_id, provider_ratings.rating, translations.providers_id
+        FROM translations
+        INNER JOIN (
+            SELECT 1 AS providers_id, p_aws_rating AS rating
+            UNION ALL SELECT 2, p_gcp_rating
+            UNION ALL SELECT 3, p_azure_rating
+        ) AS provider_ratings ON provider_ratings.providers_id = translations.providers_id
+        WHERE translations.text_id = p_text_id
+          AND translations.lang_to = p_lang_to
+        ON DUPLICATE KEY UPDATE
+            rating_value = VALUES(rating_value),
+            providers_id = VALUES(providers_id);
+
+        INSERT INTO comments (text_id, comments)
+        VALUES (p_text_id, p_comments)
+        ON DUPLICATE KEY UPDATE
+            text_id = VALUES(text_id);
+
+        COMMIT;
+        SELECT 'saved' AS result;
+    END IF;
+END //
+DELIMITER ;
@@ -1,14 +1,109 @@
-import requests
 import boto3
 import json
+import hashlib
 import logging
+import os
+import threading
+import time
 import concurrent.futures
+from botocore.exceptions import ClientError
 #import pdb
 
+from mtdock.params import parameter_cache
+from mtdock.http import HTTPClient
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
+http_client = HTTPClient()
+
+# How messages are spread over FIFO message groups: "article", "article_lang" or "shard".
+# Messages of one group are delivered in order, different groups are consumed in parallel.
+# A failed message holds back the rest of its group until it is retried, under "shard" that
+# is many articles, which is why the consumers cap its delay (REQUEUE_SHARD_MAX_DELAY_SECONDS).
+MESSAGE_GROUP_STRATEGY = os.environ.get("MESSAGE_GROUP_STRATEGY", "article")
+MESSAGE_GROUP_SHARDS = int(os.environ.get("MESSAGE_GROUP_SHARDS", 16))
+
+if MESSAGE_GROUP_STRATEGY not in ("article", "article_lang", "shard"):
+    logger.warning("Unknown MESSAGE_GROUP_STRATEGY %s, using article.", MESSAGE_GROUP_STRATEGY)
+    MESSAGE_GROUP_STRATEGY = "article"
+
+# SendMessageBatch accepts at most 10 entries and 256 KiB per call
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+# Number of ids requested from get_article per call, bounded by its MAX_IDS
+ARTICLE_FETCH_SIZE = int(os.environ.get("ARTICLE_FETCH_SIZE", 100))
+
+# Claim-check: article bodies are stored once in a blob store keyed by content
+# hash and only a pointer travels through SQS. "local" is a filesystem stand-in
+# for tests.
+CLAIM_CHECK_MODE = os.environ.get("CLAIM_CHECK_MODE", "off")
+CLAIM_CHECK_BUCKET = os.environ.get("CLAIM_CHECK_BUCKET")
+CLAIM_CHECK_PREFIX = os.environ.get("CLAIM_CHECK_PREFIX", "claim-check/")
+CLAIM_CHECK_LOCAL_DIR = os.environ.get("CLAIM_CHECK_LOCAL_DIR", "/tmp/claim_check_store")
+
+
+class S3BlobStore:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.s3 = boto3.client("s3")
+
+    def exists(self, key):
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put(self, key, data):
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType="application/json")
+
+    def get(self, key):
+        return self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+
+class LocalBlobStore:
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+
+def make_blob_store(store, bucket=None):
+    if store == "s3":
+        return S3BlobStore(bucket or CLAIM_CHECK_BUCKET)
+    if store == "local":
+        return LocalBlobStore(CLAIM_CHECK_LOCAL_DIR)
+    raise ValueError(f"Unknown blob store {store}")
+
+
+# Payloads smaller than this stay inline in the message
+CLAIM_CHECK_MIN_BYTES = int(os.environ.get("CLAIM_CHECK_MIN_BYTES", 0))
+
+blob_store = make_blob_store(CLAIM_CHECK_MODE) if CLAIM_CHECK_MODE != "off" else None
+# Keys already known to exist in the blob store, so warm invocations skip the HEAD
+stored_payload_keys = set()
+
+
 class AWSClient:
     def __init__(self):
         self.headers = {"Content-Type": "application/json"}
@@ -18,6 +113,9 @@ class AWSClient:
         self.sqs = boto3.client("sqs", region_name="us-west-1")
 
     def get_parameters_from_store(self):
+        return parameter_cache.get(("ssm",) + tuple(self.params_keys), self.fetch_parameters)
+
+    def fetch_parameters(self):
         response = self.ssm.get_parameters(Names=self.params_keys, WithDecryption=True)
 
         # Construct a dictionary to hold the parameter values
@@ -28,24 +126,213 @@ class AWSClient:
 
         return params_dict
 
+    def message_group_id(self, message):
+        if MESSAGE_GROUP_STRATEGY == "article_lang":
+            return f"{message.get('id')}-{'-'.join(message.get('to_langs') or [])}"
+        if MESSAGE_GROUP_STRATEGY == "shard":
+            digest = hashlib.sha256(str(message.get("id")).encode("utf-8")).hexdigest()
+            return f"shard-{int(digest, 16) % MESSAGE_GROUP_SHARDS}"
+        return str(message.get("id"))
+
+    def message_deduplication_id(self, message):
+        # Re-queueing the same article and target languages inside the SQS
+        # deduplication window is dropped by the queue instead of retranslated
+        content = {
+            "id": message.get("id"),
+            "from_lang": message.get("from_lang"),
+            "to_langs": message.get("to_langs"),
+            "title": message.get("title"),
+            "text": message.get("text"),
+            "payload": (message.get("payload") or {}).get("sha256"),
+            "force": message.get("force", False),
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def claim_check(self, message):
+        """Store title and text once in the blob store and return a pointer message."""
+        if blob_store is None:
+            return message
+
+        payload = {k: message[k] for k in ("title", "text") if k in message}
+        data = json.dumps(payload, sort_keys=True).encode("utf-8")
+        if len(data) < CLAIM_CHECK_MIN_BYTES:
+            return message
+
+        digest = hashlib.sha256(data).hexdigest()
+        key = f"{CLAIM_CHECK_PREFIX}{digest}.json"
+        if key not in stored_payload_keys:
+            if not blob_store.exists(key):
+                blob_store.put(key, data)
+            stored_payload_keys.add(key)
+
+        pointer = {k: v for k, v in message.items() if k not in payload}
+        pointer["payload"] = {
+            "store": CLAIM_CHECK_MODE,
+            "bucket": CLAIM_CHECK_BUCKET,
+            "key": key,
+            "sha256": digest,
+        }
+        return pointer
+
     def send_to_sqs(self, text, sqs_endpoint):
         self.sqs.send_message(
             QueueUrl=sqs_endpoint,
             MessageBody=json.dumps(text),
-            MessageGroupId="translation",
+            MessageGroupId=self.message_group_id(text),
+            MessageDeduplicationId=self.message_deduplication_id(text),
         )
 
-    def call_api(self, id=None, title=None):
+    def send_batch_to_sqs(self, messages, sqs_endpoint):
+        """Send messages with SendMessageBatch and return one error (or None) per message."""
+        errors = [None] * len(messages)
+
+        batches = []
+        batch, batch_bytes = [], 0
+        for index, message in enumerate(messages):
+            body = json.dumps(message)
+            size = len(body.encode("utf-8"))
+            if batch and (len(batch) == MAX_BATCH_ENTRIES or batch_bytes + size > MAX_BATCH_BYTES):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append((index, body, message))
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+
+        for batch in batches:
+            entries = [
+                {
+                    "Id": str(index),
+                    "MessageBody": body,
+                    "MessageGroupId": self.message_group_id(message),
+                    "MessageDeduplicationId": self.message_deduplication_id(message),
+                }
+                for index, body, message in batch
+            ]
+            try:
+                response = self.sqs.send_message_batch(QueueUrl=sqs_endpoint, Entries=entries)
+            except Exception as e:
+                for index, _, _ in batch:
+                    errors[index] = str(e)
+                continue
+
+            for failed in response.get("Failed", []):
+                errors[int(failed["Id"])] = failed.get("Message") or failed.get("Code")
+
+        return errors
+
+    def call_api(self, id=None, title=None, ids=None):
         params = {"id": id, "title": title}
-        response = requests.get(self.parameter_dict["get_article"], params=params)
+        if ids:
+            params["ids"] = ",".join(str(i) for i in ids)
+        response = http_client.get(self.parameter_dict["get_article"], params=params)
         # Check if the request was successful
         response.raise_for_status()
         return response.text
 
+    def fetch_articles(self, ids):
+        articles = {}
+        for start in range(0, len(ids), ARTICLE_FETCH_SIZE):
+            chunk = ids[start : start + ARTICLE_FETCH_SIZE]
+            for article in json.loads(self.call_api(ids=chunk)):
+                articles[str(article["id"])] = article
+        return articles
+
+
+def source_fingerprint(message):
+    """Hash of the source title and text, the consumers skip sources they already translated."""
+    content = {"title": message.get("title"), "text": message.get("text")}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def is_true(value):
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def split_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+def response(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "POST,OPTIONS",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        },
+        "body": body,
+    }
+
+
+def enqueue_batch(aws, ids, to_langs, from_lang, queues, force=False):
+    try:
+        articles = aws.fetch_articles(ids)
+    except Exception as e:
+        return response(500, f"ERROR: Cannot call api.\n{str(e)}")
+
+    results = []
+    messages = []
+    for id in ids:
+        # One message per article carries every target language, the consumers fan it out
+        item = {"id": id, "to_langs": to_langs, "queues": {}}
+        results.append(item)
+        article = articles.get(id)
+        if article is None:
+            item["error"] = "Article not found."
+            continue
+        message = dict(article)
+        message["to_langs"] = to_langs
+        message["from_lang"] = from_lang
+        message["source_hash"] = source_fingerprint(message)
+        if force:
+            message["force"] = True
+        try:
+            message = aws.claim_check(message)
+        except Exception as e:
+            item["error"] = f"Cannot store payload. {e}"
+            continue
+        messages.append((item, message))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(queues)) as executor:
+        futures = {
+            name: executor.submit(aws.send_batch_to_sqs, [m for _, m in messages], endpoint)
+            for name, endpoint in queues.items()
+        }
+        for name, future in futures.items():
+            try:
+                errors = future.result()
+            except Exception as e:
+                errors = [str(e)] * len(messages)
+            for (item, _), error in zip(messages, errors):
+                item["queues"][name] = "queued" if error is None else {"error": error}
+
+    failed = sum(
+        1 for item in results
+        if "error" in item or any(v != "queued" for v in item["queues"].values())
+    )
+    logger.info(
+        "Batch enqueue: %d items, %d with failures, HTTP client stats: %s",
+        len(results), failed, http_client.snapshot(),
+    )
+
+    if failed == 0:
+        status_code = 200
+    elif failed == len(results):
+        status_code = 500
+    else:
+        status_code = 207
+    return response(status_code, json.dumps({"failed": failed, "results": results}))
+
 
 def lambda_handler(event, context):
     aws = AWSClient()
-    queryStringParameters = event.get("queryStringParameters", {})
+    queryStringParameters = event.get("queryStringParameters") or {}
 
     # Extract values or set to None if not provided
     id = queryStringParameters.get("id")
@@ -54,12 +341,29 @@ def lambda_handler(event, context):
     to_lang = queryStringParameters.get("to_lang")
     from_lang = queryStringParameters.get("from_lang")
 
-    parameter_dict = aws.get_parameters_from_store()
+    parameter_dict = aws.parameter_dict
 
     aws_sqs = parameter_dict.get("sqs_aws")
     azure_sqs = parameter_dict.get("sqs_azure")
     gcp_sqs = parameter_dict.get("sqs_gcp")
 
+    # Batch mode: many ids and target languages, from the JSON body or the query string
+    try:
+        body = json.loads(event.get("body") or "{}")
+    except ValueError:
+        return response(400, "ERROR: Body is not valid JSON.")
+
+    ids = split_list(body.get("ids", queryStringParameters.get("ids")))
+    # force retranslates even when the consumers already translated this exact source
+    force = is_true(body.get("force", queryStringParameters.get("force", "")))
+    if ids:
+        to_langs = split_list(body.get("to_langs", queryStringParameters.get("to_langs", to_lang)))
+        from_lang = body.get("from_lang", from_lang)
+        if not to_langs:
+            return response(400, "ERROR: No target language provided.")
+        queues = {"aws": aws_sqs, "azure": azure_sqs, "gcp": gcp_sqs}
+        return enqueue_batch(aws, ids, to_langs, from_lang, queues, force=force)
+
     if not id:
         logger.info("No id provided.")
 
@@ -81,15 +385,23 @@ def lambda_handler(event, context):
                 }
 
     text = json.loads(text)
-    text["to_lang"] = to_lang
+    # to_lang may list several languages separated by commas, all sent in one message
+    text["to_langs"] = split_list(to_lang)
     text["from_lang"] = from_lang
+    text["source_hash"] = source_fingerprint(text)
+    if force:
+        text["force"] = True
 
     try:
+        text = aws.claim_check(text)
         with concurrent.futures.ThreadPoolExecutor() as executor:
-            # Submit tasks using lambda functions
-            executor.submit(lambda: aws.send_to_sqs(text, aws_sqs))
-            executor.submit(lambda: aws.send_to_sqs(text, azure_sqs))
-            executor.submit(lambda: aws.send_to_sqs(text, gcp_sqs))
+            futures = [
+                executor.submit(aws.send_to_sqs, text, sqs)
+                for sqs in (aws_sqs, azure_sqs, gcp_sqs)
+            ]
+            # Surface send failures instead of reporting success regardless
+            for future in futures:
+                future.result()
         return {
                 "statusCode": 200,  
                 "headers": {
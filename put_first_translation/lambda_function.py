@@ -1,58 +1,25 @@
-import pymysql
 import logging
 import traceback
 import os
 import hashlib
-import boto3
 import json
+import time
+
+from mtdock.cache import GenerationCounter
+from mtdock.database import connection_manager
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
-class HTDatabase:
-    def get_database_credentials(self):
-        secret = self.get_secret()
-        secret_dict = json.loads(secret)
-        return (
-            secret_dict.get("username"),
-            secret_dict.get("port"),
-            secret_dict.get("database"),
-            secret_dict.get("host"),
-        )
+generation_counter = GenerationCounter()
 
-    def get_secret(self):
-        secret_name = "HighTimesDB"
-        region_name = os.environ["AWS_REGION"]
-        session = boto3.session.Session()
-        client = session.client(service_name="secretsmanager", region_name=region_name)
-        try:
-            get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-            return get_secret_value_response["SecretString"]
-        except Exception as e:
-            raise e
 
+class HTDatabase:
     def make_connection(self):
-        rds_client = boto3.client("rds")
-
-        username, port, database, endpoint = self.get_database_credentials()
-
-        database_token = rds_client.generate_db_auth_token(
-            DBHostname=endpoint,
-            Port=port,
-            DBUsername=username,
-            Region=os.environ["AWS_REGION"],
-        )
-
-        return pymysql.connect(
-            host=endpoint,
-            user=username,
-            passwd=database_token,
-            port=int(port),
-            db=database,
-            autocommit=True,
-            ssl={"ssl": True},
-        )
+        cnx = connection_manager.get_connection()
+        logger.info("DB connection stats: %s", connection_manager.stats)
+        return cnx
 
     def log_err(self, errmsg):
         logger.error(errmsg)
@@ -70,11 +37,151 @@ class HTDatabase:
         return hashlib.sha256(str(data).encode("utf-8")).digest()
 
 
+MAX_BATCH_TRANSLATIONS = int(os.environ.get("MAX_BATCH_TRANSLATIONS", 500))
+PROVIDER_IDS = (1, 2, 3)
+
+
+def response(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Access-Control-Allow-Origin": "https://mtdock.com",
+            "Access-Control-Allow-Methods": "POST,OPTIONS",
+            "Content-Type": "application/json",
+        },
+        "body": json.dumps(body),
+        "isBase64Encoded": "false",
+    }
+
+
+def validate_translation(db, item):
+    """Return the error of a batch item, or None when it can be written."""
+    if not isinstance(item, dict):
+        return "Translation is not an object."
+    for key in ("id", "text", "lang_to", "lang_from", "checksum"):
+        if item.get(key) in (None, ""):
+            return f"Missing {key}."
+    if item.get("providers_id") not in PROVIDER_IDS:
+        return "Unknown providers_id."
+    checksum = db.compute_checksum({"text": item.get("text"), "id": item.get("id")})
+    if item.get("checksum") != checksum.hex():
+        return "Data corruption. Checksums are not the same."
+    return None
+
+
+def handle_batch(db, items):
+    """Write many translations in one transaction.
+
+    Every item is validated and checksum-checked on its own; rejected items are
+    reported by index and the others are still written. Translations whose
+    checksum is already stored are skipped, the rest go in with one multi-row
+    upsert and the status of their articles is set with a single UPDATE.
+    """
+    if not isinstance(items, list) or not items:
+        return response(400, {"error": "translations must be a non-empty list."})
+    if len(items) > MAX_BATCH_TRANSLATIONS:
+        return response(400, {"error": f"At most {MAX_BATCH_TRANSLATIONS} translations per call."})
+
+    rejected, valid = [], []
+    for index, item in enumerate(items):
+        error = validate_translation(db, item)
+        if error:
+            rejected.append({"index": index, "error": error})
+        else:
+            valid.append((index, item))
+    if not valid:
+        return response(400, {"written": 0, "duplicates": 0, "rejected": rejected})
+
+    started = time.time()
+    cnx = db.make_connection()
+    cursor = cnx.cursor()
+    try:
+        cnx.begin()
+        pairs = sorted({(item["id"], item["checksum"]) for _, item in valid}, key=str)
+        cursor.execute(
+            "SELECT text_id, checksum FROM translations WHERE (text_id, checksum) IN ({})".format(
+                ", ".join(["(%s, %s)"] * len(pairs))
+            ),
+            [value for pair in pairs for value in pair],
+        )
+        existing = {(str(text_id), checksum) for text_id, checksum in cursor.fetchall()}
+        new = [
+            (index, item) for index, item in valid if (str(item["id"]), item["checksum"]) not in existing
+        ]
+
+        if new:
+            rows = []
+            for _, item in new:
+                content = {"title": item["title"], "text": item["text"]} if item.get("title") else {"text": item["text"]}
+                rows.append(
+                    (
+                        item["id"],
+                        json.dumps(content),
+                        item["providers_id"],
+                        item["lang_to"],
+                        item["lang_from"],
+                        item["checksum"],
+                    )
+                )
+            # pymysql turns executemany of an INSERT ... VALUES into multi-row statements
+            cursor.executemany(
+                """
+                INSERT INTO translations (text_id, content, providers_id, lang_to, lang_from, checksum)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE content = VALUES(content), checksum = VALUES(checksum)
+                """,
+                rows,
+            )
+
+            article_ids = sorted({item["id"] for _, item in new}, key=str)
+            cursor.execute(
+                "UPDATE HighTimes SET status = 'pending' WHERE id IN ({})".format(
+                    ", ".join(["%s"] * len(article_ids))
+                ),
+                article_ids,
+            )
+        cnx.commit()
+        if new:
+            generation_counter.bump(article_ids)
+    except Exception as e:
+        cnx.rollback()
+        return db.log_err(
+            "[ERROR]: Cannot write the translation batch.\n{}".format(traceback.format_exc())
+        )
+    finally:
+        cursor.close()
+
+    logger.info(
+        "Batch of %d translations: %d written, %d duplicates, %d rejected in %.0f ms.",
+        len(items),
+        len(new),
+        len(valid) - len(new),
+        len(rejected),
+        (time.time() - started) * 1000,
+    )
+    return response(
+        207 if rejected else 200,
+        {"written": len(new), "duplicates": len(valid) - len(new), "rejected": rejected},
+    )
+
+
 def handler(event, context):
     body = event.get("body", "{}")
     data = json.loads(body)
 
     db = HTDatabase()
+
+    # Batch format: {"translations": [{...}, ...]}, each item shaped like a single-call body
+    if isinstance(data, dict) and "translations" in data:
+        try:
+            return handle_batch(db, data.get("translations"))
+        except Exception as e:
+            return db.log_err(
+                "[ERROR]: Cannot connect to the database from the handler.\n{}".format(
+                    traceback.format_exc()
+                )
+            )
+
     try:
         # Extract the data you want to insert from the event or any other source
         translated_data = {
@@ -145,6 +252,7 @@ def handler(event, context):
                         insert_update_statement, 
                         (data.get("id"))
                                )
+                generation_counter.bump([data.get("id")])
             except Exception as e:
                 return db.log_err(
                     "[ERROR]: Cannot execute update statement.\n{}".format(
@@ -176,10 +284,4 @@ def handler(event, context):
             )
         )
 
-    finally:
-        try:
-            cnx.close()
-        except:
-            pass
-
 
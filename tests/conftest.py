@@ -0,0 +1,209 @@
+"""Helpers shared by the Lambda tests.
+
+Every Lambda is a standalone lambda_function.py, so tests load them by path,
+each under its own module name, after setting the environment they read at
+import. The mtdock layer is imported afresh with each of them, as every
+container imports its own. The tests exercise the handlers' own logic; where
+an SDK the modules import is not installed, a minimal fake is registered in
+its place.
+"""
+import importlib.util
+import itertools
+import os
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+# Where the Lambda runtime finds the layer, /opt/python
+sys.path.insert(0, str(ROOT / "layers" / "mtdock" / "python"))
+
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+class FakeAWSClient:
+    """Any boto3 client; tests replace the methods they need."""
+
+    def __init__(self, service_name):
+        self.service_name = service_name
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            raise NotImplementedError(f"{self.service_name}.{name} is not faked")
+
+        return call
+
+
+def install_fake_modules():
+    if importlib.util.find_spec("boto3") is None:
+        boto3 = types.ModuleType("boto3")
+        boto3.client = lambda service_name, *args, **kwargs: FakeAWSClient(service_name)
+        boto3.session = types.SimpleNamespace(Session=lambda: types.SimpleNamespace(client=boto3.client))
+        sys.modules["boto3"] = boto3
+
+    if importlib.util.find_spec("botocore") is None:
+        botocore = types.ModuleType("botocore")
+        config = types.ModuleType("botocore.config")
+        exceptions = types.ModuleType("botocore.exceptions")
+
+        class Config:
+            def __init__(self, **kwargs):
+                self.kwargs = kwargs
+
+        class ClientError(Exception):
+            def __init__(self, error_response, operation_name):
+                self.response = error_response
+                self.operation_name = operation_name
+                super().__init__(f"{operation_name}: {error_response}")
+
+        config.Config = Config
+        exceptions.ClientError = ClientError
+        botocore.config, botocore.exceptions = config, exceptions
+        sys.modules.update({"botocore": botocore, "botocore.config": config, "botocore.exceptions": exceptions})
+
+    if importlib.util.find_spec("requests") is None:
+        requests = types.ModuleType("requests")
+        adapters = types.ModuleType("requests.adapters")
+
+        class RequestException(Exception):
+            def __init__(self, *args, response=None, **kwargs):
+                self.response = response
+                super().__init__(*args)
+
+        class HTTPError(RequestException):
+            pass
+
+        class ConnectionError(RequestException):
+            pass
+
+        class Timeout(RequestException):
+            pass
+
+        class HTTPAdapter:
+            def __init__(self, **kwargs):
+                self.poolmanager = types.SimpleNamespace(pools={}, pool_classes_by_scheme={})
+
+        class Session:
+            def mount(self, prefix, adapter):
+                pass
+
+            def request(self, method, url, **kwargs):
+                raise ConnectionError(f"No network in tests: {method} {url}")
+
+        requests.RequestException, requests.HTTPError = RequestException, HTTPError
+        requests.ConnectionError, requests.Timeout = ConnectionError, Timeout
+        requests.Session = Session
+        adapters.HTTPAdapter = HTTPAdapter
+        requests.adapters = adapters
+        sys.modules.update({"requests": requests, "requests.adapters": adapters})
+
+    if importlib.util.find_spec("pymysql") is None:
+        pymysql = types.ModuleType("pymysql")
+
+        def connect(**kwargs):
+            raise ConnectionError("No database in tests")
+
+        pymysql.connect = connect
+        sys.modules["pymysql"] = pymysql
+
+
+install_fake_modules()
+
+_module_ids = itertools.count()
+
+
+@pytest.fixture
+def load_lambda(monkeypatch):
+    """Import a Lambda's lambda_function.py fresh, with the given environment variables set."""
+
+    def load(directory, **env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        for name in [name for name in sys.modules if name == "mtdock" or name.startswith("mtdock.")]:
+            del sys.modules[name]
+        name = "{}_{}".format(directory.replace("/", "_"), next(_module_ids))
+        spec = importlib.util.spec_from_file_location(name, ROOT / directory / "lambda_function.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return load
+
+
+class FakeCursor:
+    """Records the statements it is given and answers every one with the same rows.
+
+    rows may also be a function of (query, params) returning the rows for that statement.
+    """
+
+    def __init__(self, rows):
+        self.answer = rows
+        self.rows = [] if callable(rows) else rows
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+        self.rows = self.answer(query, params) if callable(self.answer) else self.answer
+
+    def executemany(self, query, seq_of_params):
+        self.execute(query, list(seq_of_params))
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def nextset(self):
+        return None
+
+    @property
+    def rowcount(self):
+        return len(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.fake_cursor = FakeCursor(rows)
+        self.committed = False
+
+    def cursor(self):
+        return self.fake_cursor
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def fake_database(monkeypatch):
+    """Answer a loaded Lambda's queries with rows; returns the connection to inspect."""
+
+    def install(module, rows):
+        cnx = FakeConnection(rows)
+        monkeypatch.setattr(module.connection_manager, "get_connection", lambda: cnx)
+        return cnx
+
+    return install
+
+
+@pytest.fixture
+def translate():
+    """Translate one text into one language through a consumer's SegmentedTranslator."""
+
+    def run(segmented, text, from_lang, to_lang, **options):
+        job = segmented.start([text], from_lang, [to_lang], **options)
+        return segmented.finish(job)[to_lang][0]
+
+    return run
@@ -0,0 +1,66 @@
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda, monkeypatch):
+    module = load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="memory")
+    monkeypatch.setattr(module, "circuit_breaker", module.CircuitBreaker("aws", failure_threshold=2))
+    monkeypatch.setattr(module.time, "sleep", lambda seconds: None)
+    return module
+
+
+def client_error(aws, code, status):
+    return aws.ClientError(
+        {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "TranslateText",
+    )
+
+
+def translator(aws, error):
+    calls = []
+
+    def translate_batch(texts, from_lang, to_lang):
+        calls.append(texts)
+        raise error
+
+    return aws.SegmentedTranslator(translate_batch, aws.TextSegmenter(100, lines=True)), calls
+
+
+def test_poison_messages_do_not_open_the_circuit(aws, translate):
+    segmented, calls = translator(aws, client_error(aws, "UnsupportedLanguagePairException", 400))
+
+    for _ in range(3):
+        with pytest.raises(Exception):
+            translate(segmented, "Hello.\n", "en", "xx")
+
+    # Every attempt was made, none of them counted against the provider
+    assert len(calls) == 3 * aws.CHUNK_MAX_ATTEMPTS
+    assert aws.circuit_breaker.state == "closed"
+    assert aws.circuit_breaker.stats["failures"] == 0
+
+
+def test_transient_failures_count_once_per_batch(aws, translate):
+    segmented, calls = translator(aws, client_error(aws, "ServiceUnavailableException", 503))
+
+    with pytest.raises(Exception):
+        translate(segmented, "Hello.\n", "en", "de")
+    assert aws.circuit_breaker.stats["failures"] == 1
+    assert aws.circuit_breaker.state == "closed"
+
+    with pytest.raises(Exception):
+        translate(segmented, "Hello.\n", "en", "de")
+    assert aws.circuit_breaker.state == "open"
+
+    # An open circuit fails the next batch without calling the provider
+    calls.clear()
+    with pytest.raises(Exception):
+        translate(segmented, "Hello.\n", "en", "de")
+    assert calls == []
+
+
+def test_transient_errors_are_told_apart(aws):
+    assert aws.is_transient_error(client_error(aws, "ThrottlingException", 400))
+    assert aws.is_transient_error(client_error(aws, "InternalServerException", 500))
+    assert aws.is_transient_error(aws.requests.Timeout("read timed out"))
+    assert not aws.is_transient_error(client_error(aws, "ValidationException", 400))
+    assert not aws.is_transient_error(ValueError("Provider returned a short batch for de"))
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def blob_dir(tmp_path):
+    return str(tmp_path / "blobs")
+
+
+@pytest.fixture
+def push(load_lambda, monkeypatch, blob_dir):
+    module = load_lambda("push_to_fifo", CLAIM_CHECK_MODE="local", CLAIM_CHECK_LOCAL_DIR=blob_dir)
+    monkeypatch.setattr(module.AWSClient, "get_parameters_from_store", lambda self: {})
+    return module
+
+
+@pytest.fixture
+def consumer(load_lambda, blob_dir, tmp_path):
+    return load_lambda(
+        "translation_services/aws_lambda",
+        TRANSLATION_MEMORY_BACKEND="off",
+        CLAIM_CHECK_LOCAL_DIR=blob_dir,
+        PAYLOAD_CACHE_DIR=str(tmp_path / "payload_cache"),
+    )
+
+
+def message(**fields):
+    return dict({"id": "42", "title": "Title", "text": "A long text.", "from_lang": "en", "to_langs": ["de"]}, **fields)
+
+
+def test_the_body_travels_by_pointer_and_is_resolved_by_the_consumer(push, consumer):
+    pointer = push.AWSClient().claim_check(message())
+
+    assert "title" not in pointer and "text" not in pointer
+    assert pointer["payload"]["store"] == "local"
+    assert pointer["payload"]["key"] == f"claim-check/{pointer['payload']['sha256']}.json"
+    assert consumer.payload_resolver.resolve(json.loads(json.dumps(pointer))) == message()
+
+
+def test_a_payload_is_stored_once(push, monkeypatch):
+    puts = []
+    put = push.blob_store.put
+    monkeypatch.setattr(push.blob_store, "put", lambda key, data: puts.append(key) or put(key, data))
+    aws = push.AWSClient()
+
+    first = aws.claim_check(message())
+    # Another article with the same title and text shares the blob
+    second = aws.claim_check(message(id="43"))
+
+    assert len(puts) == 1
+    assert first["payload"] == second["payload"]
+
+
+def test_small_payloads_stay_inline(load_lambda, monkeypatch, blob_dir):
+    push = load_lambda(
+        "push_to_fifo", CLAIM_CHECK_MODE="local", CLAIM_CHECK_LOCAL_DIR=blob_dir, CLAIM_CHECK_MIN_BYTES=1024
+    )
+    monkeypatch.setattr(push.AWSClient, "get_parameters_from_store", lambda self: {})
+
+    assert push.AWSClient().claim_check(message()) == message()
+
+
+def test_resolved_payloads_are_kept_for_warm_invocations(push, consumer, monkeypatch):
+    pointer = push.AWSClient().claim_check(message())
+    consumer.payload_resolver.resolve(pointer)
+    store = consumer.payload_resolver.store(pointer["payload"])
+    monkeypatch.setattr(store, "get", lambda key: pytest.fail("fetched again"))
+
+    assert consumer.payload_resolver.resolve(pointer) == message()
+
+
+def test_a_payload_that_does_not_match_its_hash_is_rejected(push, consumer):
+    pointer = push.AWSClient().claim_check(message())
+    push.blob_store.put(pointer["payload"]["key"], b'{"text": "Tampered."}')
+
+    with pytest.raises(ValueError):
+        consumer.payload_resolver.resolve(pointer)
@@ -0,0 +1,171 @@
+import base64
+import gzip
+import json
+
+import pytest
+
+ROW = ("done", json.dumps({"title": "Titel", "text": "Hallo."}), "de", "en", 1, 7, 70, "c7")
+# The VALIDATOR_COLUMNS of ROW
+VALIDATORS = (7, 70, "c7", "done")
+
+
+def answer(rows, validators):
+    """Rows for the content query, validators for the revalidation query."""
+    return lambda query, params: rows if "translations.content" in query else validators
+
+
+def event(headers=None, **params):
+    params = params or {"id": "7", "to_lang": "de", "providers_id": "1"}
+    return {"queryStringParameters": params, "headers": headers or {}}
+
+
+@pytest.fixture
+def get_first(load_lambda):
+    return load_lambda("get_first")
+
+
+def test_a_response_is_tagged_without_an_extra_query(get_first, fake_database):
+    cnx = fake_database(get_first, answer([ROW], [VALIDATORS]))
+
+    response = get_first.lambda_handler(event(), None)
+
+    assert response["statusCode"] == 200
+    assert response["headers"]["ETag"].startswith('"')
+    assert response["headers"]["Cache-Control"] == "no-cache"
+    assert len(cnx.fake_cursor.executed) == 1
+
+
+def test_a_current_copy_is_answered_from_the_validators_alone(get_first, fake_database):
+    cnx = fake_database(get_first, answer([ROW], [VALIDATORS]))
+    etag = get_first.lambda_handler(event(), None)["headers"]["ETag"]
+    cnx.fake_cursor.executed.clear()
+
+    response = get_first.lambda_handler(event({"If-None-Match": etag}), None)
+
+    assert response["statusCode"] == 304
+    assert response["body"] == ""
+    assert response["headers"]["ETag"] == etag
+    assert response["headers"]["Access-Control-Allow-Origin"] == "https://mtdock.com"
+    [(query, _)] = cnx.fake_cursor.executed
+    assert "checksum" in query and "translations.content" not in query
+
+
+def test_a_changed_checksum_sends_the_new_content(get_first, fake_database):
+    cnx = fake_database(get_first, answer([ROW], [VALIDATORS]))
+    etag = get_first.lambda_handler(event(), None)["headers"]["ETag"]
+    edited = ROW[:7] + ("c8",)
+    cnx.fake_cursor.answer = answer([edited], [VALIDATORS[:2] + ("c8", "done")])
+
+    response = get_first.lambda_handler(event({"If-None-Match": etag}), None)
+
+    assert response["statusCode"] == 200
+    assert response["headers"]["ETag"] != etag
+    assert len(cnx.fake_cursor.executed) == 3
+
+
+def test_a_wildcard_does_not_match(get_first, fake_database):
+    fake_database(get_first, answer([ROW], [VALIDATORS]))
+
+    assert get_first.lambda_handler(event({"If-None-Match": "*"}), None)["statusCode"] == 200
+
+
+def test_a_page_is_tagged_by_the_rows_it_reads(get_first, fake_database):
+    cnx = fake_database(get_first, answer([ROW], [VALIDATORS]))
+    params = {"to_lang": "de", "limit": "5"}
+    etag = get_first.lambda_handler(event(**params), None)["headers"]["ETag"]
+
+    assert get_first.lambda_handler(event({"if-none-match": etag}, **params), None)["statusCode"] == 304
+    # The limit is part of what the tag identifies
+    assert get_first.lambda_handler(event({"if-none-match": etag}, to_lang="de", limit="6"), None)["statusCode"] == 200
+    assert cnx.fake_cursor.executed[1][1] == cnx.fake_cursor.executed[0][1]
+
+
+def test_large_bodies_are_gzipped_for_clients_that_accept_it(load_lambda, fake_database):
+    get_first = load_lambda("get_first", GZIP_MIN_BYTES=10)
+    fake_database(get_first, answer([ROW], [VALIDATORS]))
+
+    response = get_first.lambda_handler(event({"Accept-Encoding": "gzip, deflate"}), None)
+
+    assert response["isBase64Encoded"] is True
+    assert response["headers"]["Content-Encoding"] == "gzip"
+    assert response["headers"]["ETag"].endswith('-gzip"')
+    assert json.loads(gzip.decompress(base64.b64decode(response["body"])))["id"] == 7
+    # The compressed copy revalidates as well
+    again = get_first.lambda_handler(
+        event({"Accept-Encoding": "gzip", "If-None-Match": response["headers"]["ETag"]}), None
+    )
+    assert again["statusCode"] == 304
+
+
+@pytest.mark.parametrize(
+    "env, headers",
+    [
+        ({"GZIP_MIN_BYTES": 100000}, {"Accept-Encoding": "gzip"}),
+        ({"GZIP_MIN_BYTES": 10}, {}),
+        ({}, {"Accept-Encoding": "gzip"}),
+    ],
+    ids=["below the threshold", "no Accept-Encoding", "compression off"],
+)
+def test_bodies_are_sent_as_they_are_otherwise(load_lambda, fake_database, env, headers):
+    get_first = load_lambda("get_first", **env)
+    fake_database(get_first, answer([ROW], [VALIDATORS]))
+
+    response = get_first.lambda_handler(event(headers), None)
+
+    assert "Content-Encoding" not in response["headers"]
+    assert json.loads(response["body"])["id"] == 7
+    assert not response["headers"]["ETag"].endswith('-gzip"')
+
+
+def test_get_final_revalidates_with_the_edited_checksum(load_lambda, fake_database):
+    get_final = load_lambda("get_final")
+    content = (7, json.dumps({"title": "Titel", "text": "Hallo."}), "e7")
+    cnx = fake_database(get_final, lambda query, params: [content] if "edited_content" in query else [(7, "e7")])
+    etag = get_final.lambda_handler(event(id="7"), None)["headers"]["ETag"]
+
+    response = get_final.lambda_handler(event({"If-None-Match": etag}, id="7"), None)
+
+    assert response["statusCode"] == 304
+    assert "edited_content" not in cnx.fake_cursor.executed[-1][0]
+
+
+def test_get_article_answers_an_id_lookup_without_the_database(load_lambda, fake_database):
+    get_article = load_lambda("get_article")
+    cnx = fake_database(get_article, [(7, "Titel", "Text"), (8, "Titel", "Text")])
+    etag = get_article.handler(event(ids="7,8"), None)["headers"]["ETag"]
+    cnx.fake_cursor.executed.clear()
+
+    response = get_article.handler(event({"If-None-Match": etag}, ids="7,8"), None)
+
+    assert response["statusCode"] == 304
+    assert cnx.fake_cursor.executed == []
+
+
+def test_get_article_looks_missing_articles_up_again(load_lambda, fake_database):
+    get_article = load_lambda("get_article")
+    cnx = fake_database(get_article, [(7, "Titel", "Text")])
+    etag = get_article.handler(event(ids="7,8"), None)["headers"]["ETag"]
+
+    # The tag names only the articles found, so article 8 is looked for again
+    assert get_article.handler(event({"If-None-Match": etag}, ids="7,8"), None)["statusCode"] == 304
+    cnx.fake_cursor.answer = [(8, "Titel", "Text")]
+    response = get_article.handler(event({"If-None-Match": etag}, ids="7,8"), None)
+
+    assert response["statusCode"] == 200
+    assert [entry["id"] for entry in json.loads(response["body"])] == [7, 8]
+    assert len(cnx.fake_cursor.executed) == 3
+
+
+def test_get_status_is_tagged_by_the_listing_generation(load_lambda, fake_database, tmp_path):
+    get_status = load_lambda("get_status", CACHE_DIR=str(tmp_path), CACHE_GENERATION_TTL_SECONDS=0)
+    writer = load_lambda("put_first_translation", CACHE_DIR=str(tmp_path))
+    cnx = fake_database(get_status, [("done", "Titel", 7, "de", "en")])
+    cnx.fake_cursor.description = [("status",), ("title",), ("id",), ("lang_to",), ("lang_from",)]
+    etag = get_status.lambda_handler(event(), None)["headers"]["ETag"]
+    cnx.fake_cursor.executed.clear()
+
+    assert get_status.lambda_handler(event({"If-None-Match": etag}), None)["statusCode"] == 304
+    assert cnx.fake_cursor.executed == []
+
+    writer.generation_counter.bump([7])
+    assert get_status.lambda_handler(event({"If-None-Match": etag}), None)["statusCode"] == 200
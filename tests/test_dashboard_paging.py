@@ -0,0 +1,70 @@
+import importlib.util
+import json
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The dashboard is a Flask app with its own requirements, see Translator_Dashboard/requirements.txt
+for module in ("flask", "flask_sqlalchemy", "flask_login", "flask_wtf", "flask_bcrypt", "pandas", "dotenv"):
+    pytest.importorskip(module)
+
+SECRET = {"username": "user", "port": 3306, "database": "db", "database_endpoint": "localhost", "password": "secret"}
+
+
+@pytest.fixture
+def dashboard(monkeypatch):
+    import boto3
+
+    # The app reads its database credentials from Secrets Manager at import
+    secrets = types.SimpleNamespace(get_secret_value=lambda SecretId: {"SecretString": json.dumps(SECRET)})
+    session = types.SimpleNamespace(client=lambda **kwargs: secrets)
+    monkeypatch.setattr(boto3.session, "Session", lambda: session)
+    monkeypatch.setenv("SECRET_KEY", "test")
+
+    spec = importlib.util.spec_from_file_location("dashboard_app", ROOT / "Translator_Dashboard" / "app.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.app.config.update(TESTING=True, LOGIN_DISABLED=True)
+    monkeypatch.setattr(module.aws, "get_parameters_from_store", lambda keys: {"get_article": "https://get-article"})
+    return module
+
+
+class Page:
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+def test_the_article_listing_passes_cursors_through(dashboard, monkeypatch):
+    sent = []
+    page = {"items": [{"id": 3, "title": "Three"}], "per_page": 1, "next_cursor": "n3", "prev_cursor": "p3"}
+
+    def conditional_get(url, params=None, headers=None):
+        sent.append((url, params))
+        return Page(page)
+
+    monkeypatch.setattr(dashboard.http_client, "conditional_get", conditional_get)
+
+    response = dashboard.app.test_client().get("/get_articles?fields=id,title&per_page=1&cursor=n2")
+
+    assert response.status_code == 200
+    assert response.get_json() == page
+    # Only the listing parameters go to get_article, so it answers with a page and not an article
+    assert sent == [("https://get-article", {"fields": "id,title", "per_page": "1", "cursor": "n2"})]
+
+
+def test_a_failed_listing_is_an_error(dashboard, monkeypatch):
+    failed = types.SimpleNamespace(status_code=400)
+    monkeypatch.setattr(dashboard.http_client, "conditional_get", lambda url, params=None, headers=None: failed)
+
+    response = dashboard.app.test_client().get("/get_articles?per_page=20&cursor=broken")
+
+    assert response.status_code == 500
+    assert response.get_json()["success"] is False
@@ -0,0 +1,84 @@
+import threading
+import time
+import types
+
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda):
+    return load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="memory")
+
+
+class FlakySession:
+    """Answers every request with the given status and records the timeouts it was sent with."""
+
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": retry_after} if retry_after else {}
+        self.timeouts = []
+
+    def request(self, method, url, **kwargs):
+        self.timeouts.append(kwargs["timeout"])
+        return types.SimpleNamespace(status_code=self.status_code, headers=self.headers, close=lambda: None)
+
+
+def test_http_client_does_not_wait_for_a_retry_past_the_deadline(aws, monkeypatch):
+    client = aws.HTTPClient()
+    client.session = FlakySession(503, retry_after="10")
+    monkeypatch.setattr(aws.time, "sleep", lambda seconds: pytest.fail("slept past the deadline"))
+
+    response = client.post("https://translate.example/translate", deadline=time.time() + 2)
+
+    # One attempt, its timeouts cut to the two seconds left, and no retry
+    assert response.status_code == 503
+    assert len(client.session.timeouts) == 1
+    assert all(timeout <= 2 for timeout in client.session.timeouts[0])
+
+
+def test_http_client_refuses_to_send_after_the_deadline(aws):
+    client = aws.HTTPClient()
+    client.session = FlakySession(200)
+
+    with pytest.raises(aws.DeadlineExceededError):
+        client.get("https://translate.example/languages", deadline=time.time() - 1)
+    assert client.session.timeouts == []
+
+
+def test_batch_retries_stop_when_the_backoff_would_pass_the_deadline(aws, monkeypatch, translate):
+    calls = []
+
+    def translate_batch(texts, from_lang, to_lang, deadline=None):
+        calls.append(deadline)
+        raise aws.requests.Timeout("read timed out")
+
+    monkeypatch.setattr(aws, "CHUNK_RETRY_BACKOFF_SECONDS", 5.0)
+    monkeypatch.setattr(aws.time, "sleep", lambda seconds: pytest.fail("slept past the deadline"))
+    segmented = aws.SegmentedTranslator(translate_batch, aws.TextSegmenter(100, lines=True), memory=None)
+    deadline = time.time() + 1
+
+    # The batch fails with the provider's own error, so the record is requeued with a delay
+    with pytest.raises(aws.requests.Timeout):
+        translate(segmented, "Hello.\n", "en", "de", deadline=deadline)
+    assert calls == [deadline]
+
+
+def test_a_batch_abandoned_at_the_deadline_writes_nothing(aws):
+    release = threading.Event()
+
+    def translate_batch(texts, from_lang, to_lang, deadline=None):
+        release.wait(5)
+        return ["Hallo."] * len(texts)
+
+    memory = aws.TranslationMemory(None, "aws")
+    segmented = aws.SegmentedTranslator(translate_batch, aws.TextSegmenter(100, lines=True), memory=memory)
+    job = segmented.start(["Hello."], "en", ["de"], deadline=time.time() + 0.1)
+
+    results = segmented.finish(job, return_exceptions=True)
+    release.set()
+    aws.concurrent.futures.wait(job["futures"])
+
+    # The text failed at the deadline and stays failed, nor is the late answer remembered
+    assert isinstance(results["de"][0], aws.DeadlineExceededError)
+    assert job["translated"]["de"] == [None]
+    assert memory.lookup_many(["Hello."], "en", "de") == {}
@@ -0,0 +1,62 @@
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda, tmp_path):
+    return load_lambda(
+        "translation_services/aws_lambda",
+        TRANSLATION_MEMORY_BACKEND="sqlite",
+        TRANSLATION_MEMORY_SQLITE_PATH=str(tmp_path / "translation_memory.sqlite3"),
+    )
+
+
+class FakeDynamoDB:
+    def __init__(self):
+        self.deleted = []
+
+    def delete_item(self, **kwargs):
+        self.deleted.append(kwargs)
+
+
+def record(**fields):
+    return dict({"id": "42", "title": "Title", "text": "Text.", "from_lang": "en", "to_langs": ["de", "fr"]}, **fields)
+
+
+def test_only_the_same_stored_source_is_skipped(aws):
+    stored = record()
+    aws.translation_memory.record_documents({aws.document_key(stored, "de"): aws.source_hash(stored)})
+
+    records, ids = aws.skip_translated_documents([record(), record(text="Edited."), record(force=True)], [1, 2, 3])
+
+    assert ids == [1, 2, 3]
+    assert [r["to_langs"] for r in records] == [["fr"], ["de", "fr"], ["de", "fr"]]
+
+
+def test_the_shared_index_is_the_default(load_lambda):
+    aws = load_lambda("translation_services/aws_lambda")
+    delete = load_lambda("delete_translation")
+
+    assert isinstance(aws.translation_memory.store, aws.DynamoTranslationStore)
+    assert aws.translation_memory.store.table == delete.TRANSLATION_MEMORY_TABLE
+
+
+def test_a_per_container_index_skips_nothing(load_lambda):
+    aws = load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="memory")
+    aws.translation_memory.record_documents({aws.document_key(record(), "de"): aws.source_hash(record())})
+
+    records, ids = aws.skip_translated_documents([record(to_langs=["de"])], [1])
+
+    assert ids == [1]
+
+
+def test_deleting_a_translation_clears_its_fingerprints(aws, load_lambda, monkeypatch):
+    delete = load_lambda("delete_translation", TRANSLATION_MEMORY_TABLE="translation_memory")
+    client = FakeDynamoDB()
+    monkeypatch.setattr(delete.document_index, "client", client)
+
+    delete.document_index.forget("42", "en", "de")
+
+    keys = [item["Key"]["segment_key"]["S"] for item in client.deleted]
+    assert aws.document_key(record(), "de") in keys
+    assert {item["TableName"] for item in client.deleted} == {"translation_memory"}
+    assert len(keys) == len(delete.TRANSLATION_PROVIDERS)
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda, monkeypatch):
+    module = load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="off")
+    monkeypatch.setattr(module.aws, "get_parameters_from_store", lambda: {"put_first": "https://put-first"})
+    return module
+
+
+def message(message_id, group, article_id, receive_count=1):
+    return {
+        "messageId": message_id,
+        "receiptHandle": f"handle-{message_id}",
+        "body": json.dumps({"id": article_id, "text": "Hello.", "from_lang": "en", "to_lang": "de"}),
+        "attributes": {"MessageGroupId": group, "ApproximateReceiveCount": str(receive_count)},
+        "eventSourceARN": "arn:aws:sqs:us-east-1:123456789012:translations.fifo",
+    }
+
+
+def test_a_failure_fails_the_rest_of_its_group_only(aws):
+    messages = [message("m1", "a", 1), message("m2", "b", 2), message("m3", "a", 3), message("m4", "b", 4)]
+
+    assert aws.fifo_failures(messages, ["m1"]) == ["m1", "m3"]
+    assert aws.fifo_failures(messages, ["m4", "m2"]) == ["m2", "m4"]
+    # Without groups, as on a standard queue, every message stands alone
+    for entry in messages:
+        del entry["attributes"]["MessageGroupId"]
+    assert aws.fifo_failures(messages, ["m1"]) == ["m1"]
+
+
+def test_only_transient_failures_are_delayed_and_their_group_is_held(aws, monkeypatch):
+    throttled = aws.ClientError({"Error": {"Code": "ThrottlingException"}}, "TranslateText")
+    errors = {1: throttled, 4: ValueError("Unsupported language pair")}
+
+    def translate_records(segmented, records, deadline=None, **options):
+        results = [{"de": errors.get(record["id"], ("", "Hallo."))} for record in records]
+        return results, [{"de": 0} for _ in records]
+
+    stored, delayed = [], []
+    monkeypatch.setattr(aws, "translate_records", translate_records)
+    monkeypatch.setattr(
+        aws.aws,
+        "insert_translations",
+        lambda endpoint, translations, deadline=None: stored.extend(t["id"] for t in translations)
+        or [None] * len(translations),
+    )
+    monkeypatch.setattr(aws.aws, "requeue_with_delay", lambda messages: delayed.extend(messages))
+
+    records = [message("m1", "a", 1), message("m2", "b", 2), message("m3", "a", 3), message("m4", "c", 4)]
+    response = aws.lambda_handler({"Records": records}, None)
+
+    # m3 is behind m1 in group a, so it is neither stored nor acknowledged
+    assert [item["itemIdentifier"] for item in response["batchItemFailures"]] == ["m1", "m3", "m4"]
+    assert stored == [2]
+    # The poison message m4 is not delayed, only the throttled m1 waits
+    assert [entry["messageId"] for entry in delayed] == ["m1"]
+
+
+def test_messages_behind_an_unreadable_one_are_not_translated(aws, monkeypatch):
+    translated = []
+
+    def translate_records(segmented, records, deadline=None, **options):
+        translated.extend(record["id"] for record in records)
+        return [{"de": ("", "Hallo.")} for _ in records], [{"de": 0} for _ in records]
+
+    monkeypatch.setattr(aws, "translate_records", translate_records)
+    monkeypatch.setattr(aws.aws, "insert_translations", lambda endpoint, translations, deadline=None: [None] * len(translations))
+    broken = dict(message("m1", "a", 1), body="{not json")
+
+    response = aws.lambda_handler({"Records": [broken, message("m2", "a", 2), message("m3", "b", 3)]}, None)
+
+    assert translated == [3]
+    assert [item["itemIdentifier"] for item in response["batchItemFailures"]] == ["m1", "m2"]
+
+
+def test_shard_groups_are_delayed_for_less(aws, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        aws.aws.sqs,
+        "change_message_visibility_batch",
+        lambda QueueUrl, Entries: calls.append(Entries) or {"Successful": Entries},
+        raising=False,
+    )
+
+    aws.aws.requeue_with_delay([message("m1", "shard-3", 1, receive_count=10), message("m2", "7", 2, receive_count=10)])
+
+    [entries] = calls
+    assert entries[0]["VisibilityTimeout"] <= aws.REQUEUE_SHARD_MAX_DELAY_SECONDS
+    assert entries[1]["VisibilityTimeout"] >= aws.REQUEUE_MAX_DELAY_SECONDS / 2
@@ -0,0 +1,76 @@
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def google(load_lambda, tmp_path):
+    return load_lambda(
+        "translation_services/google_lambda",
+        TRANSLATION_MEMORY_BACKEND="off",
+        GCP_CREDENTIALS_PATH=str(tmp_path / "gcp_creds.json"),
+    )
+
+
+class FakeS3:
+    def __init__(self, etag):
+        self.etag = etag
+        self.heads = 0
+        self.downloads = 0
+
+    def head_object(self, Bucket, Key):
+        self.heads += 1
+        return {"ETag": self.etag}
+
+    def download_file(self, bucket, key, path):
+        self.downloads += 1
+        with open(path, "w") as f:
+            f.write(self.etag)
+
+
+def test_credentials_are_downloaded_once_and_revalidated_by_etag(google, monkeypatch):
+    s3 = FakeS3('"v1"')
+    credentials = google.CachedCredentials(path=google.GCP_CREDENTIALS_PATH, check_seconds=300)
+
+    assert credentials.ensure(s3, "bucket") is True
+    # Within the check interval not even the ETag is asked for
+    assert credentials.ensure(s3, "bucket") is False
+    assert (s3.heads, s3.downloads) == (1, 1)
+
+    monkeypatch.setattr(credentials, "checked_at", 0)
+    assert credentials.ensure(s3, "bucket") is False
+    assert (s3.heads, s3.downloads) == (2, 1)
+
+    s3.etag = '"v2"'
+    monkeypatch.setattr(credentials, "checked_at", 0)
+    assert credentials.ensure(s3, "bucket") is True
+    assert open(credentials.path).read() == '"v2"'
+    assert credentials.stats == {"downloads": 2, "validations": 1, "hits": 1}
+
+
+def test_the_client_is_built_once_and_again_after_a_key_rotation(google, monkeypatch):
+    built = []
+    translate = types.ModuleType("google.cloud.translate")
+    translate.TranslationServiceClient = lambda: built.append(object()) or built[-1]
+    cloud = types.ModuleType("google.cloud")
+    cloud.translate = translate
+    monkeypatch.setitem(sys.modules, "google", types.ModuleType("google"))
+    monkeypatch.setitem(sys.modules, "google.cloud", cloud)
+    monkeypatch.setitem(sys.modules, "google.cloud.translate", translate)
+    s3 = FakeS3('"v1"')
+    monkeypatch.setattr(google.aws, "s3", s3)
+
+    google.aws.download_creds_from_s3("bucket")
+    client = google.translator.get_client()
+    assert google.translator.get_client() is client
+
+    monkeypatch.setattr(google.gcp_credentials, "checked_at", 0)
+    google.aws.download_creds_from_s3("bucket")
+    assert google.translator.get_client() is client
+
+    s3.etag = '"v2"'
+    monkeypatch.setattr(google.gcp_credentials, "checked_at", 0)
+    google.aws.download_creds_from_s3("bucket")
+    assert google.translator.get_client() is not client
+    assert len(built) == 2
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def get_article(load_lambda):
+    return load_lambda("get_article")
+
+
+def request(get_article, **params):
+    return get_article.handler({"queryStringParameters": params, "headers": {}}, None)
+
+
+def test_ids_are_read_in_one_query_and_answered_in_the_requested_order(get_article, fake_database):
+    cnx = fake_database(get_article, [(7, "Title 7", "Text"), (9, "Title 9", "Text")])
+
+    response = request(get_article, ids="9, 7,8")
+
+    [(query, params)] = cnx.fake_cursor.executed
+    assert "id IN (%s, %s, %s)" in query and params == ["9", "7", "8", 3]
+    # Article 8 does not exist and is left out
+    assert [entry["id"] for entry in json.loads(response["body"])] == [9, 7]
+
+
+def test_a_single_id_in_ids_is_still_a_list(get_article, fake_database):
+    fake_database(get_article, [(7, "Title 7", "Text")])
+
+    assert json.loads(request(get_article, ids="7")["body"]) == [{"id": 7, "title": "Title 7", "text": "Text"}]
+    assert json.loads(request(get_article, ids="8")["body"]) == []
+
+
+def test_too_many_ids_are_rejected_before_any_read(get_article, fake_database):
+    cnx = fake_database(get_article, [])
+
+    response = request(get_article, ids=",".join(str(i) for i in range(get_article.MAX_IDS + 1)))
+
+    assert response["statusCode"] == 400
+    assert cnx.fake_cursor.executed == []
+    assert request(get_article, ids=",".join(str(i) for i in range(get_article.MAX_IDS)))["statusCode"] == 200
+
+
+def listing(get_article, **params):
+    response = request(get_article, **params)
+    assert response["statusCode"] == 200, response["body"]
+    return json.loads(response["body"])
+
+
+def test_a_listing_reads_only_the_requested_fields(get_article, fake_database):
+    cnx = fake_database(get_article, [(1, "Title 1"), (2, "Title 2")])
+
+    body = listing(get_article, fields="title", per_page="5")
+
+    [(query, params)] = cnx.fake_cursor.executed
+    # id is always read, the cursors are built from it; BodyText is not
+    assert query == "SELECT id, title FROM HighTimes ORDER BY id ASC LIMIT %s" and params == [6]
+    assert body["items"] == [{"id": 1, "title": "Title 1"}, {"id": 2, "title": "Title 2"}]
+    assert body["next_cursor"] is None and body["prev_cursor"] is None
+
+
+def test_unknown_fields_are_rejected(get_article, fake_database):
+    fake_database(get_article, [])
+
+    assert request(get_article, fields="title,author")["statusCode"] == 400
+
+
+def test_listing_cursors_seek_on_the_primary_key(get_article, fake_database):
+    cnx = fake_database(get_article, [(1,), (2,), (3,)])
+
+    first = listing(get_article, fields="id", per_page="2")
+    assert [item["id"] for item in first["items"]] == [1, 2]
+    assert get_article.decode_cursor(first["next_cursor"]) == (2, "next")
+
+    cnx.fake_cursor.answer = [(3,)]
+    second = listing(get_article, fields="id", per_page="2", cursor=first["next_cursor"])
+    assert cnx.fake_cursor.executed[-1] == ("SELECT id FROM HighTimes WHERE id > %s ORDER BY id ASC LIMIT %s", [2, 3])
+    assert second["next_cursor"] is None
+
+    # Back from the last page, the rows come nearest first and are returned in order
+    cnx.fake_cursor.answer = [(2,), (1,)]
+    back = listing(get_article, fields="id", per_page="2", cursor=second["prev_cursor"])
+    assert cnx.fake_cursor.executed[-1] == ("SELECT id FROM HighTimes WHERE id < %s ORDER BY id DESC LIMIT %s", [3, 3])
+    assert [item["id"] for item in back["items"]] == [1, 2]
+    assert back["prev_cursor"] is None
+    assert get_article.decode_cursor(back["next_cursor"]) == (2, "next")
+
+
+def test_per_page_is_capped(get_article, fake_database):
+    cnx = fake_database(get_article, [])
+
+    assert listing(get_article, per_page="100000")["per_page"] == get_article.MAX_PER_PAGE
+    assert cnx.fake_cursor.executed[0][1] == [get_article.MAX_PER_PAGE + 1]
+
+
+def test_the_total_is_counted_only_when_asked_for_and_then_shared(load_lambda, fake_database, tmp_path):
+    get_article = load_lambda("get_article", CACHE_DIR=str(tmp_path))
+
+    def answer(query, params):
+        return [(42,)] if query.startswith("SELECT COUNT(*)") else [(1, "Title 1")]
+
+    cnx = fake_database(get_article, answer)
+
+    assert "total" not in listing(get_article, fields="title")
+    assert listing(get_article, fields="title", include_total="1")["total"] == 42
+    assert listing(get_article, fields="title", include_total="true")["total"] == 42
+
+    counts = [query for query, _ in cnx.fake_cursor.executed if query.startswith("SELECT COUNT(*)")]
+    assert len(counts) == 1
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def get_first(load_lambda):
+    return load_lambda("get_first")
+
+
+def bundle_event(**params):
+    return {"queryStringParameters": dict({"bundle": "1", "to_lang": "de"}, **params), "headers": {}}
+
+
+def test_a_bundle_id_without_direction_is_looked_up_exactly(get_first):
+    db = get_first.HTDatabase()
+
+    query, params = db.construct_bundle_query(id="7", direction=None, lang_to="de", limit=1)
+    assert "text_id = %s" in query and params[:2] == ["de", "7"]
+
+    query, _ = db.construct_bundle_query(id="7", direction="next", lang_to="de", limit=5)
+    assert "text_id > %s" in query
+
+
+def test_a_missing_bundle_id_is_not_found(get_first, fake_database):
+    cnx = fake_database(get_first, [])
+
+    response = get_first.lambda_handler(bundle_event(id="7"), None)
+
+    assert response["statusCode"] == 404
+    assert cnx.fake_cursor.executed[0][1][:2] == ["de", "7"]
+
+
+def test_walking_past_the_last_bundle_is_an_empty_page(get_first, fake_database):
+    fake_database(get_first, [])
+
+    response = get_first.lambda_handler(bundle_event(id="7", direction="next", limit="5"), None)
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["bundles"] == []
+
+
+def bundle_row(text_id, providers_id):
+    # The content columns, then the source title and text
+    content = json.dumps({"text": f"Text {text_id} by {providers_id}."})
+    translation_id = text_id * 10 + providers_id
+    return ("done", content, "de", "en", providers_id, text_id, translation_id, "c", f"Title {text_id}", "Body")
+
+
+def test_walking_forward_bundles_the_next_articles_with_every_provider(get_first, fake_database):
+    cnx = fake_database(get_first, [bundle_row(8, 1), bundle_row(8, 2), bundle_row(8, 3), bundle_row(9, 1)])
+
+    response = get_first.lambda_handler(bundle_event(id="7", direction="next", limit="2"), None)
+
+    query, params = cnx.fake_cursor.executed[0]
+    assert "text_id > %s" in query and "ORDER BY text_id ASC" in query
+    assert params == ["de", "7", 2, "de"]
+    bundles = json.loads(response["body"])["bundles"]
+    assert [bundle["id"] for bundle in bundles] == [8, 9]
+    assert bundles[0]["article"] == {"title": "Title 8", "text": "Body"}
+    assert bundles[0]["translations"]["GCP"]["text"] == {"text": "Text 8 by 2."}
+    # A provider that has not translated the article yet is null
+    assert bundles[1]["translations"]["AWS"]["id"] == 9
+    assert bundles[1]["translations"]["GCP"] is None and bundles[1]["translations"]["AZURE"] is None
+
+
+def test_walking_back_returns_the_nearest_article_first(get_first, fake_database):
+    cnx = fake_database(get_first, [bundle_row(6, 1), bundle_row(5, 1)])
+
+    response = get_first.lambda_handler(bundle_event(id="7", direction="prev", limit="2"), None)
+
+    query, _ = cnx.fake_cursor.executed[0]
+    assert "text_id < %s" in query and "ORDER BY text_id DESC" in query
+    assert [bundle["id"] for bundle in json.loads(response["body"])["bundles"]] == [6, 5]
+
+
+def test_bundles_need_a_target_language(get_first):
+    response = get_first.lambda_handler({"queryStringParameters": {"bundle": "1", "id": "7"}, "headers": {}}, None)
+
+    assert response["statusCode"] == 400
@@ -0,0 +1,89 @@
+import threading
+import time
+import types
+
+import pytest
+
+
+@pytest.fixture
+def azure(load_lambda):
+    return load_lambda("translation_services/azure_lambda", TRANSLATION_MEMORY_BACKEND="off")
+
+
+class ThrottledSession:
+    """Answers every request with 429."""
+
+    def __init__(self, requests_module):
+        self.requests = requests_module
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        response = types.SimpleNamespace(status_code=429, headers={}, close=lambda: None)
+
+        def raise_for_status():
+            raise self.requests.HTTPError("429 Too Many Requests", response=response)
+
+        response.raise_for_status = raise_for_status
+        return response
+
+
+def test_new_connections_are_counted_on_the_thread_that_opens_them(azure):
+    client = azure.HTTPClient()
+    opening = threading.Event()
+    reused = threading.Event()
+
+    class InterleavedSession:
+        def request(self, method, url, **kwargs):
+            if url.endswith("/new"):
+                client.opened.count += 1
+                opening.set()
+                # The other thread's whole request runs while this one holds a new connection
+                reused.wait(5)
+            else:
+                opening.wait(5)
+                reused.set()
+            return types.SimpleNamespace(status_code=200, headers={})
+
+    client.session = InterleavedSession()
+    threads = [
+        threading.Thread(target=client.get, args=("https://translate.example/" + path,)) for path in ("new", "reused")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = client.snapshot()
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 1
+
+
+def test_counting_pools_open_connections_through_the_wrapped_class(azure):
+    from mtdock.http import OpenedConnections
+
+    opened = OpenedConnections()
+
+    class Pool:
+        def _new_conn(self):
+            return "connection"
+
+    assert opened.counting(Pool)()._new_conn() == "connection"
+    assert opened.count == 1
+
+
+def test_each_azure_429_is_counted_once(azure, monkeypatch):
+    from mtdock.http import HTTP_MAX_ATTEMPTS
+
+    session = ThrottledSession(azure.requests)
+    monkeypatch.setattr(azure.http_client, "session", session)
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+    with pytest.raises(azure.requests.HTTPError):
+        azure.rate_limiter.call(
+            azure.translator.post_translate, "https://translate.example", {}, {}, [{"text": "Hi."}], chars=3
+        )
+
+    # The retried ones from the HTTP client, the last one from its raise_for_status error
+    assert session.calls == HTTP_MAX_ATTEMPTS
+    assert azure.rate_limiter.stats["throttled"] == session.calls
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def get_first(load_lambda):
+    return load_lambda("get_first")
+
+
+@pytest.fixture
+def get_final(load_lambda):
+    return load_lambda("get_final")
+
+
+def first_row(text_id, translation_id):
+    # status, content, lang_to, lang_from, providers_id, text_id, translation_id, checksum
+    content = json.dumps({"text": f"Text {text_id}."})
+    return ("done", content, "de", "en", 1, text_id, translation_id, f"c{translation_id}")
+
+
+def final_row(text_id):
+    return (text_id, json.dumps({"text": f"Text {text_id}."}), f"c{text_id}")
+
+
+def page(handler, **params):
+    response = handler.lambda_handler({"queryStringParameters": params, "headers": {}}, None)
+    assert response["statusCode"] == 200, response["body"]
+    return json.loads(response["body"])
+
+
+def test_a_first_page_reads_one_extra_row_to_find_the_next(get_first, fake_database):
+    cnx = fake_database(get_first, [first_row(1, 10), first_row(2, 20), first_row(3, 30)])
+
+    body = page(get_first, to_lang="de", limit="2")
+
+    query, params = cnx.fake_cursor.executed[0]
+    assert "ORDER BY translations.text_id ASC" in query and params[-1] == 3
+    assert [item["id"] for item in body["items"]] == [1, 2]
+    assert get_first.decode_cursor(body["next_cursor"]) == ([2, 20], "next")
+    assert body["prev_cursor"] is None
+
+
+def test_a_next_cursor_continues_after_its_row(get_first, fake_database):
+    cnx = fake_database(get_first, [first_row(3, 30)])
+    cursor = get_first.encode_cursor([2, 20], "next")
+
+    body = page(get_first, to_lang="de", cursor=cursor, limit="2")
+
+    query, params = cnx.fake_cursor.executed[0]
+    assert "(translations.text_id > %s OR (translations.text_id = %s AND translations.translation_id > %s))" in query
+    assert params[:3] == [2, 2, 20]
+    # The last page, but there is one before it
+    assert body["next_cursor"] is None
+    assert get_first.decode_cursor(body["prev_cursor"]) == ([3, 30], "prev")
+
+
+def test_a_prev_cursor_reads_backwards_and_returns_the_page_in_order(get_first, fake_database):
+    # Rows come nearest first from the descending index scan
+    cnx = fake_database(get_first, [first_row(4, 40), first_row(3, 30), first_row(2, 20)])
+    cursor = get_first.encode_cursor([5, 50], "prev")
+
+    body = page(get_first, to_lang="de", cursor=cursor, limit="2")
+
+    query, _ = cnx.fake_cursor.executed[0]
+    assert "ORDER BY translations.text_id DESC, translations.translation_id DESC" in query
+    assert [item["id"] for item in body["items"]] == [3, 4]
+    assert get_first.decode_cursor(body["prev_cursor"]) == ([3, 30], "prev")
+    assert get_first.decode_cursor(body["next_cursor"]) == ([4, 40], "next")
+
+
+def test_limits_are_capped_and_bad_cursors_rejected(get_first, fake_database):
+    cnx = fake_database(get_first, [])
+
+    body = page(get_first, to_lang="de", limit="1000")
+    assert body["limit"] == get_first.MAX_PAGE_SIZE
+    assert cnx.fake_cursor.executed[0][1][-1] == get_first.MAX_PAGE_SIZE + 1
+
+    for cursor in ("not-a-cursor", get_first.encode_cursor([1], "next"), get_first.encode_cursor([1, 1], "up")):
+        response = get_first.lambda_handler({"queryStringParameters": {"cursor": cursor}, "headers": {}}, None)
+        assert response["statusCode"] == 400
+
+
+def test_final_translations_page_by_text_id(get_final, fake_database):
+    cnx = fake_database(get_final, [final_row(3), final_row(4), final_row(5)])
+
+    body = page(get_final, id="3", limit="2")
+
+    query, params = cnx.fake_cursor.executed[0]
+    assert "edited_translations.text_id >= %s" in query and params == ["3", 3]
+    assert [item["id"] for item in body["items"]] == [3, 4]
+    assert get_final.decode_cursor(body["next_cursor"]) == (4, "next")
+    # Started from an id, so the articles before it are a page back
+    assert get_final.decode_cursor(body["prev_cursor"]) == (3, "prev")
+
+    cnx.fake_cursor.answer = [final_row(2), final_row(1)]
+    body = page(get_final, cursor=body["prev_cursor"], limit="2")
+
+    query, params = cnx.fake_cursor.executed[-1]
+    assert "edited_translations.text_id < %s" in query and params == [3, 3]
+    assert [item["id"] for item in body["items"]] == [1, 2]
+    assert body["prev_cursor"] is None
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda, monkeypatch):
+    module = load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="off")
+    monkeypatch.setattr(module.aws, "get_parameters_from_store", lambda: {"put_first": "https://put-first"})
+    return module
+
+
+def test_target_languages_accept_the_older_single_language(aws):
+    assert aws.target_languages({"to_langs": ["de", "fr", "de"]}) == ["de", "fr"]
+    assert aws.target_languages({"to_lang": "es"}) == ["es"]
+
+
+def test_one_message_is_stored_once_per_target_language(aws, monkeypatch):
+    translated_into = []
+
+    def translate_batch(texts, from_lang, to_lang, deadline=None):
+        translated_into.append(to_lang)
+        return [f"{to_lang}:{text}" for text in texts]
+
+    stored = []
+    monkeypatch.setattr(aws.translator.segmented, "translate_batch", translate_batch)
+    monkeypatch.setattr(
+        aws.aws,
+        "insert_translations",
+        lambda endpoint, translations, deadline=None: stored.extend(translations) or [None] * len(translations),
+    )
+    body = {"id": 7, "title": "Title.", "text": "Text.", "from_lang": "en", "to_langs": ["de", "fr", "es"]}
+
+    response = aws.lambda_handler({"Records": [{"messageId": "m1", "body": json.dumps(body)}]}, None)
+
+    assert response == {"batchItemFailures": []}
+    assert sorted(set(translated_into)) == ["de", "es", "fr"]
+    assert {t["lang_to"]: (t["title"], t["text"]) for t in stored} == {
+        lang: (f"{lang}:Title.", f"{lang}:Text.") for lang in ("de", "fr", "es")
+    }
+
+
+def test_records_with_different_targets_are_translated_into_their_own(aws):
+    def translate_batch(texts, from_lang, to_lang, deadline=None):
+        return [f"{to_lang}:{text}" for text in texts]
+
+    segmented = aws.SegmentedTranslator(translate_batch, aws.TextSegmenter(100, lines=True), memory=None)
+    records = [
+        {"text": "One.", "from_lang": "en", "to_langs": ["de", "fr"]},
+        {"text": "Two.", "from_lang": "en", "to_lang": "es"},
+    ]
+
+    results, _ = aws.translate_records(segmented, records)
+
+    assert results == [{"de": (None, "de:One."), "fr": (None, "fr:One.")}, {"es": (None, "es:Two.")}]
+
+
+def test_push_to_fifo_sends_every_target_language_in_one_message(load_lambda, monkeypatch):
+    push = load_lambda("push_to_fifo")
+    parameters = {"sqs_aws": "aws", "sqs_azure": "azure", "sqs_gcp": "gcp", "get_article": "https://get-article"}
+    monkeypatch.setattr(push.AWSClient, "get_parameters_from_store", lambda self: parameters)
+    monkeypatch.setattr(
+        push.AWSClient, "call_api", lambda self, id=None, title=None: json.dumps({"id": id, "text": "Hi."})
+    )
+    sent = []
+    monkeypatch.setattr(push.AWSClient, "send_to_sqs", lambda self, message, queue: sent.append((queue, message)))
+
+    event = {"queryStringParameters": {"id": "7", "from_lang": "en", "to_lang": "de, fr"}}
+    response = push.lambda_handler(event, None)
+
+    assert response["statusCode"] == 200
+    assert sorted(queue for queue, _ in sent) == ["aws", "azure", "gcp"]
+    assert all(message["to_langs"] == ["de", "fr"] for _, message in sent)
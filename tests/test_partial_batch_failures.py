@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda, monkeypatch):
+    module = load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="off")
+    monkeypatch.setattr(module.aws, "get_parameters_from_store", lambda: {"put_first": "https://put-first"})
+    monkeypatch.setattr(module.aws, "requeue_with_delay", lambda messages: None)
+    return module
+
+
+def message(message_id, article_id, to_langs=("de",)):
+    # A standard queue, every message stands on its own
+    body = {"id": article_id, "text": "Hello.", "from_lang": "en", "to_langs": list(to_langs)}
+    return {"messageId": message_id, "receiptHandle": f"handle-{message_id}", "body": json.dumps(body)}
+
+
+def failed_ids(response):
+    return [item["itemIdentifier"] for item in response["batchItemFailures"]]
+
+
+@pytest.fixture
+def translated(aws, monkeypatch):
+    """Every language translates, except those listed per article id."""
+    errors = {}
+
+    def translate_records(segmented, records, deadline=None, **options):
+        results = [
+            {lang: errors.get((record["id"], lang), ("", "Hallo.")) for lang in record["to_langs"]}
+            for record in records
+        ]
+        return results, [{lang: 0 for lang in record["to_langs"]} for record in records]
+
+    monkeypatch.setattr(aws, "translate_records", translate_records)
+    return errors
+
+
+def test_an_invocation_without_failures_acknowledges_everything(aws, translated, monkeypatch):
+    monkeypatch.setattr(
+        aws.aws, "insert_translations", lambda endpoint, translations, deadline=None: [None] * len(translations)
+    )
+
+    response = aws.lambda_handler({"Records": [message("m1", 1), message("m2", 2)]}, None)
+
+    assert response == {"batchItemFailures": []}
+
+
+def test_only_the_messages_whose_translation_was_rejected_are_retried(aws, translated, monkeypatch):
+    def insert_translations(endpoint, translations, deadline=None):
+        return ["Duplicate checksum" if t["id"] == 2 else None for t in translations]
+
+    monkeypatch.setattr(aws.aws, "insert_translations", insert_translations)
+
+    response = aws.lambda_handler({"Records": [message("m1", 1), message("m2", 2), message("m3", 3)]}, None)
+
+    assert failed_ids(response) == ["m2"]
+
+
+def test_one_failed_language_retries_the_message_after_storing_the_others(aws, translated, monkeypatch):
+    translated[(1, "fr")] = ValueError("Unsupported language pair")
+    stored = []
+    monkeypatch.setattr(
+        aws.aws,
+        "insert_translations",
+        lambda endpoint, translations, deadline=None: stored.extend((t["id"], t["lang_to"]) for t in translations)
+        or [None] * len(translations),
+    )
+
+    response = aws.lambda_handler({"Records": [message("m1", 1, ["de", "fr"]), message("m2", 2)]}, None)
+
+    assert failed_ids(response) == ["m1"]
+    assert stored == [(1, "de"), (2, "de")]
+
+
+def test_a_failed_put_first_call_retries_every_message_it_carried(aws, translated, monkeypatch):
+    class Unavailable:
+        status_code = 503
+        text = "Service Unavailable"
+
+    monkeypatch.setattr(aws.http_client, "post", lambda *args, **kwargs: Unavailable())
+
+    response = aws.lambda_handler({"Records": [message("m1", 1), message("m2", 2)]}, None)
+
+    assert failed_ids(response) == ["m1", "m2"]
@@ -0,0 +1,96 @@
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda):
+    return load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="off")
+
+
+class BatchProvider:
+    """Answers every batch call, single or multi-target, and records what it was sent."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, from_lang, to_langs, deadline=None):
+        self.calls.append((list(texts), to_langs))
+        if isinstance(to_langs, str):
+            return [f"{to_langs}:{text}" for text in texts]
+        return {lang: [f"{lang}:{text}" for text in texts] for lang in to_langs}
+
+
+def record(article_id, **fields):
+    texts = {"title": f"Title {article_id}.", "text": f"Text {article_id}."}
+    return dict({"id": article_id, "from_lang": "en", "to_langs": ["de"]}, **dict(texts, **fields))
+
+
+def test_titles_and_texts_of_many_records_share_one_call(aws):
+    provider = BatchProvider()
+    segmented = aws.SegmentedTranslator(
+        provider, aws.TextSegmenter(100, lines=True), max_batch_items=10, memory=None
+    )
+
+    results, _ = aws.translate_records(segmented, [record(1), record(2), record(3)])
+
+    assert len(provider.calls) == 1
+    assert results[1] == {"de": ("de:Title 2.", "de:Text 2.")}
+
+
+def test_batches_respect_the_item_and_size_limits(aws):
+    provider = BatchProvider()
+    segmented = aws.SegmentedTranslator(
+        provider, aws.TextSegmenter(100, lines=True), max_batch_items=4, max_batch_size=20, memory=None
+    )
+
+    aws.translate_records(segmented, [record(i) for i in range(5)])
+
+    assert sum(len(texts) for texts, _ in provider.calls) == 10
+    for texts, _ in provider.calls:
+        assert len(texts) <= 4
+        assert sum(len(text) for text in texts) <= 20
+
+
+def test_multi_target_calls_carry_every_language_that_fits(aws):
+    provider = BatchProvider()
+    segmented = aws.SegmentedTranslator(
+        provider, aws.TextSegmenter(100, lines=True), max_batch_size=40, multi_target=True, memory=None
+    )
+
+    results, _ = aws.translate_records(segmented, [record(1, title=None, to_langs=["de", "fr", "es"])])
+
+    # "Text 1." is 7 characters: five languages would fit a call, so all three go together
+    assert provider.calls == [(["Text 1."], ["de", "fr", "es"])]
+    assert results[0]["fr"] == (None, "fr:Text 1.")
+
+
+def test_multi_target_calls_split_languages_that_do_not_fit(aws):
+    provider = BatchProvider()
+    segmented = aws.SegmentedTranslator(
+        provider, aws.TextSegmenter(100, lines=True), max_batch_size=16, multi_target=True, memory=None
+    )
+
+    aws.translate_records(segmented, [record(1, title=None, to_langs=["de", "fr", "es"])])
+
+    assert sorted(lang for _, to_langs in provider.calls for lang in to_langs) == ["de", "es", "fr"]
+    assert all(len(to_langs) <= 2 for _, to_langs in provider.calls)
+
+
+def test_azure_sends_every_text_and_language_in_one_request(load_lambda, monkeypatch):
+    azure = load_lambda("translation_services/azure_lambda", TRANSLATION_MEMORY_BACKEND="off")
+    requests = []
+
+    def post_translate(endpoint, params, headers, body, deadline=None):
+        requests.append((params["to"], [element["text"] for element in body]))
+        return [
+            {"translations": [{"to": lang, "text": f"{lang}:{element['text']}"} for lang in params["to"]]}
+            for element in body
+        ]
+
+    monkeypatch.setattr(azure.translator, "post_translate", post_translate)
+
+    results, _ = azure.translate_records(
+        azure.translator.segmented, [record(1, to_langs=["de", "fr"]), record(2, to_langs=["de", "fr"])]
+    )
+
+    assert requests == [(["de", "fr"], ["Title 1.", "Text 1.", "Title 2.", "Text 2."])]
+    assert results[1] == {"de": ("de:Title 2.", "de:Text 2."), "fr": ("fr:Title 2.", "fr:Text 2.")}
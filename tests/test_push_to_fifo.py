@@ -0,0 +1,140 @@
+import json
+
+import pytest
+
+PARAMETERS = {"sqs_aws": "https://sqs/aws.fifo", "sqs_azure": "https://sqs/azure.fifo", "sqs_gcp": "https://sqs/gcp.fifo"}
+QUEUES = {"aws": PARAMETERS["sqs_aws"], "azure": PARAMETERS["sqs_azure"], "gcp": PARAMETERS["sqs_gcp"]}
+
+
+@pytest.fixture
+def load_push(load_lambda, monkeypatch):
+    def load(**env):
+        module = load_lambda("push_to_fifo", **env)
+        monkeypatch.setattr(module.AWSClient, "get_parameters_from_store", lambda self: dict(PARAMETERS))
+        return module
+
+    return load
+
+
+class FakeSQS:
+    """Records SendMessageBatch calls; queues in fail answer every entry with an error."""
+
+    def __init__(self, fail=(), fail_ids=()):
+        self.fail = set(fail)
+        self.fail_ids = set(fail_ids)
+        self.batches = []
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self.batches.append((QueueUrl, Entries))
+        if QueueUrl in self.fail:
+            raise RuntimeError("queue unavailable")
+        failed = [entry for entry in Entries if json.loads(entry["MessageBody"])["id"] in self.fail_ids]
+        return {"Failed": [{"Id": entry["Id"], "Code": "InternalError"} for entry in failed]}
+
+
+def article(**fields):
+    return dict({"id": "42", "title": "Title", "text": "Text.", "from_lang": "en", "to_langs": ["de", "fr"]}, **fields)
+
+
+@pytest.mark.parametrize(
+    "strategy, group",
+    [("article", "42"), ("article_lang", "42-de-fr"), ("unknown", "42")],
+)
+def test_message_group_strategies(load_push, strategy, group):
+    push = load_push(MESSAGE_GROUP_STRATEGY=strategy)
+
+    assert push.AWSClient().message_group_id(article()) == group
+
+
+def test_shards_keep_an_article_in_one_of_a_fixed_number_of_groups(load_push):
+    push = load_push(MESSAGE_GROUP_STRATEGY="shard", MESSAGE_GROUP_SHARDS=4)
+    aws = push.AWSClient()
+
+    groups = {aws.message_group_id(article(id=str(article_id))) for article_id in range(100)}
+
+    assert groups == {f"shard-{shard}" for shard in range(4)}
+    assert aws.message_group_id(article(to_langs=["es"])) == aws.message_group_id(article())
+
+
+def test_deduplication_ids_hash_the_content(load_push):
+    aws = load_push().AWSClient()
+    dedup_id = aws.message_deduplication_id(article())
+
+    # Queued again unchanged, the queue drops it; any change to what is translated is a new message
+    assert aws.message_deduplication_id(article()) == dedup_id
+    assert aws.message_deduplication_id(dict(article(), queues="ignored")) == dedup_id
+    for changed in (article(text="Edited."), article(to_langs=["de"]), article(force=True)):
+        assert aws.message_deduplication_id(changed) != dedup_id
+    assert aws.message_deduplication_id(article(payload={"sha256": "a"})) != aws.message_deduplication_id(
+        article(payload={"sha256": "b"})
+    )
+
+
+def test_batches_hold_at_most_ten_entries(load_push):
+    aws = load_push().AWSClient()
+    aws.sqs = FakeSQS()
+
+    errors = aws.send_batch_to_sqs([article(id=str(i)) for i in range(25)], "https://sqs/aws.fifo")
+
+    assert errors == [None] * 25
+    assert [len(entries) for _, entries in aws.sqs.batches] == [10, 10, 5]
+    assert [entry["Id"] for entry in aws.sqs.batches[2][1]] == [str(i) for i in range(20, 25)]
+
+
+def test_batches_stay_under_256_kib(load_push):
+    push = load_push()
+    aws = push.AWSClient()
+    aws.sqs = FakeSQS()
+
+    aws.send_batch_to_sqs([article(id=str(i), text="x" * 100_000) for i in range(5)], "https://sqs/aws.fifo")
+
+    assert [len(entries) for _, entries in aws.sqs.batches] == [2, 2, 1]
+    for _, entries in aws.sqs.batches:
+        assert sum(len(entry["MessageBody"].encode("utf-8")) for entry in entries) <= push.MAX_BATCH_BYTES
+
+
+def test_failed_entries_and_calls_map_to_their_messages(load_push):
+    aws = load_push().AWSClient()
+    aws.sqs = FakeSQS(fail_ids={"3"})
+    messages = [article(id=str(i)) for i in range(12)]
+
+    errors = aws.send_batch_to_sqs(messages, "https://sqs/aws.fifo")
+    assert [index for index, error in enumerate(errors) if error] == [3]
+
+    aws.sqs = FakeSQS(fail={"https://sqs/aws.fifo"})
+    assert aws.send_batch_to_sqs(messages, "https://sqs/aws.fifo") == ["queue unavailable"] * 12
+
+
+def enqueue(push, monkeypatch, sqs, ids=("1", "2")):
+    aws = push.AWSClient()
+    aws.sqs = sqs
+    articles = {article_id: article(id=article_id) for article_id in ("1", "2")}
+    monkeypatch.setattr(aws, "fetch_articles", lambda ids: articles)
+    response = push.enqueue_batch(aws, list(ids), ["de"], "en", QUEUES)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_enqueue_reports_200_when_every_queue_took_every_article(load_push, monkeypatch):
+    status_code, body = enqueue(load_push(), monkeypatch, FakeSQS())
+
+    assert status_code == 200
+    assert body["failed"] == 0
+    assert all(item["queues"] == {"aws": "queued", "azure": "queued", "gcp": "queued"} for item in body["results"])
+
+
+def test_enqueue_reports_207_for_a_partial_failure(load_push, monkeypatch):
+    status_code, body = enqueue(load_push(), monkeypatch, FakeSQS(fail_ids={"2"}), ids=("1", "2", "9"))
+
+    assert status_code == 207
+    # One entry rejected by every queue, and an unknown id failed on its own
+    assert body["failed"] == 2
+    assert body["results"][0]["queues"] == {"aws": "queued", "azure": "queued", "gcp": "queued"}
+    assert body["results"][1]["queues"]["gcp"] == {"error": "InternalError"}
+    assert body["results"][2] == {"id": "9", "to_langs": ["de"], "queues": {}, "error": "Article not found."}
+
+
+def test_enqueue_reports_500_when_nothing_was_queued(load_push, monkeypatch):
+    status_code, body = enqueue(load_push(), monkeypatch, FakeSQS(fail=set(PARAMETERS.values())))
+
+    assert status_code == 500
+    assert body["failed"] == 2
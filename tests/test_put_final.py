@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def put_final(load_lambda, monkeypatch):
+    module = load_lambda("put_final_translation")
+    module.bumped = []
+    monkeypatch.setattr(module.generation_counter, "bump", module.bumped.extend)
+    return module
+
+
+def final_event(put_final, **changes):
+    text = "Bearbeiteter Text."
+    checksum = put_final.HTDatabase().compute_checksum({"text": text, "id": 7}).hex()
+    body = dict(
+        {"id": 7, "text": text, "checksum": checksum, "lang_to": "de", "aws_rating": 4, "gcp_rating": 3,
+         "azure_rating": 5, "comments": "ok"},
+        **changes,
+    )
+    return {"body": json.dumps(body)}
+
+
+def calls(cnx):
+    return [params for query, params in cnx.fake_cursor.executed if query.startswith("CALL SubmitFinalTranslation")]
+
+
+def test_everything_is_written_by_one_procedure_call(put_final, fake_database):
+    cnx = fake_database(put_final, [("saved",)])
+
+    response = put_final.handler(final_event(put_final), None)
+
+    assert (response["statusCode"], response["body"]) == (200, "Data inserted successfully")
+    assert len(cnx.fake_cursor.executed) == 1
+    [params] = calls(cnx)
+    assert params[0] == 7 and json.loads(params[1]) == {"text": "Bearbeiteter Text."}
+    assert params[3:] == (False, 4, 3, 5, "ok", "de")
+    assert put_final.bumped == [7]
+
+
+def test_a_resubmitted_edit_that_exists_changes_nothing(put_final, fake_database):
+    cnx = fake_database(put_final, [("exists",)])
+
+    response = put_final.handler(final_event(put_final, resubmit=True), None)
+
+    assert (response["statusCode"], response["body"]) == (200, "Article already exists.")
+    assert calls(cnx)[0][3] is True
+    assert put_final.bumped == []
+
+
+def test_without_lang_to_the_only_language_of_the_article_is_used(put_final, fake_database):
+    cnx = fake_database(
+        put_final, lambda query, params: [("fr",)] if query.startswith("SELECT DISTINCT lang_to") else [("saved",)]
+    )
+    event = final_event(put_final)
+    body = json.loads(event["body"])
+    del body["lang_to"]
+
+    response = put_final.handler({"body": json.dumps(body)}, None)
+
+    assert response["statusCode"] == 200
+    assert calls(cnx)[0][-1] == "fr"
+
+
+def test_without_lang_to_an_article_in_several_languages_is_refused(put_final, fake_database):
+    cnx = fake_database(
+        put_final, lambda query, params: [("fr",), ("de",)] if query.startswith("SELECT DISTINCT") else [("saved",)]
+    )
+
+    response = put_final.handler(final_event(put_final, lang_to=None), None)
+
+    assert response["statusCode"] == 400
+    assert calls(cnx) == []
+
+
+def test_a_checksum_mismatch_writes_nothing(put_final, fake_database):
+    cnx = fake_database(put_final, [("saved",)])
+
+    response = put_final.handler(final_event(put_final, checksum="0" * 64), None)
+
+    assert response["statusCode"] == 500
+    assert cnx.fake_cursor.executed == []
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def put_first(load_lambda):
+    return load_lambda("put_first_translation")
+
+
+def translation(put_first, article_id, lang_to="de", **changes):
+    text = f"Text {article_id} {lang_to}"
+    checksum = put_first.HTDatabase().compute_checksum({"text": text, "id": article_id}).hex()
+    return dict(
+        {"id": article_id, "text": text, "lang_to": lang_to, "lang_from": "en", "providers_id": 1, "checksum": checksum},
+        **changes,
+    )
+
+
+def batch_event(items):
+    return {"body": json.dumps({"translations": items})}
+
+
+def test_invalid_items_are_rejected_by_index_and_the_rest_written(put_first, fake_database):
+    cnx = fake_database(put_first, [])
+    items = [
+        translation(put_first, 7),
+        translation(put_first, 8, checksum="0" * 64),
+        translation(put_first, 9, providers_id=4),
+        translation(put_first, 10, lang_to=""),
+    ]
+
+    response = put_first.handler(batch_event(items), None)
+
+    assert response["statusCode"] == 207
+    body = json.loads(response["body"])
+    assert body["written"] == 1
+    assert [(item["index"], item["error"]) for item in body["rejected"]] == [
+        (1, "Data corruption. Checksums are not the same."),
+        (2, "Unknown providers_id."),
+        (3, "Missing lang_to."),
+    ]
+    assert cnx.committed
+
+
+def test_a_batch_without_valid_items_does_not_touch_the_database(put_first, fake_database):
+    cnx = fake_database(put_first, [])
+
+    response = put_first.handler(batch_event([translation(put_first, 7, checksum="bad")]), None)
+
+    assert response["statusCode"] == 400
+    assert cnx.fake_cursor.executed == []
+
+
+def test_too_large_a_batch_is_refused(put_first, fake_database, monkeypatch):
+    fake_database(put_first, [])
+    monkeypatch.setattr(put_first, "MAX_BATCH_TRANSLATIONS", 2)
+
+    response = put_first.handler(batch_event([translation(put_first, i) for i in range(3)]), None)
+
+    assert response["statusCode"] == 400
+
+
+def test_stored_checksums_are_skipped_and_the_rest_go_in_one_upsert(put_first, fake_database):
+    stored = translation(put_first, 7)
+    items = [stored, translation(put_first, 8), translation(put_first, 8, lang_to="fr"), translation(put_first, 9)]
+    cnx = fake_database(
+        put_first, lambda query, params: [(7, stored["checksum"])] if query.startswith("SELECT") else []
+    )
+
+    response = put_first.handler(batch_event(items), None)
+
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 200
+    assert (body["written"], body["duplicates"]) == (3, 1)
+
+    select, insert, update = cnx.fake_cursor.executed
+    assert select[0].startswith("SELECT") and len(select[1]) == 8
+    # One executemany carries every new row
+    assert "INSERT INTO translations" in insert[0]
+    assert [(row[0], row[3]) for row in insert[1]] == [(8, "de"), (8, "fr"), (9, "de")]
+    # and one UPDATE sets the status of each article once
+    assert update[0].startswith("UPDATE HighTimes") and update[1] == [8, 9]
+
+
+def test_a_batch_of_duplicates_writes_nothing(put_first, fake_database):
+    stored = translation(put_first, 7)
+    cnx = fake_database(put_first, [(7, stored["checksum"])])
+
+    body = json.loads(put_first.handler(batch_event([stored]), None)["body"])
+
+    assert (body["written"], body["duplicates"]) == (0, 1)
+    assert len(cnx.fake_cursor.executed) == 1
@@ -0,0 +1,95 @@
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda):
+    return load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="off")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+
+
+@pytest.fixture
+def clock(aws, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(aws.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(aws.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_callers_past_the_burst_wait_for_their_tokens(aws, clock):
+    limiter = aws.AdaptiveRateLimiter(requests_per_second=10, chars_per_second=1000, burst_seconds=1)
+
+    for _ in range(10):
+        limiter.acquire(chars=10)
+    assert clock.slept == []
+
+    # The eleventh request is one token short at 10 per second
+    limiter.acquire(chars=10)
+    assert clock.slept == [pytest.approx(0.1)]
+
+    # Characters are metered the same way, a reservation past the burst waits off its debt
+    limiter = aws.AdaptiveRateLimiter(requests_per_second=10, chars_per_second=1000, burst_seconds=1)
+    limiter.acquire(chars=1500)
+    assert clock.slept[-1] == pytest.approx(0.5)
+
+
+def test_throttling_halves_the_rates_once_per_window(aws, clock):
+    limiter = aws.AdaptiveRateLimiter(requests_per_second=10, chars_per_second=1000)
+
+    limiter.throttled()
+    limiter.throttled()
+    assert limiter.rate("requests") == 5
+    assert limiter.stats["throttled"] == 2
+    assert limiter.stats["decreases"] == 1
+
+    clock.now += aws.RATE_LIMIT_ADJUST_SECONDS
+    limiter.throttled()
+    assert limiter.rate("chars") == 250
+
+
+def test_rates_never_drop_below_the_floor(aws, clock):
+    limiter = aws.AdaptiveRateLimiter(requests_per_second=10, chars_per_second=1000)
+
+    for _ in range(20):
+        clock.now += aws.RATE_LIMIT_ADJUST_SECONDS
+        limiter.throttled()
+
+    assert limiter.fraction == aws.RATE_LIMIT_MIN_FRACTION
+
+
+def test_successful_windows_raise_the_rates_back_in_steps(aws, clock):
+    limiter = aws.AdaptiveRateLimiter(requests_per_second=10, chars_per_second=1000)
+    limiter.throttled()
+
+    limiter.succeeded()
+    assert limiter.fraction == 0.5
+
+    clock.now += aws.RATE_LIMIT_ADJUST_SECONDS
+    limiter.succeeded()
+    assert limiter.fraction == pytest.approx(0.5 + aws.RATE_LIMIT_INCREASE_FRACTION)
+
+
+def test_calls_feed_throttling_errors_back(aws, clock):
+    limiter = aws.AdaptiveRateLimiter(requests_per_second=10, chars_per_second=1000)
+    throttled = aws.ClientError({"Error": {"Code": "ThrottlingException"}}, "TranslateText")
+
+    def provider():
+        raise throttled
+
+    with pytest.raises(aws.ClientError):
+        limiter.call(provider, chars=5)
+    with pytest.raises(ValueError):
+        limiter.call(lambda: int("not a number"))
+
+    assert limiter.stats["throttled"] == 1
+    assert limiter.fraction == 0.5
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+ROW = ("done", json.dumps({"title": "Titel", "text": "Hallo."}), "de", "en", 1, 7, 70, "c7")
+
+
+def read_event():
+    return {"queryStringParameters": {"id": "7", "to_lang": "de", "providers_id": "1"}, "headers": {}}
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path)
+
+
+@pytest.fixture
+def get_first(load_lambda, cache_dir):
+    # Generations are read again on every check, as another container's bump would be
+    return load_lambda("get_first", CACHE_DIR=cache_dir, CACHE_GENERATION_TTL_SECONDS=0)
+
+
+def test_a_bump_invalidates_a_cached_read(get_first, load_lambda, cache_dir, fake_database):
+    writer = load_lambda("delete_translation", CACHE_DIR=cache_dir)
+    cnx = fake_database(get_first, [ROW])
+
+    first = get_first.lambda_handler(read_event(), None)
+    assert get_first.lambda_handler(read_event(), None)["body"] == first["body"]
+    assert len(cnx.fake_cursor.executed) == 1
+
+    writer.generation_counter.bump([7])
+
+    get_first.lambda_handler(read_event(), None)
+    assert len(cnx.fake_cursor.executed) == 2
+
+
+def test_entries_are_shared_and_invalidated_across_containers(get_first, load_lambda, cache_dir):
+    other = load_lambda("get_first", CACHE_DIR=cache_dir, CACHE_GENERATION_TTL_SECONDS=0)
+    writer = load_lambda("put_first_translation", CACHE_DIR=cache_dir)
+    key = get_first.read_cache.key("translations", "7", "de", "1")
+
+    get_first.read_cache.put(key, "body", get_first.read_cache.generations(["7"]))
+    assert other.read_cache.get(key) == "body"
+
+    writer.generation_counter.bump(["7"])
+    assert other.read_cache.get(key) is None
+    assert get_first.read_cache.get(key) is None
+
+
+def test_translation_reads_are_not_cached_without_a_shared_store(load_lambda, fake_database):
+    get_first = load_lambda("get_first")
+    cnx = fake_database(get_first, [ROW])
+
+    get_first.lambda_handler(read_event(), None)
+    get_first.lambda_handler(read_event(), None)
+
+    # No writer's bump could reach this container, so every read goes to the database
+    assert len(cnx.fake_cursor.executed) == 2
+    key = get_first.read_cache.key("HighTimes", "count")
+    get_first.read_cache.put(key, 3, {})
+    assert get_first.read_cache.get(key) == 3
+
+
+def test_any_write_invalidates_cached_navigation(get_first, load_lambda, cache_dir, fake_database):
+    writer = load_lambda("put_final_translation", CACHE_DIR=cache_dir)
+    cnx = fake_database(get_first, [ROW])
+    event = {"queryStringParameters": {"id": "7", "to_lang": "de", "direction": "next"}, "headers": {}}
+
+    get_first.lambda_handler(event, None)
+    get_first.lambda_handler(event, None)
+    assert len(cnx.fake_cursor.executed) == 1
+
+    # Article 8 was not in the cached result, but it may now be the next one
+    writer.generation_counter.bump([8])
+
+    get_first.lambda_handler(event, None)
+    assert len(cnx.fake_cursor.executed) == 2
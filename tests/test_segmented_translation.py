@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda):
+    return load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="off")
+
+
+TEXT = "First sentence here. Second one follows!\nA new line.\n\nNext paragraph, a bit longer than the others."
+
+
+class RecordingProvider:
+    """Uppercases every chunk and records the batches it was sent."""
+
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts, from_lang, to_lang, deadline=None):
+        with self.lock:
+            self.batches.append(list(texts))
+        if self.fail is not None and any(self.fail in text for text in texts):
+            raise ValueError(f"Cannot translate {self.fail}")
+        return [text.upper() for text in texts]
+
+
+@pytest.mark.parametrize("max_size", [12, 25, 50, 1000])
+def test_chunks_fit_and_join_back_into_the_text(aws, max_size):
+    segmenter = aws.TextSegmenter(max_size)
+
+    chunks = segmenter.split(TEXT)
+
+    assert "".join(chunks) == TEXT
+    assert all(segmenter.size(chunk) <= max_size for chunk in chunks)
+
+
+def test_splits_prefer_sentence_boundaries(aws):
+    chunks = aws.TextSegmenter(45).split("First sentence here. Second one follows! Third is last.")
+
+    assert chunks == ["First sentence here. Second one follows! ", "Third is last."]
+
+
+def test_byte_budgets_never_cut_a_character(aws):
+    segmenter = aws.TextSegmenter(7, unit="bytes")
+
+    chunks = segmenter.split("ü" * 20)
+
+    assert "".join(chunks) == "ü" * 20
+    assert all(len(chunk.encode("utf-8")) <= 7 for chunk in chunks)
+
+
+def test_translations_keep_the_layout_and_order_of_each_text(aws, translate):
+    provider = RecordingProvider()
+    segmented = aws.SegmentedTranslator(provider, aws.TextSegmenter(25), memory=None)
+
+    assert translate(segmented, TEXT, "en", "de") == TEXT.upper()
+    # Whitespace around a chunk is kept aside, the provider only sees its core
+    assert all(text == text.strip() for batch in provider.batches for text in batch)
+
+
+def test_repeated_chunks_are_translated_once(aws):
+    provider = RecordingProvider()
+    segmented = aws.SegmentedTranslator(provider, aws.TextSegmenter(100, lines=True), memory=None)
+
+    job = segmented.start(["Same line.\nOther line.", "Same line."], "en", ["de"])
+
+    assert segmented.finish(job)["de"] == ["SAME LINE.\nOTHER LINE.", "SAME LINE."]
+    assert sorted(text for batch in provider.batches for text in batch) == ["Other line.", "Same line."]
+
+
+def test_a_failed_chunk_fails_only_the_texts_that_contain_it(aws, monkeypatch):
+    monkeypatch.setattr(aws, "CHUNK_RETRY_BACKOFF_SECONDS", 0.0)
+    provider = RecordingProvider(fail="Broken")
+    segmented = aws.SegmentedTranslator(
+        provider, aws.TextSegmenter(100, lines=True), max_batch_items=1, memory=None
+    )
+
+    job = segmented.start(["Fine.", "Broken.\nFine."], "en", ["de"])
+    results = segmented.finish(job, return_exceptions=True)["de"]
+
+    assert results[0] == "FINE."
+    assert isinstance(results[1], ValueError)
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+TITLE = "A long title " * 30
+
+
+@pytest.mark.parametrize(
+    "directory, column",
+    [("get_first", "translations.content_title"), ("get_final", "edited_translations.content_title")],
+)
+def test_a_title_seeks_on_the_prefix_and_rechecks_the_full_title(load_lambda, directory, column):
+    db = load_lambda(directory).HTDatabase()
+
+    query, params = db.construct_query(title=TITLE)
+
+    assert f"{column} = LEFT(%s, 255)" in query
+    assert "JSON_EXTRACT(" in query and "'$.title') = %s" in query
+    assert params[:2] == [TITLE, TITLE]
+
+
+def test_title_lookups_are_not_cached(load_lambda, fake_database, tmp_path):
+    get_first = load_lambda("get_first", CACHE_DIR=str(tmp_path))
+    row = ("done", json.dumps({"title": TITLE, "text": "Hallo."}), "de", "en", 1, 7, 70, "c7")
+    cnx = fake_database(get_first, [row])
+    event = {"queryStringParameters": {"title": TITLE}, "headers": {}}
+
+    first = get_first.lambda_handler(event, None)
+    get_first.lambda_handler(event, None)
+
+    assert json.loads(first["body"])["text"]["title"] == TITLE
+    assert len(cnx.fake_cursor.executed) == 2
+    assert all(params[:2] == [TITLE, TITLE] for _, params in cnx.fake_cursor.executed)
+
+
+def test_get_article_looks_a_title_up_by_equality(load_lambda, fake_database):
+    get_article = load_lambda("get_article")
+    cnx = fake_database(get_article, [(7, TITLE, "Text")])
+
+    response = get_article.handler({"queryStringParameters": {"title": TITLE}, "headers": {}}, None)
+
+    assert json.loads(response["body"])["id"] == 7
+    [(query, params)] = cnx.fake_cursor.executed
+    assert "title = %s" in query and params == [TITLE]
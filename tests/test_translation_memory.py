@@ -0,0 +1,63 @@
+import pytest
+
+
+@pytest.fixture
+def aws(load_lambda):
+    return load_lambda("translation_services/aws_lambda", TRANSLATION_MEMORY_BACKEND="memory")
+
+
+def test_lookup_counts_hits_misses_and_saved_chars(aws):
+    memory = aws.TranslationMemory(None, "aws")
+    memory.store_many(["Hello world."], ["Hallo Welt."], "en", "de")
+
+    found = memory.lookup_many(["Hello world.", "Good night."], "en", "de")
+
+    assert found == {0: "Hallo Welt."}
+    assert memory.stats == {"lookups": 2, "hits": 1, "misses": 1, "saved_chars": len("Hello world.")}
+    assert memory.hit_rate() == 0.5
+
+
+def test_keys_are_per_segment_language_pair_and_provider(aws):
+    memory = aws.TranslationMemory(None, "aws")
+
+    # Whitespace differences do not change the segment
+    assert memory.key("Hello   world.\n", "en", "de") == memory.key("Hello world.", "en", "de")
+    assert memory.key("Hello world.", "en", "de") != memory.key("Hello world!", "en", "de")
+    assert memory.key("Hello world.", "en", "de") != memory.key("Hello world.", "en", "fr")
+    assert memory.key("Hello world.", "en", "de") != aws.TranslationMemory(None, "gcp").key(
+        "Hello world.", "en", "de"
+    )
+
+    memory.store_many(["Hello world."], ["Hallo Welt."], "en", "de")
+    assert memory.lookup_many(["Hello world."], "en", "fr") == {}
+
+
+def test_sqlite_store_is_shared_between_containers(aws, tmp_path):
+    path = str(tmp_path / "translation_memory.sqlite3")
+    aws.TranslationMemory(aws.SQLiteTranslationStore(path), "aws").store_many(
+        ["Hello world.", "Good night."], ["Hallo Welt.", "Gute Nacht."], "en", "de"
+    )
+
+    # A fresh LRU, as in another container, is answered by the store
+    memory = aws.TranslationMemory(aws.SQLiteTranslationStore(path), "aws")
+    assert memory.lookup_many(["Good night.", "Good morning."], "en", "de") == {0: "Gute Nacht."}
+    assert memory.stats["hits"] == 1 and memory.stats["misses"] == 1
+
+
+def test_translator_only_sends_segments_missing_from_memory(aws, translate):
+    sent = []
+
+    def translate_batch(texts, from_lang, to_lang):
+        sent.extend(texts)
+        return [text.upper() for text in texts]
+
+    memory = aws.TranslationMemory(None, "aws")
+    segmented = aws.SegmentedTranslator(translate_batch, aws.TextSegmenter(100, lines=True), memory=memory)
+
+    assert translate(segmented, "One.\nTwo.\n", "en", "de") == "ONE.\nTWO.\n"
+    sent.clear()
+    assert translate(segmented, "Two.\nThree.\n", "en", "de") == "TWO.\nTHREE.\n"
+
+    assert sent == ["Three."]
+    assert memory.stats["hits"] == 1
+    assert memory.stats["saved_chars"] == len("Two.")
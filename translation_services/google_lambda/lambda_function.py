@@ -1,85 +1,1237 @@
 import boto3
+from botocore.exceptions import ClientError
 import requests
 import hashlib
 import os
 import json
+import random
+import re
+import sqlite3
+import unicodedata
+import collections
 import concurrent.futures
 import logging
-import pdb
+import threading
+import time
+import traceback
+
+from mtdock.params import parameter_cache
+from mtdock.http import DeadlineExceededError, HTTPClient
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+PROVIDER_NAME = "gcp"
+
+# Set once per container, used to tell cold starts from warm invocations in the logs
+CONTAINER_STARTED_AT = time.time()
+container_stats = {"invocations": 0}
+
+
+# Claim-check: article bodies are stored once in a blob store keyed by content
+# hash and only a pointer travels through SQS. "local" is a filesystem stand-in
+# for tests.
+CLAIM_CHECK_MODE = os.environ.get("CLAIM_CHECK_MODE", "off")
+CLAIM_CHECK_BUCKET = os.environ.get("CLAIM_CHECK_BUCKET")
+CLAIM_CHECK_PREFIX = os.environ.get("CLAIM_CHECK_PREFIX", "claim-check/")
+CLAIM_CHECK_LOCAL_DIR = os.environ.get("CLAIM_CHECK_LOCAL_DIR", "/tmp/claim_check_store")
+
+
+class S3BlobStore:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.s3 = boto3.client("s3")
+
+    def exists(self, key):
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put(self, key, data):
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType="application/json")
+
+    def get(self, key):
+        return self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+
+class LocalBlobStore:
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+
+def make_blob_store(store, bucket=None):
+    if store == "s3":
+        return S3BlobStore(bucket or CLAIM_CHECK_BUCKET)
+    if store == "local":
+        return LocalBlobStore(CLAIM_CHECK_LOCAL_DIR)
+    raise ValueError(f"Unknown blob store {store}")
+
+
+# Claim-checked payloads are kept in /tmp so warm invocations skip the download
+PAYLOAD_CACHE_DIR = os.environ.get("PAYLOAD_CACHE_DIR", "/tmp/claim_check_cache")
+PAYLOAD_CACHE_ENTRIES = int(os.environ.get("PAYLOAD_CACHE_ENTRIES", 64))
+
+
+class PayloadResolver:
+    """Replaces a claim-check pointer in a message with the stored title and text."""
 
-class GCPTranslation:
     def __init__(self):
-        self.MAX_CHAR = 5_000
+        self.stores = {}
+        self.memory = collections.OrderedDict()
+        self.lock = threading.Lock()
 
-    def translate(
-        self, text: str, from_language: str, to_language: str, project_id: str
-    ) -> str:
-        """Translating Text."""
-        from google.cloud import translate
+    def store(self, pointer):
+        name = (pointer.get("store"), pointer.get("bucket"))
+        with self.lock:
+            if name not in self.stores:
+                self.stores[name] = make_blob_store(pointer.get("store"), pointer.get("bucket"))
+            return self.stores[name]
 
-        client = translate.TranslationServiceClient()
+    def load(self, pointer):
+        digest = pointer["sha256"]
+        with self.lock:
+            if digest in self.memory:
+                self.memory.move_to_end(digest)
+                return self.memory[digest]
 
-        location = "global"
+        cache_path = os.path.join(PAYLOAD_CACHE_DIR, f"{digest}.json")
+        data = None
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                data = f.read()
+        else:
+            data = self.store(pointer).get(pointer["key"])
+            os.makedirs(PAYLOAD_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
 
-        parent = f"projects/{project_id}/locations/{location}"
+        if hashlib.sha256(data).hexdigest() != digest:
+            os.remove(cache_path)
+            raise ValueError(f"Payload checksum mismatch for {pointer['key']}")
+
+        payload = json.loads(data)
+        with self.lock:
+            self.memory[digest] = payload
+            while len(self.memory) > PAYLOAD_CACHE_ENTRIES:
+                self.memory.popitem(last=False)
+        return payload
+
+    def resolve(self, message):
+        pointer = message.get("payload")
+        if not pointer:
+            return message
+        resolved = {k: v for k, v in message.items() if k != "payload"}
+        resolved.update(self.load(pointer))
+        return resolved
+
+
+payload_resolver = PayloadResolver()
+
+
+# All records, titles, texts and chunks of an invocation share one bounded pool
+# of provider calls that lives for the whole container
+PROVIDER_CONCURRENCY = int(os.environ.get("PROVIDER_CONCURRENCY", 8))
+provider_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=PROVIDER_CONCURRENCY, thread_name_prefix=PROVIDER_NAME
+)
+
+# Every provider pool thread can hold a connection to the same host
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", PROVIDER_CONCURRENCY))
+http_client = HTTPClient(pool_size=HTTP_POOL_SIZE)
 
+
+# Every provider batch gets its own retries
+CHUNK_MAX_ATTEMPTS = int(os.environ.get("CHUNK_MAX_ATTEMPTS", 3))
+CHUNK_RETRY_BACKOFF_SECONDS = float(os.environ.get("CHUNK_RETRY_BACKOFF_SECONDS", 0.5))
+
+# Provider quota, in requests and characters per second. The limiter starts at the
+# ceiling, halves on throttling and climbs back additively while calls succeed.
+# The default character rate is the 6M characters per minute project quota
+RATE_LIMIT_REQUESTS_PER_SECOND = float(os.environ.get("RATE_LIMIT_REQUESTS_PER_SECOND", 10))
+RATE_LIMIT_CHARS_PER_SECOND = float(os.environ.get("RATE_LIMIT_CHARS_PER_SECOND", 100_000))
+RATE_LIMIT_BURST_SECONDS = float(os.environ.get("RATE_LIMIT_BURST_SECONDS", 1))
+RATE_LIMIT_MIN_FRACTION = float(os.environ.get("RATE_LIMIT_MIN_FRACTION", 0.05))
+RATE_LIMIT_INCREASE_FRACTION = float(os.environ.get("RATE_LIMIT_INCREASE_FRACTION", 0.05))
+RATE_LIMIT_ADJUST_SECONDS = float(os.environ.get("RATE_LIMIT_ADJUST_SECONDS", 1))
+
+
+def is_throttling_error(e):
+    # google.api_core raises ResourceExhausted (RESOURCE_EXHAUSTED) with the HTTP code 429
+    return getattr(e, "code", None) == 429 or type(e).__name__ == "ResourceExhausted"
+
+def is_transient_error(e):
+    """Whether e says the provider is unhealthy: throttling, a 5xx, a timeout or a lost connection.
+
+    A bad language pair, an invalid payload or any other 4xx is the message's own
+    fault and is not held against the provider.
+    """
+    if is_throttling_error(e):
+        return True
+    if isinstance(e, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    # google.api_core errors carry the HTTP code; RetryError is its own retries running out
+    code = getattr(e, "code", None)
+    return (isinstance(code, int) and code >= 500) or type(e).__name__ in ("RetryError", "ServiceUnavailable")
+
+
+class AdaptiveRateLimiter:
+    """Token buckets for requests and characters shared by every provider pool thread.
+
+    Callers reserve tokens up front and sleep off any deficit outside the lock,
+    so concurrent workers queue behind each other instead of bursting together.
+    Both rates move together with AIMD: throttling halves them, at most once per
+    adjustment window, and every window of successful calls adds a small step back.
+    """
+
+    def __init__(
+        self,
+        requests_per_second=RATE_LIMIT_REQUESTS_PER_SECOND,
+        chars_per_second=RATE_LIMIT_CHARS_PER_SECOND,
+        burst_seconds=RATE_LIMIT_BURST_SECONDS,
+    ):
+        self.max_rates = {"requests": requests_per_second, "chars": chars_per_second}
+        self.burst_seconds = burst_seconds
+        self.fraction = 1.0
+        self.tokens = {name: rate * burst_seconds for name, rate in self.max_rates.items()}
+        self.updated_at = time.monotonic()
+        self.adjusted_at = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited_ms": 0.0, "throttled": 0, "decreases": 0, "increases": 0}
+
+    def rate(self, name):
+        return self.max_rates[name] * self.fraction
+
+    def refill(self, now):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        for name in self.tokens:
+            capacity = self.rate(name) * self.burst_seconds
+            self.tokens[name] = min(capacity, self.tokens[name] + elapsed * self.rate(name))
+
+    def acquire(self, requests=1, chars=0):
+        with self.lock:
+            self.refill(time.monotonic())
+            self.tokens["requests"] -= requests
+            self.tokens["chars"] -= chars
+            # A reservation larger than the bucket still goes through, the debt delays later callers
+            wait = max(max(0.0, -self.tokens[name]) / self.rate(name) for name in self.tokens)
+            self.stats["acquired"] += 1
+            self.stats["waited_ms"] += wait * 1000
+        if wait > 0:
+            time.sleep(wait)
+
+    def throttled(self):
+        with self.lock:
+            self.stats["throttled"] += 1
+            now = time.monotonic()
+            if now - self.adjusted_at < RATE_LIMIT_ADJUST_SECONDS:
+                # Calls that were in flight together are one throttling event
+                return
+            self.refill(now)
+            self.fraction = max(RATE_LIMIT_MIN_FRACTION, self.fraction / 2)
+            for name in self.tokens:
+                self.tokens[name] = min(self.tokens[name], 0.0)
+            self.adjusted_at = now
+            self.stats["decreases"] += 1
+        logger.warning("Provider throttled, rate limit lowered to %.0f%% of quota", self.fraction * 100)
+
+    def succeeded(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.fraction >= 1.0 or now - self.adjusted_at < RATE_LIMIT_ADJUST_SECONDS:
+                return
+            self.refill(now)
+            self.fraction = min(1.0, self.fraction + RATE_LIMIT_INCREASE_FRACTION)
+            self.adjusted_at = now
+            self.stats["increases"] += 1
+
+    def call(self, function, *args, chars=0, requests=1, **kwargs):
+        """Run one provider call under the limiter and feed its outcome back into the rates."""
+        self.acquire(requests=requests, chars=chars)
         try:
-            # Translate text
-            response = client.translate_text(
-                request={
-                    "parent": parent,
-                    "contents": [text],
-                    "mime_type": "text/plain",
-                    "source_language_code": from_language,  # Set the source language
-                    "target_language_code": to_language,  # Set the target language
+            result = function(*args, **kwargs)
+        except Exception as e:
+            if is_throttling_error(e):
+                self.throttled()
+            raise
+        self.succeeded()
+        return result
+
+
+rate_limiter = AdaptiveRateLimiter()
+
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("CIRCUIT_OPEN_SECONDS", 30))
+CIRCUIT_MAX_OPEN_SECONDS = float(os.environ.get("CIRCUIT_MAX_OPEN_SECONDS", 300))
+# Messages failed by a provider outage come back after an increasing delay
+REQUEUE_BASE_DELAY_SECONDS = int(os.environ.get("REQUEUE_BASE_DELAY_SECONDS", 30))
+REQUEUE_MAX_DELAY_SECONDS = int(os.environ.get("REQUEUE_MAX_DELAY_SECONDS", 900))
+# A hidden message holds back the rest of its FIFO group. Under push_to_fifo's "shard"
+# strategy a group is many articles, so their delay stays short
+REQUEUE_SHARD_MAX_DELAY_SECONDS = int(os.environ.get("REQUEUE_SHARD_MAX_DELAY_SECONDS", 60))
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling a provider after CIRCUIT_FAILURE_THRESHOLD consecutive transient failures.
+
+    While open every call fails at once. Once the open period is over a single
+    probe call is let through (half-open): its success closes the circuit, its
+    failure opens it again for twice as long, up to CIRCUIT_MAX_OPEN_SECONDS.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, open_seconds=CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_open_seconds = open_seconds
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def before_call(self):
+        with self.lock:
+            self.stats["calls"] += 1
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = "half_open"
+                self.probing = False
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                logger.info("Circuit for %s half-open, sending a probe call", self.name)
+                return
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(f"Circuit for {self.name} is open")
+
+    def record_success(self):
+        with self.lock:
+            if self.state != "closed":
+                logger.info("Circuit for %s closed", self.name)
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+            self.open_seconds = self.base_open_seconds
+
+    def record_failure(self):
+        with self.lock:
+            self.stats["failures"] += 1
+            self.failures += 1
+            if self.state == "half_open":
+                self.open_seconds = min(self.open_seconds * 2, CIRCUIT_MAX_OPEN_SECONDS)
+            elif self.state != "closed" or self.failures < self.failure_threshold:
+                return
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.probing = False
+            self.stats["opened"] += 1
+        logger.error("Circuit for %s opened for %.0f s", self.name, self.open_seconds)
+
+    def release(self):
+        # A call that said nothing about the provider's health frees the half-open probe
+        with self.lock:
+            self.probing = False
+
+    def is_open(self):
+        with self.lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.open_seconds
+
+    def call(self, function, *args, **kwargs):
+        self.before_call()
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            if is_transient_error(e):
+                self.record_failure()
+            else:
+                self.release()
+            raise
+        self.record_success()
+        return result
+
+
+circuit_breaker = CircuitBreaker(PROVIDER_NAME)
+
+
+# Translations sent to put_first per call
+PUT_FIRST_BATCH_SIZE = int(os.environ.get("PUT_FIRST_BATCH_SIZE", 100))
+
+# Time kept free before the Lambda timeout for storing results and returning
+DEADLINE_SAFETY_MS = int(os.environ.get("DEADLINE_SAFETY_MS", 3000))
+DEADLINE_STORE_RESERVE_MS = int(os.environ.get("DEADLINE_STORE_RESERVE_MS", 2000))
+THROUGHPUT_INITIAL_CHARS_PER_SECOND = float(os.environ.get("THROUGHPUT_INITIAL_CHARS_PER_SECOND", 2000))
+THROUGHPUT_EWMA_ALPHA = float(os.environ.get("THROUGHPUT_EWMA_ALPHA", 0.3))
+
+
+class ThroughputEstimator:
+    """EWMA of the characters per second an invocation gets translated, kept across invocations."""
+
+    def __init__(self, initial=THROUGHPUT_INITIAL_CHARS_PER_SECOND, alpha=THROUGHPUT_EWMA_ALPHA):
+        self.chars_per_second = initial
+        self.alpha = alpha
+        self.lock = threading.Lock()
+
+    def record(self, chars, seconds):
+        if chars <= 0 or seconds <= 0:
+            return
+        with self.lock:
+            self.chars_per_second += self.alpha * (chars / seconds - self.chars_per_second)
+
+    def estimate(self, chars):
+        return chars / self.chars_per_second
+
+
+throughput = ThroughputEstimator()
+
+
+def record_chars(record):
+    """Characters a record sends to the provider, every target language counted."""
+    chars = len(record.get("title") or "") + len(record.get("text") or "")
+    return chars * len(target_languages(record))
+
+
+def plan_records(records, budget):
+    """Split record indices into those expected to finish within budget seconds and the rest.
+
+    Records are admitted in order while their estimated cost fits; the first one
+    always is, so a batch of long articles still makes progress.
+    """
+    admitted, skipped = [], []
+    cost = 0.0
+    for index, record in enumerate(records):
+        cost += throughput.estimate(record_chars(record))
+        if admitted and (skipped or cost > budget):
+            skipped.append(index)
+        else:
+            admitted.append(index)
+    return admitted, skipped
+
+# Split points from coarsest to finest: paragraphs, lines, sentences, words
+SPLIT_PATTERNS = [
+    re.compile(r"(?<=\n\n)"),
+    re.compile(r"(?<=\n)"),
+    re.compile(r"(?<=[.!?…]\s)|(?<=[。！？])"),
+    re.compile(r"(?<=\s)"),
+]
+
+
+class TextSegmenter:
+    """Splits text into chunks that fit a provider's size budget.
+
+    Splits happen at the coarsest boundary that fits (paragraph, line, sentence,
+    word) and the chunks join back into the original text exactly. With
+    lines=True every line is kept as its own chunk, which suits batch APIs and
+    lets recurring lines hit the translation memory.
+    """
+
+    def __init__(self, max_size, unit="chars", lines=False):
+        self.max_size = max_size
+        self.unit = unit
+        self.lines = lines
+
+    def size(self, text):
+        if self.unit == "bytes":
+            return len(text.encode("utf-8"))
+        return len(text)
+
+    def split(self, text):
+        if not self.lines:
+            return self.split_packed(text)
+        chunks = []
+        for line in SPLIT_PATTERNS[1].split(text):
+            if line:
+                chunks.extend(self.split_packed(line))
+        return chunks
+
+    def split_packed(self, text):
+        if self.size(text) <= self.max_size:
+            return [text]
+
+        chunks = []
+        current, current_size = [], 0
+        for piece in self.pieces(text, 0):
+            piece_size = self.size(piece)
+            if current and current_size + piece_size > self.max_size:
+                chunks.append("".join(current))
+                current, current_size = [], 0
+            current.append(piece)
+            current_size += piece_size
+        if current:
+            chunks.append("".join(current))
+        return chunks
+
+    def pieces(self, text, level):
+        if self.size(text) <= self.max_size:
+            yield text
+        elif level == len(SPLIT_PATTERNS):
+            yield from self.hard_split(text)
+        else:
+            for part in SPLIT_PATTERNS[level].split(text):
+                if part:
+                    yield from self.pieces(part, level + 1)
+
+    def hard_split(self, text):
+        if self.unit != "bytes":
+            for start in range(0, len(text), self.max_size):
+                yield text[start : start + self.max_size]
+            return
+
+        data = text.encode("utf-8")
+        start = 0
+        while start < len(data):
+            end = min(start + self.max_size, len(data))
+            # Never cut inside a multi-byte character
+            while end < len(data) and (data[end] & 0xC0) == 0x80:
+                end -= 1
+            yield data[start:end].decode("utf-8")
+            start = end
+
+
+# Translation memory: "dynamodb", "sqlite" (local stand-in), "memory" (LRU only) or "off".
+# The document index needs the shared table, so DynamoDB is the deployed default
+TRANSLATION_MEMORY_BACKEND = os.environ.get("TRANSLATION_MEMORY_BACKEND", "dynamodb")
+TRANSLATION_MEMORY_TABLE = os.environ.get("TRANSLATION_MEMORY_TABLE", "translation_memory")
+TRANSLATION_MEMORY_SQLITE_PATH = os.environ.get(
+    "TRANSLATION_MEMORY_SQLITE_PATH", "/tmp/translation_memory.sqlite3"
+)
+TRANSLATION_MEMORY_LRU_ENTRIES = int(os.environ.get("TRANSLATION_MEMORY_LRU_ENTRIES", 10_000))
+# A source already translated and stored for a language pair is acknowledged without
+# calling the provider, until its fingerprint is this old. The fingerprints live only in
+# the shared store: with "memory" nothing is skipped, as a per-container index neither
+# dedupes across containers nor sees delete_translation clear an entry, which it does
+# for "dynamodb" only ("sqlite" is a local stand-in)
+DOCUMENT_INDEX_TTL_SECONDS = int(os.environ.get("DOCUMENT_INDEX_TTL_SECONDS", 86_400))
+
+
+class DynamoTranslationStore:
+    def __init__(self, table):
+        self.table = table
+        self.dynamodb = boto3.client("dynamodb")
+
+    def get_many(self, keys):
+        found = {}
+        for start in range(0, len(keys), 100):
+            request = {
+                self.table: {
+                    "Keys": [{"segment_key": {"S": key}} for key in keys[start : start + 100]],
+                    "ProjectionExpression": "segment_key, translation",
                 }
+            }
+            for _ in range(3):
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(self.table, []):
+                    found[item["segment_key"]["S"]] = item["translation"]["S"]
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    break
+        return found
+
+    def put_many(self, items):
+        entries = [
+            {"PutRequest": {"Item": {"segment_key": {"S": key}, "translation": {"S": value}}}}
+            for key, value in items.items()
+        ]
+        for start in range(0, len(entries), 25):
+            request = {self.table: entries[start : start + 25]}
+            for _ in range(3):
+                response = self.dynamodb.batch_write_item(RequestItems=request)
+                request = response.get("UnprocessedItems")
+                if not request:
+                    break
+
+
+class SQLiteTranslationStore:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.cnx = sqlite3.connect(path, check_same_thread=False)
+        self.cnx.execute(
+            "CREATE TABLE IF NOT EXISTS translation_memory "
+            "(segment_key TEXT PRIMARY KEY, translation TEXT NOT NULL)"
+        )
+        self.cnx.commit()
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = self.cnx.execute(
+                    "SELECT segment_key, translation FROM translation_memory "
+                    "WHERE segment_key IN ({})".format(", ".join("?" * len(chunk))),
+                    chunk,
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, items):
+        with self.lock:
+            self.cnx.executemany(
+                "INSERT OR REPLACE INTO translation_memory (segment_key, translation) VALUES (?, ?)",
+                items.items(),
             )
+            self.cnx.commit()
+
+
+def make_translation_store():
+    if TRANSLATION_MEMORY_BACKEND == "dynamodb":
+        return DynamoTranslationStore(TRANSLATION_MEMORY_TABLE)
+    if TRANSLATION_MEMORY_BACKEND == "sqlite":
+        return SQLiteTranslationStore(TRANSLATION_MEMORY_SQLITE_PATH)
+    return None
+
+
+class TranslationMemory:
+    """Segment-level translation cache: an in-process LRU in front of a shared store.
+
+    Keys hash the whitespace-normalized source segment with the language pair and
+    provider. Store errors are logged and treated as misses.
+    """
+
+    def __init__(self, store, provider, max_entries=TRANSLATION_MEMORY_LRU_ENTRIES):
+        self.store = store
+        self.provider = provider
+        self.max_entries = max_entries
+        self.lru = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "saved_chars": 0}
+
+    def key(self, segment, from_lang, to_lang):
+        normalized = " ".join(unicodedata.normalize("NFC", segment).split())
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"{self.provider}:{from_lang}:{to_lang}:{digest}"
+
+    def remember(self, key, translation):
+        self.lru[key] = translation
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.max_entries:
+            self.lru.popitem(last=False)
+
+    def fetch(self, keys):
+        """Return {key: value} for the keys in the LRU or the shared store."""
+        found = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                if key in self.lru:
+                    self.lru.move_to_end(key)
+                    found[key] = self.lru[key]
+                else:
+                    missing.append(key)
+
+        if missing and self.store is not None:
+            try:
+                stored = self.store.get_many(list(dict.fromkeys(missing)))
+            except Exception as e:
+                logger.warning("Translation memory lookup failed: %s", e)
+                stored = {}
+            with self.lock:
+                for key, value in stored.items():
+                    found[key] = value
+                    self.remember(key, value)
+        return found
+
+    def save(self, items):
+        with self.lock:
+            for key, value in items.items():
+                self.remember(key, value)
+
+        if items and self.store is not None:
+            try:
+                self.store.put_many(items)
+            except Exception as e:
+                logger.warning("Translation memory write failed: %s", e)
+
+    def lookup_many(self, segments, from_lang, to_lang):
+        """Return {index: translation} for the segments found in memory."""
+        keys = [self.key(segment, from_lang, to_lang) for segment in segments]
+        stored = self.fetch(keys)
+        found = {index: stored[key] for index, key in enumerate(keys) if key in stored}
+
+        with self.lock:
+            self.stats["lookups"] += len(segments)
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(segments) - len(found)
+            self.stats["saved_chars"] += sum(len(segments[index]) for index in found)
+        return found
+
+    def store_many(self, segments, translations, from_lang, to_lang):
+        self.save(
+            {
+                self.key(segment, from_lang, to_lang): translation
+                for segment, translation in zip(segments, translations)
+            }
+        )
+
+    def document_key(self, article_id, from_lang, to_lang):
+        # Document fingerprints share the store with segments under their own prefix. One
+        # per article and language pair, so delete_translation can remove it by name
+        return f"doc:{self.provider}:{from_lang}:{to_lang}:{article_id}"
+
+    def translated_documents(self, keys):
+        """Return {key: source_hash} of the documents translated and stored within DOCUMENT_INDEX_TTL_SECONDS.
 
-            # Extract and return the translated text
-            return response.translations[0].translated_text
+        Read from the shared store past the LRU, so a fingerprint removed there is
+        gone for every container at once.
+        """
+        if self.store is None or not keys:
+            return {}
+        try:
+            stored = self.store.get_many(list(dict.fromkeys(keys)))
         except Exception as e:
-            if len(text) > self.MAX_CHAR:
-                translated_text = self.handle_long_text_translation(
-                    text, parent, from_language, to_language
+            logger.warning("Document index lookup failed: %s", e)
+            return {}
+        now = time.time()
+        found = {}
+        for key, value in stored.items():
+            source_hash, _, stored_at = value.rpartition(" ")
+            if now - float(stored_at) < DOCUMENT_INDEX_TTL_SECONDS:
+                found[key] = source_hash
+        return found
+
+    def record_documents(self, fingerprints):
+        """Record {key: source_hash} as translated and stored now."""
+        if self.store is None:
+            return
+        now = time.time()
+        try:
+            self.store.put_many({key: f"{source_hash} {now}" for key, source_hash in fingerprints.items()})
+        except Exception as e:
+            logger.warning("Document index write failed: %s", e)
+
+    def hit_rate(self):
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+
+translation_memory = (
+    TranslationMemory(make_translation_store(), PROVIDER_NAME)
+    if TRANSLATION_MEMORY_BACKEND != "off"
+    else None
+)
+
+
+class SegmentedTranslator:
+    """Translates texts as sentence-aligned chunks packed into provider batch calls.
+
+    Chunks from all texts are deduplicated, packed into as few calls as the
+    provider's item and size limits allow, run on the shared provider pool with
+    per-batch retries, and reassembled in order. Several target languages are
+    sent in one call when the provider supports it (multi_target=True),
+    otherwise each language gets its own concurrent batches.
+    """
+
+    def __init__(
+        self,
+        translate_batch,
+        segmenter,
+        max_batch_items=1,
+        max_batch_size=None,
+        multi_target=False,
+        memory=translation_memory,
+    ):
+        self.translate_batch = translate_batch
+        self.segmenter = segmenter
+        self.max_batch_items = max_batch_items
+        self.max_batch_size = max_batch_size or segmenter.max_size
+        self.multi_target = multi_target
+        self.memory = memory
+
+    def start(self, texts, from_lang, to_langs, deadline=None, **options):
+        """Segment texts and submit their provider batches without waiting for them.
+
+        Batches that have not started by the deadline (a time.time() value) are
+        not sent, and finish() stops waiting for the others once it has passed.
+        """
+        # Each text becomes a list of (leading whitespace, core index, trailing whitespace);
+        # providers trim surrounding whitespace so it is kept aside for reassembly
+        cores, core_index, layouts = [], {}, []
+        for text in texts:
+            layout = []
+            for chunk in self.segmenter.split(text) if text else []:
+                core = chunk.strip()
+                if not core:
+                    layout.append((chunk, None, ""))
+                    continue
+                if core not in core_index:
+                    core_index[core] = len(cores)
+                    cores.append(core)
+                leading = chunk[: len(chunk) - len(chunk.lstrip())]
+                trailing = chunk[len(chunk.rstrip()) :]
+                layout.append((leading, core_index[core], trailing))
+            layouts.append(layout)
+
+        now = time.time()
+        job = {
+            "texts": texts,
+            "layouts": layouts,
+            "cores": cores,
+            "from_lang": from_lang,
+            "to_langs": list(to_langs),
+            "translated": {lang: [None] * len(cores) for lang in to_langs},
+            "done_at": {lang: [now] * len(cores) for lang in to_langs},
+            "errors": {lang: {} for lang in to_langs},
+            "pending": {},
+            "deadline": deadline,
+            # Set by finish() once it stops waiting, batches still running then write nothing
+            "closed": False,
+            "lock": threading.Lock(),
+        }
+
+        for lang in to_langs:
+            pending = list(range(len(cores)))
+            if self.memory is not None and cores:
+                found = self.memory.lookup_many(cores, from_lang, lang)
+                for index, translation in found.items():
+                    job["translated"][lang][index] = translation
+                pending = [index for index in pending if index not in found]
+            job["pending"][lang] = pending
+
+        futures = []
+        if self.multi_target:
+            # A call is sized by its text times its target languages, so languages
+            # are split across calls whenever a batch cannot carry all of them
+            pending = sorted(set().union(*job["pending"].values()))
+            to_langs = job["to_langs"]
+            for batch in self.pack(pending, cores, self.max_batch_size // max(len(to_langs), 1)):
+                size = sum(self.segmenter.size(cores[index]) for index in batch)
+                per_call = max(1, self.max_batch_size // max(size, 1))
+                for start in range(0, len(to_langs), per_call):
+                    futures.append(
+                        provider_pool.submit(self.run_batch, batch, job, to_langs[start : start + per_call], options)
+                    )
+        else:
+            for lang in to_langs:
+                for batch in self.pack(job["pending"][lang], cores, self.max_batch_size):
+                    futures.append(provider_pool.submit(self.run_batch, batch, job, [lang], options))
+        job["futures"] = futures
+        return job
+
+    def finish(self, job, return_exceptions=False):
+        """Wait for a started job and return {to_lang: translations in order}."""
+        if job["deadline"] is None:
+            concurrent.futures.wait(job["futures"])
+        else:
+            _, not_done = concurrent.futures.wait(
+                job["futures"], timeout=max(0.0, job["deadline"] - time.time())
+            )
+            for future in not_done:
+                future.cancel()
+            with job["lock"]:
+                job["closed"] = True
+            if not_done:
+                # Whatever is still in flight fails its texts, chunks completed in time
+                # are already in the translation memory for the redelivery
+                error = DeadlineExceededError(f"{len(not_done)} batches unfinished at the deadline")
+                for lang in job["to_langs"]:
+                    translated, errors = job["translated"][lang], job["errors"][lang]
+                    for index in job["pending"][lang]:
+                        if translated[index] is None and index not in errors:
+                            errors[index] = error
+
+        if not return_exceptions:
+            for errors in job["errors"].values():
+                if errors:
+                    raise next(iter(errors.values()))
+
+        results = {}
+        job["completed_at"] = {}
+        for lang in job["to_langs"]:
+            errors, translated, done_at = job["errors"][lang], job["translated"][lang], job["done_at"][lang]
+            results[lang] = []
+            job["completed_at"][lang] = []
+            for text, layout in zip(job["texts"], job["layouts"]):
+                indices = [index for _, index, _ in layout if index is not None]
+                job["completed_at"][lang].append(max((done_at[index] for index in indices), default=0))
+                if not text:
+                    results[lang].append(text)
+                    continue
+                failed = [errors[index] for index in indices if index in errors]
+                if failed:
+                    results[lang].append(failed[0])
+                    continue
+                results[lang].append(
+                    "".join(
+                        leading + (translated[index] if index is not None else "") + trailing
+                        for leading, index, trailing in layout
+                    )
                 )
-                return translated_text
+        return results
+
+    def pack(self, indices, cores, max_batch_size):
+        batches = []
+        batch, batch_size = [], 0
+        for index in indices:
+            size = self.segmenter.size(cores[index])
+            if batch and (len(batch) == self.max_batch_items or batch_size + size > max_batch_size):
+                batches.append(batch)
+                batch, batch_size = [], 0
+            batch.append(index)
+            batch_size += size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def run_batch(self, batch, job, to_langs, options):
+        texts = [job["cores"][index] for index in batch]
+        if job["deadline"] is not None:
+            # Provider calls cut their timeouts and retries to the time left
+            options = dict(options, deadline=job["deadline"])
+        try:
+            results = self.call_provider(texts, job, to_langs, options)
+        except Exception as e:
+            with job["lock"]:
+                if job["closed"]:
+                    return
+                for lang in to_langs:
+                    for index in batch:
+                        if job["translated"][lang][index] is not None:
+                            # Already answered by the translation memory for this language
+                            continue
+                        job["errors"][lang][index] = e
+                        job["done_at"][lang][index] = time.time()
+            return
+
+        finished = time.time()
+        with job["lock"]:
+            if job["closed"]:
+                # Abandoned at the deadline, its texts already failed and are retranslated
+                return
+            for lang in to_langs:
+                for index, result in zip(batch, results[lang]):
+                    job["translated"][lang][index] = result
+                    job["done_at"][lang][index] = finished
+        # Stored per batch, so work finished before a timeout is not lost
+        if self.memory is not None:
+            for lang in to_langs:
+                self.memory.store_many(texts, results[lang], job["from_lang"], lang)
+
+    def call_provider(self, texts, job, to_langs, options):
+        """Translate one batch with retries, counted by the circuit breaker once whatever the attempts."""
+        circuit_breaker.before_call()
+        transient = False
+        try:
+            for attempt in range(1, CHUNK_MAX_ATTEMPTS + 1):
+                try:
+                    if job["deadline"] is not None and time.time() >= job["deadline"]:
+                        raise DeadlineExceededError("Batch not started before the deadline")
+                    if attempt > 1 and circuit_breaker.is_open():
+                        # Opened by other batches while this one was backing off
+                        raise CircuitOpenError(f"Circuit for {circuit_breaker.name} is open")
+                    if self.multi_target:
+                        results = self.translate_batch(texts, job["from_lang"], to_langs, **options)
+                    else:
+                        results = {to_langs[0]: self.translate_batch(texts, job["from_lang"], to_langs[0], **options)}
+                    for lang in to_langs:
+                        if len(results.get(lang, [])) != len(texts):
+                            raise ValueError(f"Provider returned a short batch for {lang}")
+                    break
+                except Exception as e:
+                    transient = transient or is_transient_error(e)
+                    # An open circuit or a passed deadline fails the batch at once
+                    if attempt == CHUNK_MAX_ATTEMPTS or isinstance(e, (CircuitOpenError, DeadlineExceededError)):
+                        raise
+                    delay = CHUNK_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                    delay += random.uniform(0, delay)
+                    if job["deadline"] is not None and time.time() + delay >= job["deadline"]:
+                        # No attempt could start after the backoff, fail now with this error
+                        raise
+                    logger.warning(
+                        "Batch of %d chunks failed (attempt %d), retrying in %.2f s: %s",
+                        len(texts), attempt, delay, e,
+                    )
+                    time.sleep(delay)
+        except Exception:
+            # A poison message fails every attempt too, but only provider trouble counts
+            if transient:
+                circuit_breaker.record_failure()
             else:
-                return {"status": "[ERROR]", "message": str(e)}
+                circuit_breaker.release()
+            raise
+        circuit_breaker.record_success()
+        return results
 
-    def split_text_into_chunks(self, text, max_char):
-        return [text[i : i + max_char] for i in range(0, len(text), max_char)]
 
-    def handle_long_text_translation(self, text, parent, from_language, to_language):
-        # Split the text into chunks
-        parts = self.split_text_into_chunks(text, self.MAX_CHAR - 500)
+def target_languages(record):
+    """Target languages of a message: the to_langs list, or the older single to_lang."""
+    to_langs = record.get("to_langs") or [record.get("to_lang")]
+    return list(dict.fromkeys(to_langs))
 
-        # Translate each chunk
-        translated_parts = []
-        for part in parts:
-            try:
-                response = client.translate_text(
-                    request={
-                        "parent": parent,
-                        "contents": [part],
-                        "mime_type": "text/plain",
-                        "source_language_code": from_language,  # Set the source language
-                        "target_language_code": to_language,  # Set the target language
-                    }
-                )
 
-                # Extract and return the translated text
-                translated_text = response.translations[0].translated_text
+def source_fingerprint(record):
+    """Hash of the source title and text, the same for every enqueue of unchanged content."""
+    content = {"title": record.get("title"), "text": record.get("text")}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
 
-                translated_parts.append(translated_text)
-            except Exception as e:
-                return {"[ERROR]": f"Can't handle large text {e}"}
 
-        # Join all the translated chunks together
-        return "".join(map(str, translated_parts))
+def document_key(record, to_lang):
+    return translation_memory.document_key(record.get("id"), record.get("from_lang"), to_lang)
+
+
+def source_hash(record):
+    return record.get("source_hash") or source_fingerprint(record)
+
+
+def skip_translated_documents(records, message_ids):
+    """Drop the target languages whose exact source was already translated and stored.
+
+    Returns the records left to translate, their to_langs narrowed to the missing
+    languages, and their message ids. Records sent with force skip the check.
+    """
+    if translation_memory is None or translation_memory.store is None:
+        return records, message_ids
+
+    keys = {
+        (index, to_lang): document_key(record, to_lang)
+        for index, record in enumerate(records)
+        if not record.get("force")
+        for to_lang in target_languages(record)
+    }
+    translated = translation_memory.translated_documents(list(keys.values()))
+
+    remaining_records, remaining_ids = [], []
+    skipped = 0
+    for index, (record, message_id) in enumerate(zip(records, message_ids)):
+        to_langs = []
+        for to_lang in target_languages(record):
+            key = keys.get((index, to_lang))
+            if key in translated and translated[key] == source_hash(record):
+                skipped += 1
+            else:
+                to_langs.append(to_lang)
+        if not to_langs:
+            logger.info("Message %s is already translated, acknowledged without translating.", message_id)
+            continue
+        remaining_records.append(dict(record, to_langs=to_langs))
+        remaining_ids.append(message_id)
+    logger.info("Document index: %d of %d target languages already translated.", skipped, len(keys))
+    return remaining_records, remaining_ids
+
+
+def fifo_failures(messages, failed_ids):
+    """Failed message ids in delivery order, with every later message of a failed one's FIFO group.
+
+    SQS hands out a message group in order, so a later message acknowledged while
+    an earlier one goes back to the queue would be applied before it on the retry.
+    Messages of a standard queue have no group and fail on their own.
+    """
+    failed_ids = set(failed_ids)
+    failed_groups = set()
+    failures = []
+    for message in messages:
+        group = message.get("attributes", {}).get("MessageGroupId")
+        if message.get("messageId") in failed_ids or (group is not None and group in failed_groups):
+            failures.append(message.get("messageId"))
+            if group is not None:
+                failed_groups.add(group)
+    return failures
+
+
+def translate_records(segmented, records, deadline=None, **options):
+    """Translate the title and text of every record into all its target languages concurrently.
+
+    Records that share a language pair are packed together and all their
+    provider batches go to the shared pool before any result is awaited.
+    Returns, per record, {to_lang: (title, text) or the exception that failed it}
+    and {to_lang: time that translation completed}. Work still unfinished at the
+    deadline fails with DeadlineExceededError.
+    """
+    results = [{lang: [None, None] for lang in target_languages(record)} for record in records]
+    completed_at = [{lang: 0 for lang in target_languages(record)} for record in records]
+
+    groups = {}
+    for index, record in enumerate(records):
+        key = (record.get("from_lang"), tuple(target_languages(record)))
+        groups.setdefault(key, []).append(index)
+
+    jobs = []
+    for (from_lang, to_langs), indices in groups.items():
+        texts, slots = [], []
+        for index in indices:
+            if "title" in records[index]:
+                texts.append(records[index]["title"])
+                slots.append((index, 0))
+            texts.append(records[index].get("text"))
+            slots.append((index, 1))
+        try:
+            jobs.append((slots, to_langs, segmented.start(texts, from_lang, to_langs, deadline=deadline, **options)))
+        except Exception as e:
+            jobs.append((slots, to_langs, e))
+
+    for slots, to_langs, job in jobs:
+        try:
+            if isinstance(job, Exception):
+                raise job
+            translated_texts = segmented.finish(job, return_exceptions=True)
+            finished = job["completed_at"]
+        except Exception as e:
+            translated_texts = {lang: [e] * len(slots) for lang in to_langs}
+            finished = {lang: [time.time()] * len(slots) for lang in to_langs}
+
+        for lang in to_langs:
+            for (index, field), translated, done_at in zip(slots, translated_texts[lang], finished[lang]):
+                completed_at[index][lang] = max(completed_at[index][lang], done_at)
+                if isinstance(results[index][lang], Exception):
+                    continue
+                if isinstance(translated, Exception):
+                    results[index][lang] = translated
+                else:
+                    results[index][lang][field] = translated
+
+    results = [
+        {lang: value if isinstance(value, Exception) else tuple(value) for lang, value in result.items()}
+        for result in results
+    ]
+    return results, completed_at
+
+
+class GCPTranslation:
+    def __init__(self):
+        self.MAX_CHAR = 5_000
+        # translate_text takes at most 1024 contents, 30,000 code points is the recommended total
+        self.MAX_CONTENTS = 1_024
+        self.MAX_REQUEST_CHAR = 30_000
+        self.client = None
+        self.client_lock = threading.Lock()
+        self.segmented = SegmentedTranslator(
+            self.translate_batch,
+            TextSegmenter(self.MAX_CHAR - 500, lines=True),
+            max_batch_items=self.MAX_CONTENTS,
+            max_batch_size=self.MAX_REQUEST_CHAR,
+        )
+
+    def get_client(self):
+        # Built once per container, the gRPC channel and auth are reused by every call
+        with self.client_lock:
+            if self.client is None:
+                started = time.time()
+                from google.cloud import translate
+
+                self.client = translate.TranslationServiceClient()
+                logger.info("GCP translation client created in %.0f ms.", (time.time() - started) * 1000)
+            return self.client
+
+    def reset_client(self):
+        with self.client_lock:
+            self.client = None
+
+    def translate_batch(
+        self,
+        texts: list,
+        from_language: str,
+        to_language: str,
+        project_id: str = None,
+        deadline: float = None,
+    ) -> list:
+        location = "global"
+
+        parent = f"projects/{project_id}/locations/{location}"
+
+        # The client's timeout bounds the call together with its own retries
+        call_options = {}
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise DeadlineExceededError("Batch not sent before the deadline")
+            call_options["timeout"] = remaining
+
+        response = rate_limiter.call(
+            self.get_client().translate_text,
+            chars=sum(len(text) for text in texts),
+            request={
+                "parent": parent,
+                "contents": texts,
+                "mime_type": "text/plain",
+                "source_language_code": from_language,  # Set the source language
+                "target_language_code": to_language,  # Set the target language
+            },
+            **call_options,
+        )
+
+        # Translations come back in the order of contents
+        return [translation.translated_text for translation in response.translations]
+
+
+translator = GCPTranslation()
+
+
+GCP_CREDENTIALS_KEY = os.environ.get(
+    "GCP_CREDENTIALS_KEY", "vigilant-router-393521-a6988b1023c5.json"
+)
+GCP_CREDENTIALS_PATH = os.environ.get("GCP_CREDENTIALS_PATH", "/tmp/gcp_creds.json")
+# How often the cached file is checked against the S3 object for a rotated key
+GCP_CREDENTIALS_CHECK_SECONDS = int(os.environ.get("GCP_CREDENTIALS_CHECK_SECONDS", 300))
+
+
+class CachedCredentials:
+    """Service-account file kept in /tmp for the life of the container.
+
+    The file is downloaded once and then only revalidated against the S3 ETag,
+    at most every GCP_CREDENTIALS_CHECK_SECONDS.
+    """
+
+    def __init__(self, path=GCP_CREDENTIALS_PATH, key=GCP_CREDENTIALS_KEY, check_seconds=GCP_CREDENTIALS_CHECK_SECONDS):
+        self.path = path
+        self.key = key
+        self.check_seconds = check_seconds
+        self.etag = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+        self.stats = {"downloads": 0, "validations": 0, "hits": 0}
+
+    def ensure(self, s3, bucket_name):
+        """Make sure the file is present and current, returns True when it was (re)downloaded."""
+        with self.lock:
+            present = self.etag is not None and os.path.exists(self.path)
+            if present and time.time() - self.checked_at < self.check_seconds:
+                self.stats["hits"] += 1
+                return False
+
+            etag = s3.head_object(Bucket=bucket_name, Key=self.key)["ETag"]
+            self.checked_at = time.time()
+            if present and etag == self.etag:
+                self.stats["validations"] += 1
+                return False
+
+            # Download beside the target and swap it in, a reader never sees a partial file
+            partial = self.path + ".partial"
+            s3.download_file(bucket_name, self.key, partial)
+            os.replace(partial, self.path)
+            self.etag = etag
+            self.stats["downloads"] += 1
+            return True
+
+
+gcp_credentials = CachedCredentials()
 
 
 class AWSClient:
@@ -87,16 +1239,19 @@ class AWSClient:
         self.headers = {"Content-Type": "application/json"}
         self.params_keys = ["put_first", "project_id", "bucket_name"]
         self.ssm = boto3.client("ssm")
+        self.sqs = boto3.client("sqs")
         self.s3 = boto3.client("s3")
 
     def download_creds_from_s3(self, bucket_name):
-        self.s3.download_file(
-            bucket_name,
-            "vigilant-router-393521-a6988b1023c5.json",
-            "/tmp/gcp_creds.json",
-        )
+        if gcp_credentials.ensure(self.s3, bucket_name):
+            # New or rotated key, the next call builds a client that reads it
+            translator.reset_client()
+        return gcp_credentials.path
 
     def get_parameters_from_store(self):
+        return parameter_cache.get(("ssm",) + tuple(self.params_keys), self.fetch_parameters)
+
+    def fetch_parameters(self):
         response = self.ssm.get_parameters(Names=self.params_keys, WithDecryption=True)
 
         # Construct a dictionary to hold the parameter values
@@ -107,116 +1262,253 @@ class AWSClient:
 
         return params_dict
 
-    def insert_translation(self, endpoint, translate_text):
+    def insert_translations(self, endpoint, translations, deadline=None):
+        """Store many translations with one put_first call, returns an error or None per translation."""
         try:
-            response = requests.post(
-                endpoint, json=translate_text, headers=self.headers
+            response = http_client.post(
+                endpoint, json={"translations": translations}, headers=self.headers, deadline=deadline
             )
-            if response.status_code == 200:
-                return response.status_code
         except Exception as e:
-            return {"[ERROR]": f"Error processing messages {e}"}
+            return [f"Error processing messages {e}"] * len(translations)
+        if response.status_code not in (200, 207):
+            return [f"put_first returned {response.status_code}: {response.text[:200]}"] * len(translations)
+
+        errors = [None] * len(translations)
+        if response.status_code == 207:
+            # Partly rejected batch, the rest was written
+            for rejected in response.json().get("rejected", []):
+                errors[rejected["index"]] = rejected["error"]
+        return errors
+
+    def requeue_with_delay(self, messages):
+        """Hide messages failed by the provider for longer on every receive, so they do not retry into an outage."""
+        entries = {}
+        for message in messages:
+            attributes = message.get("attributes", {})
+            receive_count = int(attributes.get("ApproximateReceiveCount", 1))
+            max_delay = REQUEUE_MAX_DELAY_SECONDS
+            if attributes.get("MessageGroupId", "").startswith("shard-"):
+                max_delay = min(max_delay, REQUEUE_SHARD_MAX_DELAY_SECONDS)
+            delay = min(REQUEUE_BASE_DELAY_SECONDS * 2 ** (receive_count - 1), max_delay)
+            # Half fixed, half jitter, so a requeued batch does not come back all at once
+            delay = int(delay / 2 + random.uniform(0, delay / 2))
+            queue_entries = entries.setdefault(self.queue_url(message.get("eventSourceARN")), [])
+            queue_entries.append(
+                {
+                    "Id": str(len(queue_entries)),
+                    "ReceiptHandle": message.get("receiptHandle"),
+                    "VisibilityTimeout": delay,
+                }
+            )
+
+        for queue_url, queue_entries in entries.items():
+            for start in range(0, len(queue_entries), 10):
+                batch = queue_entries[start : start + 10]
+                try:
+                    response = self.sqs.change_message_visibility_batch(QueueUrl=queue_url, Entries=batch)
+                except ClientError as e:
+                    logger.error("[ERROR]: Cannot delay %d messages: %s", len(batch), e)
+                    continue
+                for failed in response.get("Failed", []):
+                    logger.error("[ERROR]: Cannot delay message: %s", failed.get("Message"))
+            logger.info("Requeued %d messages with delay on %s", len(queue_entries), queue_url)
+
+    def queue_url(self, arn):
+        # arn:aws:sqs:<region>:<account>:<queue name>
+        _, _, _, region, account, name = arn.split(":")
+        return f"https://sqs.{region}.amazonaws.com/{account}/{name}"
 
     def compute_checksum(self, data):
         return hashlib.sha256(str(data).encode("utf-8")).digest()
 
-    def log_err(self, errmsg):
-        logger.error(errmsg)
-        return {
-            "body": errmsg,
-            "headers": {
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "GET,OPTIONS",
-            },
-            "statusCode": 400,
-            "isBase64Encoded": "false",
-        }
+
+aws = AWSClient()
+
 
 def lambda_handler(event, context):
-    aws = AWSClient()
+    started = time.time()
+    container_stats["invocations"] += 1
+    cold_start = container_stats["invocations"] == 1
 
     params_dict = aws.get_parameters_from_store()
 
-    aws.download_creds_from_s3(params_dict.get("bucket_name"))
-
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/tmp/gcp_creds.json"
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = aws.download_creds_from_s3(
+        params_dict.get("bucket_name")
+    )
+    credentials_ms = (time.time() - started) * 1000
     
     PROVIDERS_ID = 2
 
-    # from google.cloud import translate
-    translator = GCPTranslation()
-
+    failures, delayed = [], []
+    records, message_ids = [], []
+    messages = {message.get("messageId"): message for message in event.get("Records")}
     for message in event.get("Records"):
-        message_body = message.get("body")
-        parsed_message = json.loads(message_body)
+        message_id = message.get("messageId")
+        try:
+            parsed_message = payload_resolver.resolve(json.loads(message.get("body")))
+        except Exception as e:
+            logger.error(
+                "[ERROR]: Cannot load message {}.\n{}".format(message_id, traceback.format_exc())
+            )
+            failures.append(message_id)
+            continue
+        records.append(parsed_message)
+        message_ids.append(message_id)
 
-        from_lang = parsed_message.get("from_lang")
-        to_lang = parsed_message.get("to_lang")
+    # Re-queued articles whose source is unchanged cost nothing
+    records, message_ids = skip_translated_documents(records, message_ids)
 
-        has_title = "title" in parsed_message
-        translated_title = None
+    # Only start records expected to finish before the Lambda timeout, the rest are redelivered
+    deadline = translate_deadline = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = time.time() + (context.get_remaining_time_in_millis() - DEADLINE_SAFETY_MS) / 1000
+        translate_deadline = deadline - DEADLINE_STORE_RESERVE_MS / 1000
+        admitted, skipped = plan_records(records, translate_deadline - time.time())
+        if skipped:
+            logger.warning(
+                "Deferring %d of %d records to fit the deadline, estimated throughput %.0f chars/s.",
+                len(skipped),
+                len(records),
+                throughput.chars_per_second,
+            )
+        failures.extend(message_ids[index] for index in skipped)
+        records = [records[index] for index in admitted]
+        message_ids = [message_ids[index] for index in admitted]
 
-        if has_title:
-            try:
-                translated_title = translator.translate(
-                    parsed_message.get("title"),
-                    from_lang,
-                    to_lang,
-                    params_dict.get("project_id"),
-                )
-            except Exception as e:
-                return aws.log_err(
-                    "[ERROR]: Cannot retrieve query data.\n{}".format(
-                        traceback.format_exc()
-                    )
+    # Messages queued behind a failed one in their group go back untouched
+    held = set(fifo_failures(event.get("Records"), failures))
+    records = [record for record, message_id in zip(records, message_ids) if message_id not in held]
+    message_ids = [message_id for message_id in message_ids if message_id not in held]
+
+    translate_started = time.time()
+    # Titles, texts and chunks of all records go out in as few provider calls as possible
+    translations, completed_at = translate_records(
+        translator.segmented,
+        records,
+        deadline=translate_deadline,
+        project_id=params_dict.get("project_id"),
+    )
+    throughput.record(
+        sum(
+            record_chars(record)
+            for record, translation in zip(records, translations)
+            if not any(isinstance(result, Exception) for result in translation.values())
+        ),
+        time.time() - translate_started,
+    )
+
+    if translation_memory is not None:
+        logger.info(
+            "Translation memory hit rate %.1f%%, stats: %s",
+            100 * translation_memory.hit_rate(),
+            translation_memory.stats,
+        )
+
+    stores = []
+    for message_id, parsed_message, translation, translated_at in zip(
+        message_ids, records, translations, completed_at
+    ):
+        # Every target language is stored on its own; a record with any failed
+        # language is retried, the others are acknowledged
+        for to_lang, result in translation.items():
+            if isinstance(result, Exception):
+                logger.error(
+                    "[ERROR]: Cannot translate message {} to {}: {}".format(message_id, to_lang, result)
                 )
+                failures.append(message_id)
+                # Only an unhealthy provider is waited out, a poison message fails at once
+                if is_transient_error(result) or isinstance(result, CircuitOpenError):
+                    delayed.append(message_id)
+                continue
+            translated_title, translated_text = result
+
+            translated_data = {
+                "text": translated_text,
+                "id": parsed_message.get("id"),
+                "lang_to": to_lang,
+                "lang_from": parsed_message.get("from_lang"),
+                "providers_id": PROVIDERS_ID
+            }
+
+            if translated_title:
+                translated_data["title"] = translated_title
+
+            checksum = aws.compute_checksum({"text": translated_data["text"], "id": translated_data["id"]})
+            translated_data["checksum"] = checksum.hex()
+            stores.append((message_id, parsed_message, to_lang, translated_at[to_lang], translated_data))
+
+    # Nor is anything stored for a message behind a failed translation in its group. The
+    # languages a failed message did translate are stored, so its retry can skip them
+    held = set(fifo_failures(event.get("Records"), failures)) - set(failures)
+    stores = [store for store in stores if store[0] not in held]
+
+    # Sending translated data to RDS, all records and languages of the invocation in one
+    # put_first call per PUT_FIRST_BATCH_SIZE translations
+    batches = []
+    for start in range(0, len(stores), PUT_FIRST_BATCH_SIZE):
+        batch = stores[start : start + PUT_FIRST_BATCH_SIZE]
+        future = provider_pool.submit(
+            aws.insert_translations, params_dict["put_first"], [store[-1] for store in batch], deadline
+        )
+        batches.append((batch, future))
+
+    store_errors = []
+    for batch, future in batches:
         try:
-            translated_text = translator.translate(
-                parsed_message.get("text"),
-                from_lang,
-                to_lang,
-                params_dict.get("project_id"),
-            )
-        except Exception as e:
-            return aws.log_err(
-                "[ERROR]: Cannot retrieve query data.\n{}".format(
-                    traceback.format_exc()
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            store_errors.extend(future.result(timeout=timeout))
+        except concurrent.futures.TimeoutError:
+            store_errors.extend(["Store did not finish before the deadline"] * len(batch))
+
+    translated_documents = {}
+    for (message_id, parsed_message, to_lang, translated_at, _), store_error in zip(stores, store_errors):
+        if store_error is not None:
+            logger.error(
+                "[ERROR]: Cannot store {} translation of message {}: {}".format(
+                    to_lang, message_id, store_error
                 )
             )
+            failures.append(message_id)
+        elif translation_memory is not None:
+            translated_documents[document_key(parsed_message, to_lang)] = source_hash(parsed_message)
+        logger.info(
+            "Record %s (%s) translated after %.0f ms, stored after %.0f ms.",
+            message_id,
+            to_lang,
+            (translated_at - started) * 1000,
+            (time.time() - started) * 1000,
+        )
 
-        translated_data = {
-            "text": translated_text,
-            "id": parsed_message.get("id"),
-            "providers_id": PROVIDERS_ID,
-            "lang_to": parsed_message.get("to_lang"),
-            "lang_from": parsed_message.get("from_lang")
-        }
+    if translated_documents:
+        # Only fingerprints of stored translations are recorded, a failed store is retranslated
+        translation_memory.record_documents(translated_documents)
 
-        if translated_title:
-            translated_data["title"] = translated_title
+    failures = fifo_failures(event.get("Records"), failures)
+    delayed = list(dict.fromkeys(delayed))
+    if delayed:
+        # Provider failures go back to the queue with a growing delay instead of straight back
+        aws.requeue_with_delay([messages[message_id] for message_id in delayed])
 
-        checksum = aws.compute_checksum({"text": translated_data["text"], "id": translated_data["id"]})
-        translated_data["checksum"] = checksum.hex()
-        # Sending translated data to RDS
-        try:
-            send_to_rds_response = aws.insert_translation(
-                params_dict["put_first"], translated_data
-            )
-            if send_to_rds_response != 200:
-                raise e
-        except Exception as e:
-            return {"status": f"Failure {e}"}
-
-    return {
-        "body": "success",
-        "message_count": len(event.get("Records")),
-        "headers": {
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET,OPTIONS",
-        },
-        "status_code": 200,
-        "isBase64Encoded": "false",
-    }
+    logger.info("Processed %d records, %d failed.", len(event.get("Records")), len(failures))
+    logger.info(
+        "HTTP client stats: %s, rate limiter stats: %s, circuit %s: %s",
+        http_client.snapshot(),
+        rate_limiter.stats,
+        circuit_breaker.state,
+        circuit_breaker.stats,
+    )
+    logger.info(
+        "%s invocation %d (container up %.0f s): credentials %.0f ms, total %.0f ms, credential stats: %s",
+        "Cold" if cold_start else "Warm",
+        container_stats["invocations"],
+        time.time() - CONTAINER_STARTED_AT,
+        credentials_ms,
+        (time.time() - started) * 1000,
+        gcp_credentials.stats,
+    )
+
+    # Partial batch response, only the failed messages go back to the queue
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
 
 
 if __name__ == "__main__":